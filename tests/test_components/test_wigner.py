@@ -13,3 +13,15 @@ def test_parity():
     p = Processor() // Source.fock(2) // Detector.parity()
     pn = p.probs()
     assert isclose(real(pn['p']), 1, abs_tol=1e-5)
+
+
+def test_parity_with_threshold():
+    # threshold axes are inverted alongside a parity axis
+    p = Processor()
+    p.add(0, Source.fock(1))
+    p.add(1, Source.fock(1))
+    p.add(0, Detector.parity())
+    p.add(1, Detector.threshold(efficiency=0.5))
+    pn = p.probs(chop=False)
+    assert isclose(real(pn['p', 0]), -0.5, abs_tol=1e-5)
+    assert isclose(real(pn['p', 1]), -0.5, abs_tol=1e-5)
@@ -3,6 +3,7 @@ from zpgenerator.dynamic.pulse import Pulse
 from math import isclose
 from qutip import destroy, fock
 from numpy import sqrt
+from pytest import raises
 
 
 def test_material():
@@ -41,6 +42,68 @@ def test_bath():
     assert isclose(bath.attenuation, 0.943933, abs_tol=1e-4)
 
 
+def test_bath_tables(tmp_path):
+    from zpgenerator.dynamic.operator import phonon_bath
+    from scipy.integrate import simps
+    from numpy import linspace, sin, cos
+
+    material = Material.ingaas_quantum_dot()
+    bath = PhononBath(material=material, temperature=5, resolution=41, max_power=10, directory=str(tmp_path))
+    tables = bath.compute_tables()
+
+    delay, freq = linspace(0, 10, 41)[:, None], linspace(1e-16, 10, 41)
+    integrand = material.spectral_density(freq) * bath.coth(bath._temp_con * freq) * cos(freq * delay) / 2
+    for power, rs in zip(tables['power'], tables['rs']):
+        assert isclose(simps(simps(integrand * sin(power * delay), freq), delay[:, 0]), rs, abs_tol=1e-12)
+
+    phonon_bath._tables.clear()
+    assert isclose(bath.attenuation, exp(-tables['phi0'] / 2))  # tables are computed on first use
+    assert len(list(tmp_path.iterdir())) == 1
+    assert PhononBath(material=material, temperature=5, resolution=41, max_power=10).tables() is \
+        phonon_bath._tables[bath.key]
+
+    phonon_bath._tables.clear()
+    other = PhononBath(material=Material.ingaas_quantum_dot(), temperature=5, resolution=41, max_power=10,
+                       directory=str(tmp_path))
+    assert isclose(other._ic(3), bath._ic(3), abs_tol=1e-12)
+
+
+def test_rates():
+    from numpy import linspace, array, allclose
+    bath = PhononBath(material=Material.ingaas_quantum_dot(), temperature=7, max_power=25)
+    rabi = linspace(0, 10, 21) * exp(0.3j)
+    parameters = {'resonance': 0.4}
+
+    rates = bath.rates(rabi, parameters)
+    assert allclose(array(rates), array([bath.rates(value, parameters) for value in rabi]).T)
+    assert isclose(rates[4][0], 0) and isclose(rates[0][0], 0)
+
+    detuning = bath.polaron_shift + 0.4
+    c1, c2, c3, c4, g = bath.coefficients(bath.rabi_r(real(rabi[5]), imag(rabi[5]), detuning), detuning)
+    assert isclose(rates[2][5], -(real(rabi[5]) * c1 + imag(rabi[5]) * c2), abs_tol=1e-4)
+    assert isclose(abs(rates[3][5]), abs(real(rabi[5]) * c3 + imag(rabi[5]) * c4), abs_tol=1e-4)
+    assert isclose(rates[4][5], bath.gamma_star(rabi[5], parameters), abs_tol=1e-12)
+
+
+def test_rates_detuned_at_max_power():
+    bath = PhononBath(material=Material.ingaas_quantum_dot(), temperature=4, max_power=30)
+    for resonance in [0.1, 0.3]:  # the largest amplitude of the table reaches max_power
+        rates = bath.rates(1.0, {'resonance': resonance})
+        assert isclose(rates[4], bath.gamma_star(1.0, {'resonance': resonance}))
+        amplitude = bath.rates.table(bath.polaron_shift + resonance)[0][-1]
+        assert bath.rates(amplitude * (1 + 1e-15), {'resonance': resonance})  # rounding at the edge of the tables
+
+    with raises(ValueError):
+        bath.rates(40, {'resonance': 0.1})
+    with raises(ValueError):
+        bath.rates(1.0, {'resonance': 40})
+
+    rates = PhononRates(bath, maxsize=2)
+    for resonance in [0.5, 0.6, 0.7]:
+        rates(1.0, {'resonance': resonance})
+    assert len(rates._tables) == 2
+
+
 def test_environment():
     pulse = Pulse.gaussian()
     bath = PhononBath(material=Material.ingaas_quantum_dot(), temperature=7, max_power=25)
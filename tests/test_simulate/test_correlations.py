@@ -0,0 +1,45 @@
+from zpgenerator.simulate.algorithms.correlations import *
+from zpgenerator.simulate.algorithms.moments import exact_hom_visibility_with_coherence, exact_intensity_correlation
+from zpgenerator.simulate import Processor
+from zpgenerator.components import Source
+from zpgenerator.dynamic import Pulse
+from math import isclose
+from numpy import pi
+
+
+def test_two_time_correlations():
+    source = Source.two_level(pulse=Pulse.gaussian(parameters={'area': pi, 'width': 1}))
+    correlations = compute_two_time_correlations(source, 0, resolution=200)
+
+    assert correlations.correlation.shape == (len(correlations.times),) * 2
+    assert (correlations.correlation == correlations.correlation.conj().T).all()
+    assert isclose(correlations.weights.sum(), correlations.times[-1] - correlations.times[0])
+    assert isclose(correlations.average_photon_number, exact_intensity_correlation(source, 0)[1], abs_tol=1e-3)
+
+
+def test_factorized_hom_visibility():
+    for source in [Source.two_level(pulse=Pulse.gaussian(parameters={'area': pi, 'width': 1})),
+                   Source.two_level(pulse=Pulse.square(parameters={'area': pi / 2, 'width': 1})),
+                   Source.two_level(parameters={'dephasing': 0.3})]:
+        vhom, c1, _ = exact_hom_visibility_with_coherence(source, 0)
+        g2, _ = exact_intensity_correlation(source, 0)
+        factorized_vhom, factorized_M, factorized_c1 = factorized_hom_visibility(source, 0)
+        assert isclose(factorized_vhom, vhom, abs_tol=1e-3)
+        assert isclose(factorized_M, vhom + g2, abs_tol=1e-3)
+        assert isclose(factorized_c1, c1, abs_tol=1e-3)
+
+
+def test_processor_factorized_hom():
+    p = Processor() // Source.perceval(indistinguishability=0.9, multiphoton_component=0.05)
+    quality = p.hom(backend='factorized')
+    assert set(quality.keys()) == {'vhom', 'M', 'c1'}
+    reference = p.hom()
+    assert isclose(quality['vhom'], reference['vhom'], abs_tol=1e-3)
+    assert isclose(quality['M'], reference['M'], abs_tol=1e-3)
+
+    name = list(p.quality.keys())[0]
+    p.quality[name]['g2'] = 1.
+    p.hom(backend='factorized')
+    assert p.quality[name]['g2'] == 1.  # g2 is known and not updated
+    p.hom(backend='factorized', update_g2=True)
+    assert isclose(p.quality[name]['g2'], 0.05, abs_tol=1e-3)
@@ -16,3 +16,67 @@ def test_state_distribution():
     assert sn[1] == fock(1)
 
 
+def test_adaptive_photon_number_distribution():
+    from zpgenerator.simulate.quality import ProcessorQuality
+    from zpgenerator.components import Source
+    from zpgenerator.dynamic import Pulse
+    from math import isclose
+    from numpy import pi
+
+    p = ProcessorQuality()
+    p.add(0, Source.two_level(pulse=Pulse.gaussian(parameters={'area': 3 * pi, 'width': 0.3})))
+
+    fixed = compute_photon_number_distribution(p, truncation=7)
+    adaptive = compute_adaptive_photon_number_distribution(p)
+    assert len(adaptive) > 4  # the coarsest grid of four roots is refined
+    assert all(isclose(adaptive[k], v, abs_tol=1e-4) for k, v in fixed.items())
+    assert isclose(sum(adaptive.values()), 1, abs_tol=1e-5)
+
+    p = ProcessorQuality() // Source.perceval(emission_probability=0.5, multiphoton_component=1e-7)
+    adaptive = p.photon_statistics()
+    fixed = p.photon_statistics(truncation=3)
+    assert 0 < adaptive[2] < 1e-6 and isclose(adaptive[2], fixed[2], abs_tol=1e-9)  # neither path is chopped
+
+
+def test_correlation_distribution_array():
+    from math import isclose
+    import numpy as np
+
+    pn = CorrelationDistribution({(0, 1): 0.2, (1, 1): 0.3, (1, 0): 0.5}, names=['a', 'b'])
+    assert len(pn) == 3 and (0, 0) not in pn and pn[0, 0] == 0
+    assert list(pn.keys()) == [(0, 1), (1, 0), (1, 1)]
+
+    assert dict(pn.marginal('a')) == {(0,): 0.2, (1,): 0.8}
+    assert pn.marginal(['b', 'a'])[1, 0] == 0.2
+    conditional = pn.condition('a', 1)
+    assert isclose(conditional[0], 0.625) and isclose(conditional[1], 0.375)
+    assert dict(pn.coarse_grain(['a', 'b'])) == {(1,): 0.7, (2,): 0.3}
+    assert dict(pn.coarse_grain([0, 1], threshold=True)) == {(1,): 1.0}
+
+    traced = pn.copy()
+    traced.trace('a')
+    assert dict(traced) == {(0,): 0.5, (1,): 0.5} and traced.names == ['b']
+
+    pn[2, 0] = 0.2
+    assert pn.labels == [[0, 1, 2], [0, 1]]
+    pn.normalize()
+    assert isclose(pn.norm, 1) and isclose(pn[2, 0], 0.2 / 1.2)
+
+    array = np.full((2, 2), 0.25)
+    assert CorrelationDistribution.from_array(array).to_numpy() is array
+
+
+def test_correlation_distribution_missing_outcome():
+    pn = CorrelationDistribution({(0, 0): 0.5, (1, 0): 0.5})
+    assert pn[0, 1] == 0. and (0, 1) not in pn and pn['a', 0] == 0.
+
+    pn[1, 1] = 1e-9
+    pn.chop()
+    assert pn[1, 1] == 0. and (1, 1) not in pn
+
+
+def test_scalar_distribution_normalize():
+    pn = ScalarDistribution({(0,): 2., (1,): 2.})
+    pn.normalize()
+    assert pn[0] == pn[1] == 0.5
+    assert pn.is_normalized()
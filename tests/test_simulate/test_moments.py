@@ -0,0 +1,81 @@
+from zpgenerator.simulate.algorithms.moments import *
+from zpgenerator.simulate.algorithms import compute_photon_number_distribution, estimate_hom_visibility
+from zpgenerator.simulate.algorithms.photon_statistics import compute_average_photon_number, \
+    compute_intensity_correlation
+from zpgenerator.components import Source
+from zpgenerator.dynamic import Pulse
+from math import isclose
+from numpy import pi
+
+
+def test_warn_no_light(capsys):
+    warn_no_light(1, 0)
+    warn_no_light(2, 1)
+    assert capsys.readouterr().out.splitlines() == ["Warning: no light detected in mode , g2 cannot be defined.",
+                                                    "Warning: no light detected in mode 1, g2 1 cannot be defined."]
+
+
+def test_moment_indices():
+    assert moment_indices((2,)) == [(0,), (1,), (2,)]
+    assert moment_indices((1, 1)) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    assert moment_links(moment_indices((2,))) == [[(0, 1), (1, 2)]]
+    assert moment_links(moment_indices((1, 1))) == [[(0, 2), (1, 3)], [(0, 1), (2, 3)]]
+
+
+def test_factorial_moments_photon_statistics():
+    for pulse in [Pulse.square(parameters={'area': pi, 'width': 1}),
+                  Pulse.gaussian(parameters={'area': pi, 'width': 1})]:
+        source = Source.two_level(pulse=pulse)
+        pn = compute_photon_number_distribution(ProcessorBase(source), truncation=6)
+
+        moments = compute_factorial_moments(photon_counting_processor(source, 0), (2,))
+        assert isclose(moments[(0,)], 1, abs_tol=1e-6)
+        assert isclose(moments[(1,)], compute_average_photon_number(pn), abs_tol=1e-5)
+
+        g2, mu = exact_intensity_correlation(source, 0)
+        assert isclose(mu, moments[(1,)])
+        assert isclose(g2, compute_intensity_correlation(pn, 2), abs_tol=1e-4)
+        assert isclose(exact_average_photon_number(source, 0), mu, abs_tol=1e-6)
+
+
+def test_exact_hom_visibility():
+    source = Source.two_level(pulse=Pulse.square(parameters={'area': pi, 'width': 1}))
+    vhom = exact_hom_visibility(source, 0)
+    assert isclose(vhom, estimate_hom_visibility(source, 0, pseudo_limit=0.001).real, abs_tol=1e-3)
+
+    vhom_coherence, c1, c2 = exact_hom_visibility_with_coherence(source, 0)
+    assert isclose(vhom_coherence, vhom, abs_tol=1e-5)
+    assert c1 > 0 and c2 > 0
+
+    source = Source.perceval(indistinguishability=0.9)
+    assert isclose(exact_hom_visibility(source, 0), 0.9, abs_tol=1e-5)
+
+
+def test_quality_suite():
+    source = Source.two_level(pulse=Pulse.gaussian(parameters={'area': pi, 'width': 1}))
+    phases, indices, vacuum = plan_quality_suite(['beta', 'mu', 'g2'])
+    assert phases == [] and indices == [(0,), (1,), (2,)] and vacuum
+    phases, indices, vacuum = plan_quality_suite(['vhom'])
+    assert phases == [pi / 4] and indices == [(0, 0), (1, 0), (0, 1), (1, 1)] and not vacuum
+    assert plan_quality_suite(quality_metrics)[0] == [0, pi / 2]
+
+    suite = compute_quality_suite(source, 0)
+    assert list(suite.keys()) == quality_metrics
+    g2, mu = exact_intensity_correlation(source, 0)
+    vhom, c1, c2 = exact_hom_visibility_with_coherence(source, 0)
+    expected = {'mu': mu, 'g2': g2, 'vhom': vhom, 'c1': c1, 'c2': c2, 'M': vhom + g2, 'beta': 0.8685226435566074}
+    assert all(isclose(suite[k], v, abs_tol=1e-5) for k, v in expected.items())
+
+    suite = compute_quality_suite(source, 0, metrics=['beta', 'g2'])
+    assert isclose(suite['beta'], expected['beta'], abs_tol=1e-5)
+    assert isclose(suite['g2'], expected['g2'], abs_tol=1e-5)
+
+
+def test_hom_fringe():
+    source = Source.two_level(pulse=Pulse.square(parameters={'area': pi / 2, 'width': 1}))
+    harmonics, norm = hom_fringe_harmonics(source, 0)
+    assert len(harmonics) == 3
+
+    phases = [0, 0.3, pi / 4, 1., pi / 2, 2.5]
+    fringe = hom_fringe(harmonics, norm, phases)
+    assert all(isclose(v, exact_hom_visibility(source, 0, phi=phi), abs_tol=1e-8) for v, phi in zip(fringe, phases))
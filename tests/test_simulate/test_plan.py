@@ -0,0 +1,31 @@
+from zpgenerator.simulate import Processor, SimulationPlan
+from zpgenerator.components import Source, Detector
+from zpgenerator.dynamic import Pulse
+from math import isclose
+
+
+def test_plan_probs():
+    p = Processor() // Source.two_level(pulse=Pulse.gaussian({'width': 0.2})) // Detector.partition([0, 1, 2])
+    plan = p.compile()
+    assert isinstance(plan, SimulationPlan)
+    assert plan.times[0] == plan.initial_time
+    assert len(plan.steps) == len(plan.times) - 1
+
+    expected = p.probs()
+    for pn in [plan.probs(), plan.probs()]:
+        assert pn.keys() == expected.keys()
+        assert all(isclose(pn[k], expected[k], abs_tol=1e-6) for k in expected.keys())
+
+    plan = p.compile(parameters={'width': 0.1})
+    expected = p.probs(parameters={'width': 0.1})
+    pn = plan.probs()
+    assert all(isclose(pn[k], expected[k], abs_tol=1e-6) for k in expected.keys())
+
+
+def test_plan_conditional_states():
+    p = Processor() // Source.fock(2) // Detector.pnr(2)
+    plan = p.compile(bin_list=[0])
+    expected = p.conditional_states(bin_list=[0])
+    states = plan.conditional_states()
+    assert states.keys() == expected.keys()
+    assert all((states[k] - expected[k]).norm() < 1e-6 for k in expected.keys())
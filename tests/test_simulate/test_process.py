@@ -0,0 +1,28 @@
+from zpgenerator.simulate import Processor, ConditionalProcess
+from zpgenerator.components import Source, Detector
+from zpgenerator.dynamic import Pulse
+from qutip import basis
+from math import isclose
+
+
+def test_conditional_process():
+    p = Processor() // Source.two_level(pulse=Pulse.gaussian({'width': 0.5, 'area': 1.})) // Detector.threshold()
+    process = p.conditional_process()
+    assert isinstance(process, ConditionalProcess)
+    assert process.dims == [2]
+    assert len(process.channels) == 2
+
+    states = [basis(2, 0), basis(2, 1), (basis(2, 0) + 1j * basis(2, 1)).unit()]
+    array = process.probability_array(states)
+    assert array.shape == (3, 2)
+
+    for state, row in zip(states, array):
+        p.initial_state = state
+        expected = p.probs()
+        probs = process.probs(state)
+        assert all(isclose(probs[k], expected[k], abs_tol=1e-5) for k in expected.keys())
+        assert all(isclose(row[i].real, expected[k], abs_tol=1e-5) for i, k in enumerate(process.outcomes))
+
+        expected_states = p.conditional_states()
+        conditional_states = process.conditional_states(state)
+        assert all((conditional_states[k] - expected_states[k]).norm() < 1e-5 for k in expected_states.keys())
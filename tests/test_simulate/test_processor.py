@@ -1,9 +1,12 @@
 from zpgenerator.simulate.processor import Processor
 from zpgenerator.elements import *
 from zpgenerator.network import DetectorGate
+from zpgenerator.components import Source, Detector
+from zpgenerator.dynamic import Pulse
 from numpy import exp, log
 from math import isclose
 from qutip import Qobj
+from pytest import raises
 
 
 def make_emitter_splitter():
@@ -150,4 +153,71 @@ def test_sequential_conditional_states():
 
     p.initial_state = states[0]
     prbs = p.probs()
-    isclose(prbs[0], 1 / 4, abs_tol=10 ** -(p.precision))
\ No newline at end of file
+    isclose(prbs[0], 1 / 4, abs_tol=10 ** -(p.precision))
+
+
+def test_processor_cached_maps_channels():
+    source = Source.two_level(pulse=Pulse.gaussian({'width': 0.5}))
+    p = Processor() // source // Detector.threshold()
+    basis = [source.states['|g>'], source.states['|e>']]
+    expected = p.conditional_channels(basis=basis)
+
+    p.cache_maps = True
+    channels = p.conditional_channels(basis=basis)
+    assert all((channels[k] - expected[k]).norm() < 1e-5 for k in expected.keys())
+
+
+def test_processor_parameter_vector():
+    p = Processor() // Source.two_level(pulse=Pulse.gaussian({'width': 0.5})) // Detector.threshold()
+    assert 'area' in p.parameter_order and 'width' in p.parameter_order
+
+    vector = p.parameter_vector({'area': 2.})
+    expected = p.probs(parameters={'area': 2.})
+    probs = p.probs(parameters=vector)
+    assert all(isclose(probs[k], expected[k], abs_tol=1e-8) for k in expected.keys())
+
+
+def test_processor_selected_patterns():
+    p = Processor()
+    for i in range(3):
+        p.add(i, Source.two_level(pulse=Pulse.gaussian({'area': 1.5 + 0.3 * i, 'width': 0.1})))
+    p.add(0, Detector.threshold(bin_name='a'))
+    p.add(1, Detector.pnr(2, bin_name='b'))
+    p.add(2, Detector.threshold(bin_name='c'))
+
+    full = p.probs(chop=False)
+    patterns = [(1, 0, 1), (0, 2, 1)]
+    probs = p.probs(patterns=patterns, chop=False)
+    assert set(probs.keys()) == set(patterns)
+    assert all(isclose(probs[k], full[k], abs_tol=1e-5) for k in patterns)
+
+    probs = p.probs(patterns=[(0, 1, 0)], chop=False)
+    assert isclose(probs[0, 1, 0], full[0, 1, 0], abs_tol=1e-5)
+    assert len(p._grove.trees[0].leaf_states()) == 3  # instead of the 12 configurations of the full tensor
+
+    full_states = p.conditional_states(chop=False)
+    states = p.conditional_states(patterns=[(1, 0, 1)], chop=False)
+    assert isclose((states[1, 0, 1] - full_states[1, 0, 1]).norm(), 0, abs_tol=1e-5)
+
+
+def test_processor_selected_patterns_staggered_gates():
+    p = Processor()
+    for i in range(3):
+        p.add(i, Source.two_level(pulse=Pulse.gaussian({'area': 1.5 + 0.3 * i, 'width': 0.1})))
+    p.add(0, Detector.threshold(gate=[2, 20], bin_name='a'))
+    p.add(1, Detector.pnr(2, gate=[0, 20], bin_name='b'))
+    p.add(2, Detector.threshold(gate=[1, 20], bin_name='c'))
+
+    full = p.probs(chop=False)
+    assert p._branch_order == [1, 2, 0]
+    patterns = [(1, 0, 1), (0, 1, 2)]
+    probs = p.probs(patterns=patterns, chop=False)
+    assert set(probs.keys()) == set(patterns)
+    assert all(isclose(probs[k], full[k], abs_tol=1e-5) for k in patterns)
+
+    full_states = p.conditional_states(chop=False)
+    states = p.conditional_states(patterns=[(1, 0, 2)], chop=False)
+    assert isclose((states[1, 0, 2] - full_states[1, 0, 2]).norm(), 0, abs_tol=1e-5)
+
+    with raises(AssertionError):
+        p.probs(patterns=[(0, 2, 1)])
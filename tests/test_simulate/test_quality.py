@@ -82,10 +82,10 @@ def test_quality_source_two_level_square():
     assert_quality(p, {'g2': 0.1657173108692473})
 
     p.hom()
-    assert_quality(p, {'vhom': 0.6986076195322675,
-                       'M': 0.8632249191373985,
-                       'c1': 0.16937487575139845,
-                       'c2': 0.010913449702802001})
+    assert_quality(p, {'vhom': 0.6998925442438966,
+                       'M': 0.8653542898141399,
+                       'c1': 0.16985398239435945,
+                       'c2': 0.010752780291197571})
 
     prbs = p.photon_statistics(truncation=5)
     prbs_expected = {0: 0.01991494387973506,
@@ -130,10 +130,10 @@ def test_quality_source_two_level_gaussian():
     assert_quality(p, {'g2': 0.2974272053102568})
 
     p.hom()
-    assert_quality(p, {'vhom': 0.5537260184028457,
-                       'M': 0.8512403085987019,
-                       'c1': 0.49738289802967767,
-                       'c2': 0.09811570778749941})
+    assert_quality(p, {'vhom': 0.5559466244597866,
+                       'M': 0.8526635296280669,
+                       'c1': 0.4960832508727599,
+                       'c2': 0.09755352633934367})
 
     prbs = p.photon_statistics(truncation=5)
     prbs_expected = {0: 0.13147674563955142,
@@ -145,6 +145,28 @@ def test_quality_source_two_level_gaussian():
     assert all(isclose(v, prbs[k], abs_tol=1e-5) for k, v in prbs_expected.items())
 
 
+def test_quality_suite():
+    p = ProcessorQuality()
+    p.add(0, Source.perceval(multiphoton_component=0.1))
+
+    quality = p.quality_suite()
+    assert set(quality.keys()) == {'beta', 'mu', 'g2', 'vhom', 'M', 'c1', 'c2'}
+    assert_quality(p, {'mu': (1 - sqrt(1 - 2 * 0.1)) / 0.1, 'beta': 1, 'g2': 0.1,
+                       'vhom': 1 - 2 * 0.1, 'M': 1 - 0.1, 'c1': 0, 'c2': 0})
+
+    assert p.quality_suite(metrics=['g2']) == {'g2': quality['g2']}
+
+
+def test_hom_fringe():
+    p = ProcessorQuality()
+    p.add(0, Source.two_level(pulse=Pulse.gaussian(parameters={'area': pi, 'width': 1})))
+
+    fringe = p.hom_fringe([0, pi / 4, pi / 2])
+    assert isclose(fringe[1], p.hom(update_coh=False)['vhom'], abs_tol=1e-6)
+    assert isclose((fringe[0] + fringe[2]) / 2, p.hom()['vhom'], abs_tol=1e-6)
+    assert p.hom_fringe(pi / 4) == fringe[1]
+
+
 def test_quality_source_distinguishable_noise():
     source = Source.perceval(emission_probability=0.5)
     p = ProcessorQuality()
@@ -213,3 +235,19 @@ def test_detuned_pulse():
     pn0 = source.photon_statistics(parameters={'detuning': -0.42, 'resonance': -0.42})
     pn1 = source.photon_statistics()
     assert all(isclose(pn0[i], pn1[i], abs_tol=1e-5) for i in range(3))
+
+
+def test_wigner_grid():
+    p = ProcessorQuality()
+    p.add(0, Source.two_level())
+
+    grid = p.wigner_grid([0, 0.5], [-0.5, 0, 0.5])
+    assert grid.values.shape == (2, 3)
+    assert grid.alphas[4] == 0.5
+    assert len(p._wigner_processors) == 1
+
+    wigner = p.wigner(alpha=[0, 0.5])
+    assert len(p._wigner_processors) == 1  # the local oscillator processor is reused
+    assert isclose(wigner.points[0], grid.values[0, 1])
+    assert isclose(wigner.points[1], grid.values[1, 1])
+    assert isclose(grid.values[0, 0], grid.values[0, 2], abs_tol=1e-6)
@@ -0,0 +1,89 @@
+from zpgenerator.simulate import Processor
+from zpgenerator.simulate.result_cache import ResultCache, fingerprint
+from zpgenerator.components import Source
+from zpgenerator.dynamic import Pulse
+from numpy import exp
+
+AMPLITUDE = 3.
+
+
+def make_processor(width: float = 0.5):
+    return Processor() // Source.two_level(pulse=Pulse.gaussian({'width': width}))
+
+
+def test_fingerprint():
+    p = make_processor()
+    identifier = fingerprint(p.component)
+    p.probs()
+    assert fingerprint(p.component) == identifier  # simulating does not change the structure
+    assert fingerprint(make_processor().component) == identifier
+    assert fingerprint(make_processor(0.3).component) != identifier
+
+    p.update_default_parameters({'width': 0.3})
+    assert fingerprint(p.component) != identifier
+
+
+def test_fingerprint_lazy_state():
+    from zpgenerator.dynamic.operator.phonon_bath import PhononBath, Material
+    bath = PhononBath(material=Material.ingaas_quantum_dot(), temperature=4)
+    identifier = fingerprint(bath)
+    assert bath.polaron_shift and bath.attenuation  # computed on first use
+    assert fingerprint(bath) == identifier
+    assert fingerprint(PhononBath(material=Material.ingaas_quantum_dot(), temperature=5)) != identifier
+
+    rates = bath.rates
+    identifier = fingerprint(rates)
+    rates(1., {'resonance': 0.1})
+    assert fingerprint(rates) == identifier
+
+
+def amplitude_shape(t, args):
+    return AMPLITUDE * exp(-t ** 2 / 0.1)
+
+
+def test_result_cache_global_function():
+    global AMPLITUDE
+    p = Processor() // Source.two_level(pulse=Pulse.custom(shape=amplitude_shape, gate=[-1, 1]))
+    mu = p.mu()
+    AMPLITUDE = 1.
+    try:
+        cached = p.mu()  # the module-level amplitude is part of the fingerprint
+        p.result_cache = None
+        assert cached != mu
+        assert cached == p.mu()
+    finally:
+        AMPLITUDE = 3.
+
+
+def test_quality_result_cache():
+    p = make_processor()
+    g2 = p.g2()
+    assert p.g2() == g2
+    assert p.result_cache.info().hits == 1
+
+    p.g2(parameters={'width': 0.3})
+    assert p.result_cache.info().misses == 2
+
+    p.result_cache = None
+    assert p.g2() == g2
+
+
+def test_result_cache_disk(tmp_path):
+    p = make_processor()
+    p.result_cache = ResultCache(directory=str(tmp_path))
+    distribution = p.photon_statistics()
+    assert len(list(tmp_path.iterdir())) == 1  # the truncation is found without computing mu
+
+    q = make_processor()
+    q.result_cache = ResultCache(directory=str(tmp_path))
+    assert q.photon_statistics() == distribution
+    assert q.result_cache.info().misses == 0
+
+
+def test_phonon_source_result_cache():
+    source = Source.phonon_assisted()
+    identifier = fingerprint(source)
+    mu = source.mu()
+    assert source.mu() == source.mu() == mu
+    assert fingerprint(source) == identifier  # memoised parameter routes and phonon tables are not structure
+    assert source._quality_processor.result_cache.info().hits == 2
@@ -0,0 +1,62 @@
+from zpgenerator.simulate import Processor, SweepResult
+from zpgenerator.simulate.sweep import parameter_points
+from zpgenerator.components import Source, Detector
+from zpgenerator.dynamic import Pulse
+from math import isclose
+import numpy as np
+from pytest import raises
+import os
+
+
+def make_processor():
+    return Processor() // Source.two_level(pulse=Pulse.gaussian({'width': 0.5})) // Detector.threshold()
+
+
+def test_parameter_points():
+    points, shape = parameter_points({'area': [1, 2, 3], 'width': [0.1, 0.2]})
+    assert shape == (3, 2)
+    assert points[1] == {'area': 1, 'width': 0.2}
+
+    points, shape = parameter_points([{'area': 1}, {'area': 2}])
+    assert shape == (2,)
+
+
+def test_sweep_probs():
+    p = make_processor()
+    grid = {'area': [np.pi / 2, np.pi], 'width': [0.3, 0.5]}
+    result = p.sweep(grid, chunk_size=3)
+    assert isinstance(result, SweepResult)
+    assert result.values.shape == (2, 2, 2)
+    assert result.outcomes == [(0,), (1,)]
+
+    for point, values in zip(result.points, result.values.reshape(4, 2)):
+        expected = p.probs(parameters=point)
+        assert all(isclose(values[i], expected[k], abs_tol=1e-6) for i, k in enumerate(result.outcomes))
+
+    parallel = p.sweep(grid, workers=2, chunk_size=1)
+    assert np.allclose(parallel.values, result.values)
+
+    vectors = np.array([[point.get(name, p.default_parameters[name]) for name in p.parameter_order]
+                        for point in result.points])
+    rows = p.sweep(vectors)
+    assert rows.values.shape == (4, 2)
+    assert np.allclose(rows.values, result.values.reshape(4, 2))
+
+
+def test_sweep_checkpoint(tmp_path):
+    p = make_processor()
+    checkpoint = str(tmp_path / 'sweep')
+    grid = {'area': [np.pi / 2, np.pi, 3 * np.pi / 2]}
+
+    result = p.sweep(grid, quantity='probs', chunk_size=2, checkpoint=checkpoint)
+    assert sorted(os.listdir(checkpoint)) == ['chunk-0.pkl', 'chunk-2.pkl', 'sweep.pkl']
+
+    resumed = p.sweep(grid, quantity='probs', chunk_size=2, checkpoint=checkpoint)  # every chunk is loaded
+    assert np.array_equal(resumed.values, result.values)
+
+    os.remove(os.path.join(checkpoint, 'chunk-2.pkl'))
+    resumed = p.sweep(grid, quantity='probs', chunk_size=1, checkpoint=checkpoint)  # a different chunk size
+    assert np.array_equal(resumed.values, result.values)
+
+    with raises(AssertionError):  # different arguments of the quantity
+        p.sweep(grid, quantity='probs', chunk_size=2, checkpoint=checkpoint, bin_list=[0])
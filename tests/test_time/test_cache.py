@@ -1,7 +1,60 @@
 from zpgenerator import *
+from zpgenerator.time.evaluate.cache import LRUCache, canonical
+from copy import deepcopy
 from qutip import Qobj
+import numpy as np
 
 
 def test_default_cache():
     source = Source.two_level(pulse=Pulse.gaussian())
     source.mu()
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == (True, 1)
+    cache.put('c', 3)  # evicts 'b', the least recently used entry
+    assert cache.get('b') == (False, None)
+    assert cache.info() == (1, 1, 1, 2, 2)
+
+    assert len(deepcopy(cache)) == 0
+
+
+def test_canonical_parameters():
+    assert canonical({'b': [1, 2], 'a': 0}) == canonical({'a': 0, 'b': (1, 2)})
+    assert hash(canonical({'a': np.array([1., 2.])}))
+
+
+def test_component_cache():
+    source = Source.two_level(pulse=Pulse.gaussian())
+    other = Source.two_level(pulse=Pulse.gaussian())
+
+    source.times()
+    source.times()
+    assert source.times.cache_info().hits == 1
+    assert other.times.cache_info().size == 0  # caches are per instance
+
+    parameters = {'width': 0.2}
+    times = source.times(parameters)
+    assert source.times(parameters) == times  # user parameters are cached too
+    assert source.times.cache_info().hits == 2
+    assert source.times.cache_info().size == 2
+
+    source.update_default_parameters({'width': 0.5})
+    assert source.times.cache_info().size == 0
+
+
+def test_cache_invalidation():
+    pulse = Pulse.gaussian()
+    source = Source.two_level(pulse=pulse)
+    source.times()
+    assert source.parameters and source.default_parameters and source.uses_parameter('width')
+    assert source.times.cache_info().size == 1  # reading parameters keeps the cached results
+    assert '_cache_uses_parameter' in vars(source)  # parameter lookups are cached per instance
+
+    times = source.times()
+    pulse.update_default_parameters({'width': 0.5})  # a change of a child invalidates the results of its parents
+    assert source.times.cache_info().size == 0
+    assert source.times()[:2] == pulse.times() and source.times() != times
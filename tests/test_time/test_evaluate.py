@@ -23,6 +23,23 @@ def test_func_parameters():
     assert func2(2) == 12
 
 
+def test_func_compile():
+    func0 = Func(lambda t, args: args['a'] * t ** 2, args={'a': 2})
+    func1 = Func(lambda t, args: args['a'] / t, args={'a': 3})
+    func = (func0 * func1 + 1) * 2 + func0.conj()
+    func = func.compose_with(lambda value, args: args['b'] * value, {'b': 3})
+    compiled = func.compile()
+    assert compiled(2) == func(2) == 3 * ((8 * 3 / 2 + 1) * 2 + 8)
+
+    wrapped = func.compiled()
+    assert wrapped(2, {}) == func(2)
+    assert wrapped(2, {'b': 1}) == func(2, {'b': 1})
+
+    times = [1, 2, 3]
+    assert list(func.tabulate(times)) == [func(t) for t in times]
+    assert list(Func(lambda t, args: 1 if t > 1 else 0).tabulate(times)) == [0, 1, 1]
+
+
 def test_evaluated_function():
     evafun = EvaluatedFunction(constant=2, variable=Func(lambda t, args: args['a'] * t ** 2))
     assert evafun(2, {'a': 4}) == 2 + 16
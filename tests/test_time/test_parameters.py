@@ -241,3 +241,15 @@ def test_uses_parameter():
     assert smith.uses_parameter('weight')
     assert smith.uses_parameter('age')
     assert smith.uses_parameter('Alice' + d + 'age')
+
+
+def test_parameter_vector():
+    alice = ParameterizedObject(parameters={'age': 27, 'height': 165, 'city': 'Paris', 'tall': True}, name='Alice')
+    assert alice.parameter_order == ['age', 'height']
+    assert list(alice.parameter_vector()) == [27, 165]
+    assert list(alice.parameter_vector({'height': 170})) == [27, 170]
+    assert alice.vector_parameters([25, 160]) == {'age': 25, 'height': 160}
+    assert alice.set_parameters(alice.vector_parameters([25, 160])).user == {'age': 25, 'height': 160}
+
+    alice.update_default_parameters({'tall': 1.})  # the order is refreshed when parameters change
+    assert alice.parameter_order == ['age', 'height', 'tall']
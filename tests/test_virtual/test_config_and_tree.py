@@ -1,5 +1,5 @@
 from zpgenerator.virtual.tree import *
-from zpgenerator.virtual.configuration import PhysicalDetectorGate
+from zpgenerator.virtual.configuration import PhysicalDetectorGate, FourierDetectorGate, NestedFourierDetectorGate
 from zpgenerator.virtual.propagator import VPropHTD, VPropTI
 from zpgenerator.network.detector import TimeBin
 from zpgenerator.time import Func
@@ -48,6 +48,18 @@ def test_physical_detector_in_virtual_tree():
     vtree.propagate(vprop, 5)
     assert len(vtree.get_points()) == 36
 
+
+def test_nested_fourier_detector_configurations():
+    vdetector = NestedFourierDetectorGate(resolution=3)
+    configurations = vdetector.virtual_configurations
+    vdetector.refine()
+    assert vdetector.resolution == 7
+    assert len(vdetector.virtual_configurations) == 4
+    configurations += vdetector.virtual_configurations
+    expected = FourierDetectorGate(resolution=7).virtual_configurations
+    assert all(any(isclose(abs(c - e), 0, abs_tol=1e-12) for c in configurations) for e in expected)
+
+
 def test_virtual_tree_unnormalised_states():
     vdetector = PhysicalDetectorGate(resolution=1, gate=[0, log(2)])
 
@@ -0,0 +1,52 @@
+from zpgenerator.virtual.executor import VExecutor
+from zpgenerator.virtual.propagator import VPropHTD
+from zpgenerator.components import Source, Detector
+from zpgenerator.dynamic import Pulse
+from zpgenerator.simulate import Processor
+from qutip import create, destroy, sprepost, ket2dm, basis
+from math import isclose
+import numpy as np
+
+
+def test_executor_deterministic():
+    jumps = [sprepost(destroy(2), create(2))]
+    vprop = VPropHTD(hamiltonian=[create(2) + destroy(2)], collapse_operators=[destroy(2)], jumps=jumps)
+
+    states = np.stack([ket2dm(basis(2, i % 2)).full() for i in range(10)])
+    virtual_configurations = [(k / 10,) for k in range(10)]
+
+    results = [VExecutor(workers, chunk_size=3).evolve(vprop, states, virtual_configurations, 0, 1)
+               for workers in [1, 2, 4]]
+    assert all(np.array_equal(results[0], result) for result in results[1:])
+
+    serial = vprop.evolve(states, virtual_configurations, 0, 1)
+    assert np.allclose(results[0], serial, atol=1e-5)
+
+
+def test_processor_workers():
+    p = Processor() // Source.two_level(pulse=Pulse.gaussian({'width': 0.5})) // \
+        Detector.partition(thresholds=[0, 0.5, 1, 2])
+    expected = p.probs()
+
+    p.workers = 2
+    pn = p.probs()
+    assert all(isclose(pn[k], expected[k], abs_tol=1e-5) for k in expected.keys())
+
+
+def test_executor_session():
+    jumps = [sprepost(destroy(2), create(2))]
+    vprops = [VPropHTD(hamiltonian=[create(2) + destroy(2)], collapse_operators=[destroy(2)], jumps=jumps)
+              for _ in range(2)]
+    states = np.stack([ket2dm(basis(2, i % 2)).full() for i in range(10)])
+    virtual_configurations = [(k / 10,) for k in range(10)]
+
+    executor = VExecutor(2, chunk_size=3)
+    with executor.session(vprops):
+        pool = executor._pool
+        states_1 = executor.evolve(vprops[0], states, virtual_configurations, 0, 1)
+        states_2 = executor.evolve(vprops[1], states_1, virtual_configurations, 1, 2)
+        assert executor._pool is pool  # a single pool for all intervals
+    assert executor._pool is None
+
+    serial = vprops[1].evolve(vprops[0].evolve(states, virtual_configurations, 0, 1), virtual_configurations, 1, 2)
+    assert np.allclose(states_2, serial, atol=1e-5)
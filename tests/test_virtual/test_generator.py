@@ -39,7 +39,7 @@ def test_generator_time_independent():
     vstate = VState(state=istate, time=itime)
 
     vprop = gen.build_propagator(itime, parameters)
-    # assert isinstance(vprop, VPropTI)  # commented out since we use VPropHTD instead (much faster)
+    assert isinstance(vprop, VPropTI)
     assert vprop.jumps == []
 
     vstate.propagate(vprop, times[1])
@@ -63,3 +63,19 @@ def test_generator_time_independent():
     #
     # vtree.get_states()
     # vtree.get_points()
+
+
+def test_generator_time_independent_cache():
+    emitter = Emitter.two_level(modes=2)
+    gen = Generator(component=emitter)
+
+    vprop = gen.build_propagator(0.)
+    assert isinstance(vprop, VPropTI)
+    assert gen.build_propagator(0.) is vprop
+    assert gen.build_propagator(1.) is not vprop
+
+    vstates = [VState(state=emitter.states['|e>'], time=0.) for _ in range(2)]
+    vprop.propagate_batch(vstates, 1.)
+    assert all(vstate.time == 1. for vstate in vstates)
+    assert vstates[0] == vstates[1]
+    assert len(vprop._exponentials) == 1
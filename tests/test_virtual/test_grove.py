@@ -1,10 +1,12 @@
 from zpgenerator.virtual.tree import *
 from zpgenerator.virtual.configuration import PhysicalDetectorGate
-from zpgenerator.virtual.propagator import VPropTI
+from zpgenerator.virtual.propagator import VPropTI, VPropHTD
 from zpgenerator.network.detector import TimeBin
 from zpgenerator.virtual.grove import VGrove
+from zpgenerator.virtual.inverse import ConditionalStates
 from qutip import create, destroy, sprepost, liouvillian
 from numpy import log
+import numpy as np
 
 
 sigmaX = create(2) + destroy(2)
@@ -40,3 +42,66 @@ def test_virtual_grove_unnormalised_states():
     tensor.invert()
 
     assert list(tensor.tensor) == [0.25, 0.25]
+
+
+def test_virtual_grove_batch_propagation():
+    vdetector = PhysicalDetectorGate(resolution=1, gate=[0, log(2)])
+    branch = MeasurementBranch([TimeBin(vdetector, mode=0)])
+    jumps = [sprepost(destroy(2), create(2))]
+    vprop = VPropHTD(hamiltonian=[sigmaX], collapse_operators=[destroy(2)], jumps=jumps)
+
+    vgroves = []
+    for batch in [True, False]:
+        vgrove = VGrove(initial_time=0, states=[Qobj([[0, 0], [0, 1]]), Qobj([[1, 0], [0, 0]])], batch=batch)
+        vgrove.add_branches(time=0, branches=[branch])
+        vgrove.propagate(vprop, time=log(2))
+        vgroves.append(vgrove)
+
+    for batch_state, state in zip(vgroves[0].get_states(), vgroves[1].get_states()):
+        assert batch_state.time == state.time == log(2)
+        assert batch_state.virtual_configuration == state.virtual_configuration
+        assert (batch_state - state).norm() < 1e-5
+
+
+def test_virtual_grove_array_trees():
+    vdetectors = [PhysicalDetectorGate(resolution=1, gate=[0, log(2)]), PhysicalDetectorGate(resolution=1, gate=[0, 1])]
+    branches = [MeasurementBranch([TimeBin(vdetector, mode=0)]) for vdetector in vdetectors]
+    jumps = [sprepost(destroy(2), create(2))] * 2
+    vprop = VPropHTD(hamiltonian=[sigmaX], collapse_operators=[destroy(2)], jumps=jumps)
+
+    vgroves = []
+    for array in [True, False]:
+        vgrove = VGrove(initial_time=0, states=[Qobj([[0, 0], [0, 1]]), Qobj([[1, 0], [0, 0]])], array=array)
+        vgrove.initialize(time=1, branches=branches)
+        vgrove.apply_operator(Qobj([[0, 1], [1, 0]]))
+        vgrove.propagate(vprop, time=log(2))
+        vgroves.append(vgrove)
+
+    for array_tree, tree in zip(*vgroves):
+        assert array_tree.get_dimensions() == tree.get_dimensions() == [2, 2]
+        assert [s.virtual_configuration for s in array_tree.get_states()] == \
+               [s.virtual_configuration for s in tree.get_states()]
+        assert np.allclose(array_tree.build_probability_tensor(), tree.build_probability_tensor())
+        assert np.allclose(array_tree.build_state_tensor(), tree.build_state_tensor())
+
+    tensors = [vgrove.build_tensors(1, precision=8)[0] for vgrove in vgroves]
+    for tensor in tensors:
+        tensor.invert()
+    states = [tensor.extract_results() for tensor in tensors]
+    assert np.allclose(states[0][1, 1].full(), states[1][1, 1].full())
+    assert np.allclose(states[0].array, tensors[0].tensor)
+
+
+def test_conditional_states_lazy():
+    array = np.zeros((2, 3, 2, 2), dtype=complex)
+    array[..., 0, 0] = np.arange(6).reshape(2, 3)
+    array[1, 2, 1, 1] = 0.5
+    states = ConditionalStates(array, [[0, 1], [0, 1, 2]], [2])
+    assert len(states) == 6
+    assert list(states) == [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2)]
+    assert np.isclose(states[1, 2].tr(), 5.5)
+    assert np.allclose(list(states.traces().values()), [0, 1, 2, 3, 4, 5.5])
+
+    permuted = states.permute([1, 0])
+    assert permuted[2, 1] == states[1, 2]
+    assert np.shares_memory(permuted.array, array)
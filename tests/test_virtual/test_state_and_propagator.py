@@ -68,3 +68,51 @@ def test_state_jumps_unnormalised():
     vstate.propagate(propagator=vprop, t=log(2))
     assert vstate == Qobj([[0, 0], [0, 0.25]])
 
+
+def test_virtual_state_branch():
+    vstate = VState(state=Qobj([[0, 0], [0, 0.5]]), time=1)
+    branches = [vstate.branch(0), vstate.branch(1), vstate.branch(0.5, pos=2)]
+
+    assert [b.virtual_configuration for b in branches] == [(0,), (1,), (0, 0, 0.5)]
+    assert all(b.time == 1 and b.data.data is vstate.data.data for b in branches)
+
+    jumps = [sprepost(destroy(2), create(2))]
+    vprop = VPropTI(generator=liouvillian(0 * sigmaX, c_ops=[destroy(2)]), jumps=jumps)
+    branches[1].propagate(vprop, 2)
+
+    assert branches[1].data.data is not vstate.data.data
+    assert vstate == Qobj([[0, 0], [0, 0.5]])
+    assert branches[0] == Qobj([[0, 0], [0, 0.5]])
+
+
+def test_time_dependent_integrator_reuse():
+    func = Func(gaussian, args={'delay': 0.1, 'width': 0.01})
+    vprop = VPropHTD(hamiltonian=[0 * num(2), [sigmaX / 2, func]], collapse_operators=[destroy(2)],
+                     jumps=[sprepost(destroy(2), create(2))])
+    integrator = vprop.integrator()
+
+    vstates = [VState(state=fock(2, 0), time=0, virtual_configuration=[i]) for i in [0, 1]]
+    for vstate in vstates:
+        vstate.propagate(propagator=vprop, t=0.2)
+    assert vprop.integrator() is integrator
+
+    reference = VState(state=fock(2, 0), time=0, virtual_configuration=[1])
+    vprop.propagate_batch([reference], 0.2)
+    assert (vstates[1] - reference).norm() < 1e-10
+
+
+def test_time_dependent_cached_maps():
+    func = Func(gaussian, args={'delay': 0.1, 'width': 0.01})
+    vprop = VPropHTD(hamiltonian=[0 * num(2), [sigmaX / 2, func]], collapse_operators=[destroy(2)],
+                     jumps=[sprepost(destroy(2), create(2))], cache_maps=True)
+    assert not vprop.parallel
+
+    vstates = [VState(state=fock(2, i % 2), time=0, virtual_configuration=[i // 2]) for i in range(4)]
+    vprop.propagate_batch(vstates, 0.2)
+    assert len(vprop._maps) == 2
+
+    vprop.cache_maps = False
+    for i, vstate in enumerate(vstates):
+        reference = VState(state=fock(2, i % 2), time=0, virtual_configuration=[i // 2])
+        vprop.propagate_batch([reference], 0.2)
+        assert (vstate - reference).norm() < 1e-5
@@ -7,6 +7,7 @@ from ...misc.display import Display
 from ...simulate import Processor
 from typing import Union, List
 from qutip import Options
+from numpy import ndarray
 
 
 class SourceComponent(Component):
@@ -62,7 +63,7 @@ class SourceComponent(Component):
         Computes the average photon number of light from a port.
         :param port: the source port or list of ports to compute the statistics for.
         :param parameters: optional parameters to modify the system default parameters.
-        :param pseudo_limit: the numerical value approximating the zero-efficiency limit.
+        :param pseudo_limit: the numerical value approximating the zero-efficiency limit (None for exact moments).
         :return: the average photon number for the specified port.
         """
         self._make_processor()
@@ -74,7 +75,7 @@ class SourceComponent(Component):
         a method simulating a Hanbury-Brown and Twiss setup to compute the integrated intensity correlation: g(2).
         :param port: the source port or list of ports to compute the statistics for.
         :param parameters: optional parameters to modify the system default parameters.
-        :param pseudo_limit: the numerical value approximating the zero-efficiency limit.
+        :param pseudo_limit: the numerical value approximating the zero-efficiency limit (None for exact moments).
         :param update_mu: updating quality dictionary with the average photon number used to compute g(2).
         :return: the average photon number or a list of average photon numbers for each port specified.
         """
@@ -89,22 +90,48 @@ class SourceComponent(Component):
             update_mu: bool = False,
             update_g2: bool = False,
             update_M: bool = True,
-            update_coh: bool = True):
+            update_coh: bool = True,
+            backend: str = 'processor'):
         """
         a method simulating a Hong-Ou-Mandel setup to compute the Hong-Ou-Mandel visibility.
            :param port: the source port or list of ports to compute the average photon number for.
            :param phase: the phase of the HOM interferometer giving V_HOM.
            :param parameters: optional parameters to modify the system default parameters.
-           :param pseudo_limit: the numerical value approximating the zero-efficiency limit.
+           :param pseudo_limit: the numerical value approximating the zero-efficiency limit (None for exact moments).
            :param update_mu: updating source quality with the average photon number used to compute g(2).
            :param update_g2: updating source quality with the value of g(2) used to compute VHOM.
            :param update_M: updating source quality with the mean wavepacket overlap M.
            :param update_coh: updating source quality with the value of c(1) and c(2) given by HOM simulation.
+           :param backend: 'processor' to simulate two copies of the source, or 'factorized' to compute the
+                phase-averaged visibility from the two-time correlations of a single copy (which does not give c(2)).
            :return: the Hong-Ou-Mandel visibility of photons in each port specified.
         """
         self._make_processor()
         return self._quality_processor.hom(port, phase, parameters, pseudo_limit,
-                                           update_mu, update_g2, update_M, update_coh)
+                                           update_mu, update_g2, update_M, update_coh, backend)
+
+    def hom_fringe(self, phases: Union[List[float], ndarray], port: Union[int, str] = None,
+                   parameters: dict = None) -> ndarray:
+        """
+        Computes the Hong-Ou-Mandel visibility for an array of interferometer phases from a single set of simulations.
+        :param phases: a list or array of phases of the HOM interferometer.
+        :param port: the source port to compute the fringe for.
+        :param parameters: optional parameters to modify the system default parameters.
+        :return: an array of the Hong-Ou-Mandel visibility at each phase.
+        """
+        self._make_processor()
+        return self._quality_processor.hom_fringe(phases, port, parameters)
+
+    def quality_suite(self, port: Union[int, str] = None, metrics: List[str] = None, parameters: dict = None) -> dict:
+        """
+        Computes several figures of merit of light from a port from as few simulations as possible.
+        :param port: the source port to compute the figures of merit for.
+        :param metrics: a list of figures of merit among 'beta', 'mu', 'g2', 'vhom', 'M', 'c1', 'c2' (all by default).
+        :param parameters: optional parameters to modify the system default parameters.
+        :return: a dictionary of the requested figures of merit.
+        """
+        self._make_processor()
+        return self._quality_processor.quality_suite(port, metrics, parameters)
 
     def display_hom(self, port: Union[int, str] = None, pseudo_limit=None, parameters: dict = None):
         self._make_processor()
@@ -137,7 +164,8 @@ class SourceComponent(Component):
         return self._quality_processor.plot_lifetime(port, parameters, resolution, start, end, label, scale, options)
 
     def wigner(self, port: Union[int, str] = None, alpha: Union[complex, List[complex]] = 0, parameters: dict = None,
-               pseudo_limit: float = 0.01, options: Options = None, lo_resolution=600, lo_fluctuations=2):
+               pseudo_limit: float = 0.01, options: Options = None, lo_resolution=600, lo_fluctuations=2,
+               workers: int = None):
         """
         :param port: the port of the source being analysed
         :param alpha: a complex amplitude in phase space or a list of such amplitudes
@@ -146,11 +174,31 @@ class SourceComponent(Component):
         :param options: QuTiP options
         :param lo_resolution: the number of numerical points to interpolate the local oscillator shape
         :param lo_fluctuations: the maximum nonlinear fluctuation of local oscillator photons
+        :param workers: the number of worker processes sharing the amplitudes (None to use the current process)
         :return: the value W(alpha) of the Wigner function at the point alpha
         """
         self._make_processor()
         return self._quality_processor.wigner(port, alpha, parameters, pseudo_limit, options,
-                                              lo_resolution, lo_fluctuations)
+                                              lo_resolution, lo_fluctuations, workers)
+
+    def wigner_grid(self, x: Union[List[float], ndarray], p: Union[List[float], ndarray],
+                    port: Union[int, str] = None, parameters: dict = None, pseudo_limit: float = 0.01,
+                    options: Options = None, lo_resolution=600, lo_fluctuations=2, workers: int = None):
+        """
+        :param x: the real parts of the grid amplitudes
+        :param p: the imaginary parts of the grid amplitudes
+        :param port: the port of the source being analysed
+        :param parameters: a dictionary of parameters to modify the default parameters
+        :param pseudo_limit: a loss regime parameter for the pseudo-Wigner algorithm
+        :param options: QuTiP options
+        :param lo_resolution: the number of numerical points to interpolate the local oscillator shape
+        :param lo_fluctuations: the maximum nonlinear fluctuation of local oscillator photons
+        :param workers: the number of worker processes sharing the grid (None to use the current process)
+        :return: the values W(x + ip) of the Wigner function on the grid
+        """
+        self._make_processor()
+        return self._quality_processor.wigner_grid(x, p, port, parameters, pseudo_limit, options,
+                                                   lo_resolution, lo_fluctuations, workers)
 
 
 class GatedSourceComponent(SourceComponent):
@@ -31,7 +31,6 @@ class PhononAssistedSource(GatedSourceComponent):
         pulse = pulse if pulse else Pulse.gaussian(parameters=parameters)
 
         self.bath = PhononBath(material=material, temperature=temperature, resolution=resolution, max_power=max_power)
-        self.bath.initialize()
 
         emitter.add(Control.drive(pulse=pulse, transition=emitter.operators['lower']))
 
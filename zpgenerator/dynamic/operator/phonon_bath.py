@@ -1,10 +1,24 @@
-from numpy import pi, exp, cosh, sinh, linspace, sin, cos, sqrt, real, imag
+from numpy import pi, exp, cosh, sinh, linspace, sin, cos, sqrt, real, imag, outer, eye, savez, load, interp, \
+    ndim, where, errstate, asarray, minimum, amax
 from scipy.interpolate import interp1d
 from scipy.integrate import simps
 from qutip import Qobj, spre, spost, sprepost
 from ...time import PulseBase, TimeOperator
 from ...system import EnvironmentBase
-from functools import lru_cache, cached_property
+from ...time.evaluate.cache import LRUCache
+from functools import cached_property, partial
+import hashlib
+import os
+
+_tables = {}  # phonon tables shared by every bath of the process
+
+
+def simpson_weights(x):
+    """
+    :param x: the sample points.
+    :return: the weights w such that w @ y is the Simpson integral of the samples y.
+    """
+    return simps(eye(len(x)), x)
 
 
 class Material:
@@ -29,6 +43,15 @@ class Material:
         self.timescale = timescale
         self.alpha = 1 / (4 * (pi ** 2) * self.density * self.PLANCK_CONSTANT * (self.speed_of_sound ** 5))
 
+    def __getstate__(self):
+        # the polaron shift is cached on first use and is not part of the state of a material
+        return {k: v for k, v in self.__dict__.items() if k != 'polaron_shift'}
+
+    @property
+    def constants(self) -> tuple:
+        return (self.density, self.speed_of_sound, self.electron_deformation_constant, self.hole_deformation_constant,
+                self.electron_confinement, self.hole_confinement, self.timescale)
+
     def spectral_density(self, omega: float):
         omega = omega / self.timescale
         jspec = self.alpha * omega ** 3 * \
@@ -59,26 +82,42 @@ class Material:
 
 class PhononBath:
     """
-    A collection of parameters and methods to evaluate the environmental impact of a phonon bath on an emitter
+    A collection of parameters and methods to evaluate the environmental impact of a phonon bath on an emitter.
+    The tables of integrals are computed on first use, and shared by all baths of the process with the same material,
+    temperature, resolution and maximum power. If a directory is given, they are also saved to disk and shared across
+    processes and sessions.
     """
 
+    directory = None  # default directory of the on-disk tables
+
     def __init__(self,
                  material: Material,
                  temperature: float,
                  resolution: int = 150,
-                 max_power: float = 15):
+                 max_power: float = 15,
+                 directory: str = None):
+        """
+        :param material: the material of the phonon bath.
+        :param temperature: the temperature of the bath in Kelvin.
+        :param resolution: the number of points of the integration and interpolation grids.
+        :param max_power: the largest generalised Rabi frequency of the tables.
+        :param directory: an optional directory for the on-disk tables (defaults to PhononBath.directory).
+        """
         self.material = material
         self._temperature = temperature
         self.resolution = resolution
         self.max_power = max_power
-
-        self._temp_con = self.material.PLANCK_CONSTANT / \
-                         (2 * self.material.BOLTZMANN_CONSTANT * self.temperature * self.material.timescale)
+        self.directory = PhononBath.directory if directory is None else directory
 
         self._rs_func = None
         self._ic_func = None
         self._phi0 = None
         self._attenuation = None
+        self._rates = None
+
+    def __getstate__(self):
+        # the tables and rates are computed lazily from the key of the bath, and are not part of its state
+        return self.__dict__ | {'_rs_func': None, '_ic_func': None, '_phi0': None, '_attenuation': None, '_rates': None}
 
     @property
     def temperature(self):
@@ -89,6 +128,14 @@ class PhononBath:
         self._temperature = temperature
         self._rs_func = None
         self._ic_func = None
+        self._phi0 = None
+        self._attenuation = None
+        self._rates = None
+
+    @property
+    def _temp_con(self):
+        return self.material.PLANCK_CONSTANT / \
+            (2 * self.material.BOLTZMANN_CONSTANT * self.temperature * self.material.timescale)
 
     @property
     def polaron_shift(self):
@@ -96,120 +143,133 @@ class PhononBath:
 
     @property
     def attenuation(self):
+        if self._attenuation is None:
+            self.initialize()
         return self._attenuation
 
+    def _within_tables(self, rabi_r):
+        # generalised Rabi frequencies at the edge of the tables may round just above max_power
+        if amax(rabi_r) > self.max_power * (1 + 1e-12):
+            raise ValueError("The generalised Rabi frequency exceeds max_power, increase max_power of the phonon bath.")
+        return minimum(rabi_r, self.max_power)
+
     def _rs(self, rabi_r: float):
         if not self._rs_func:
             self.initialize()
-        return real(self._rs_func(rabi_r))
+        return real(self._rs_func(self._within_tables(rabi_r)))
 
     def _is(self, rabi_r: float):
         return self._is_func(rabi_r)
 
-    @lru_cache(maxsize=1)
     def _rc(self, rabi_r: float):
         return self._rc_func(rabi_r)
 
     def _ic(self, rabi_r: float):
         if not self._ic_func:
             self.initialize()
-        return real(self._ic_func(rabi_r))
+        return real(self._ic_func(self._within_tables(rabi_r)))
 
     @staticmethod
     def coth(x):
         return cosh(x) / sinh(x)
 
-    def _rs_integrand(self, delay, freq, rabi_r):
-        return self.material.spectral_density(freq) * \
-            self.coth(self._temp_con * freq) * cos(freq * delay) * sin(rabi_r * delay) / 2 if rabi_r else \
-            0 * sin(delay) * sin(freq)
-
     def _is_func(self, rabi_r: float):
         return - (pi / 4) * self.material.spectral_density(rabi_r)
 
     def _rc_func(self, rabi_r: float):
-        return (pi / 4) * self.material.spectral_density(rabi_r) * self.coth(self._temp_con * rabi_r) if rabi_r else 0
+        with errstate(divide='ignore', invalid='ignore'):
+            rc = (pi / 4) * self.material.spectral_density(rabi_r) * self.coth(self._temp_con * rabi_r)
+        return where(asarray(rabi_r) != 0, rc, 0)[()]
 
-    def _ic_integrand(self, delay, freq, rabi_r):
-        return -self.material.spectral_density(freq) * sin(freq * delay) * cos(rabi_r * delay) / 2
+    @property
+    def key(self) -> tuple:
+        return self.material.constants + (self.temperature, self.resolution, self.max_power)
 
-    def _phi0_integrand(self, freq):
-        return self.coth(self._temp_con * freq) * self.material.spectral_density(freq) / freq ** 2 if freq else 0
+    def _path(self) -> str:
+        return os.path.join(self.directory, 'phonon-' + hashlib.sha256(repr(self.key).encode()).hexdigest() + '.npz')
 
-    def initialize(self):
+    def compute_tables(self) -> dict:
+        """
+        Computes the rs and ic integrals for all generalised Rabi frequencies at once. The double integrals separate
+        into products of matrices with the Simpson weights of the delay and frequency grids.
 
+        :return: a dictionary with the power grid, the rs and ic integrals on the grid, and the phi0 integral.
+        """
         power_space = linspace(0, self.max_power, self.resolution)
         delay_space = linspace(0, 10, self.resolution)
         freq_space = linspace(1e-16, 10, self.resolution)
+        delay_weights, freq_weights = simpson_weights(delay_space), simpson_weights(freq_space)
+
+        density = self.material.spectral_density(freq_space) * freq_weights / 2
+        coth = self.coth(self._temp_con * freq_space)
+        phase = outer(delay_space, freq_space)
+
+        rs = sin(outer(power_space, delay_space)) * delay_weights @ (cos(phase) @ (density * coth))
+        ic = -cos(outer(power_space, delay_space)) * delay_weights @ (sin(phase) @ density)
+        phi0 = freq_weights @ (coth * self.material.spectral_density(freq_space) / freq_space ** 2)
+        return {'power': power_space, 'rs': rs, 'ic': ic, 'phi0': phi0}
+
+    def tables(self) -> dict:
+        """
+        :return: the tables of the bath, from the process registry, the on-disk cache, or computed.
+        """
+        tables = _tables.get(self.key)
+        if tables is None and self.directory is not None and os.path.exists(self._path()):
+            with load(self._path()) as file:
+                tables = {k: file[k] for k in file.files}
+        if tables is None:
+            tables = self.compute_tables()
+            if self.directory is not None:
+                os.makedirs(self.directory, exist_ok=True)
+                savez(self._path(), **tables)
+        _tables[self.key] = tables
+        return tables
 
-        rs_set = []
-        for rabi_r in power_space:
-            rs_eval = self._rs_integrand(delay_space[:, None], freq_space, rabi_r)
-            rs_set.append(simps(simps(rs_eval, freq_space), delay_space))
-        self._rs_func = interp1d(power_space, rs_set)
-
-        ic_set = []
-        for rabi_r in power_space:
-            ic_eval = self._ic_integrand(delay_space[:, None], freq_space, rabi_r)
-            ic_set.append(simps(simps(ic_eval, freq_space), delay_space))
-        self._ic_func = interp1d(power_space, ic_set)
-
-        self._phi0 = simps([self._phi0_integrand(f) for f in freq_space], freq_space)
+    def initialize(self):
+        tables = self.tables()
+        self._rs_func = interp1d(tables['power'], tables['rs'])
+        self._ic_func = interp1d(tables['power'], tables['ic'])
+        self._phi0 = float(tables['phi0'])
         self._attenuation = exp(-self._phi0 / 2)
 
     def rabi_r(self, rabi_x: float, rabi_y: float, detuning: float):
         return sqrt(rabi_x ** 2 + rabi_y ** 2 + detuning ** 2)
 
-    @lru_cache(maxsize=1)
-    def rabi_set(self, rabi, detuning: float):
-        rabi_x = real(rabi)
-        rabi_y = imag(rabi)
-        rabi_r = self.rabi_r(rabi_x, rabi_y, detuning)
-        return rabi_x, rabi_y, rabi_r
+    def coefficients(self, rabi_r, detuning: float) -> tuple:
+        """
+        :param rabi_r: the generalised Rabi frequency, or an array of them.
+        :param detuning: the detuning including the polaron shift.
+        :return: the coefficients c1, c2, c3, c4 and gamma*/|rabi| of the rates, which vanish when rabi_r is 0.
+        """
+        rabi_r = asarray(rabi_r, dtype=float)
+        with errstate(divide='ignore', invalid='ignore'):
+            coefficients = (self._rs(rabi_r) / rabi_r,
+                            detuning * self._rc(rabi_r) / rabi_r ** 2,
+                            self._is(rabi_r) / rabi_r,
+                            detuning * (self.polaron_shift / 2 + self._ic(rabi_r)) / rabi_r ** 2,
+                            sqrt(4 * self._rc(rabi_r)) / rabi_r)
+        return tuple(where(rabi_r != 0, coefficient, 0)[()] for coefficient in coefficients)
 
-    @lru_cache(maxsize=1)
-    def c1(self, rabi_r: float):
-        return self._rs(rabi_r) / rabi_r
-
-    @lru_cache(maxsize=1)
-    def c2(self, rabi_r: float, detuning: float):
-        return detuning * self._rc(rabi_r) / rabi_r ** 2
-
-    @lru_cache(maxsize=1)
-    def c3(self, rabi_r: float):
-        return self._is(rabi_r) / rabi_r
-
-    @lru_cache(maxsize=1)
-    def c4(self, rabi_r: float, detuning: float):
-        return detuning * (self.polaron_shift / 2 + self._ic(rabi_r)) / rabi_r ** 2
+    @property
+    def rates(self):
+        if self._rates is None:
+            self._rates = PhononRates(self)
+        return self._rates
 
     def cx_plus(self, rabi, parameters: dict = None):
-        detuning = self.polaron_shift + parameters['resonance']
-        rabi_x, rabi_y, rabi_r = self.rabi_set(rabi, detuning)
-        return rabi_y * self.c1(rabi_r) - rabi_x * self.c2(rabi_r, detuning) if rabi_r else 0
+        return self.rates(rabi, parameters)[0]
 
     def cx_minus(self, rabi, parameters: dict = None):
-        detuning = self.polaron_shift + parameters['resonance']
-        rabi_x, rabi_y, rabi_r = self.rabi_set(rabi, detuning)
-        return 1.j * (rabi_y * self.c3(rabi_r) - rabi_x * self.c4(rabi_r, detuning)) if rabi_r else 0
+        return self.rates(rabi, parameters)[1]
 
     def cy_plus(self, rabi, parameters: dict = None):
-        detuning = self.polaron_shift + parameters['resonance']
-        rabi_x, rabi_y, rabi_r = self.rabi_set(rabi, detuning)
-        return -(rabi_x * self.c1(rabi_r) + rabi_y * self.c2(rabi_r, detuning)) if rabi_r else 0
+        return self.rates(rabi, parameters)[2]
 
     def cy_minus(self, rabi, parameters: dict = None):
-        detuning = self.polaron_shift + parameters['resonance']
-        rabi_x, rabi_y, rabi_r = self.rabi_set(rabi, detuning)
-        return -1.j * (rabi_x * self.c3(rabi_r) + rabi_y * self.c4(rabi_r, detuning)) if rabi_r else 0
-
-    def _gamma_star_over_rc(self, rabi_x: float, rabi_y: float, rabi_r: float):
-        return 4 * (rabi_x ** 2 + rabi_y ** 2) / rabi_r ** 2 if rabi_r else 0
+        return self.rates(rabi, parameters)[3]
 
     def gamma_star(self, rabi, parameters: dict = None):
-        detuning = self.polaron_shift + parameters['resonance']
-        rabi_x, rabi_y, rabi_r = self.rabi_set(rabi, detuning)
-        return sqrt(self._rc(rabi_r) * self._gamma_star_over_rc(rabi_x, rabi_y, rabi_r))
+        return self.rates(rabi, parameters)[4]
 
     def op_plus(self, pauli: Qobj, num: Qobj):
         return sprepost(pauli, num) - spre(num * pauli) + sprepost(num, pauli) - spost(pauli * num)
@@ -226,26 +286,85 @@ class PhononBath:
 
         cache = True
         pulse.cache = True
-        cx_plus = PulseBase(pulse, cache=cache)
-        cx_plus.compose_with(self.cx_plus, parameters)
-
-        cx_minus = PulseBase(pulse, cache=cache)
-        cx_minus.compose_with(self.cx_minus, parameters)
+        operators = [self.op_plus(op_x, num), self.op_minus(op_x, num),
+                     self.op_plus(op_y, num), self.op_minus(op_y, num), num]
 
-        cy_plus = PulseBase(pulse, cache=cache)
-        cy_plus.compose_with(self.cy_plus, parameters)
+        # the five rates share one lookup of the rate tables at each time
+        environment = EnvironmentBase()
+        for index, operator in enumerate(operators):
+            rate = PulseBase(pulse, cache=cache)
+            rate.compose_with(self.rates.rate(index), parameters)
+            environment.add(TimeOperator(operator=operator, functions=rate))
 
-        cy_minus = PulseBase(pulse, cache=cache)
-        cy_minus.compose_with(self.cy_minus, parameters)
+        return environment
 
-        gamma_star = PulseBase(pulse, cache=cache)
-        gamma_star.compose_with(self.gamma_star, parameters)
 
-        environment = EnvironmentBase()
-        environment.add(TimeOperator(operator=self.op_plus(op_x, num), functions=cx_plus))
-        environment.add(TimeOperator(operator=self.op_minus(op_x, num), functions=cx_minus))
-        environment.add(TimeOperator(operator=self.op_plus(op_y, num), functions=cy_plus))
-        environment.add(TimeOperator(operator=self.op_minus(op_y, num), functions=cy_minus))
-        environment.add(TimeOperator(operator=num, functions=gamma_star))
+class PhononRates:
+    """
+    The rates cx+, cx-, cy+, cy- and gamma* of the environment of a phonon bath, evaluated together from a single
+    lookup. For each detuning, the coefficients of the rates are tabulated once on a grid of Rabi frequency amplitudes,
+    and the last evaluation is kept so that the five rates of one time step share it. Arrays of Rabi frequencies, such
+    as a pulse evaluated on a whole time grid, are evaluated at once.
+    """
 
-        return environment
+    def __init__(self, bath: PhononBath, resolution: int = 4000, maxsize: int = 64):
+        """
+        :param bath: the phonon bath.
+        :param resolution: the number of Rabi frequency amplitudes of each table.
+        :param maxsize: the maximum number of detunings whose tables are kept.
+        """
+        self.bath = bath
+        self.resolution = resolution
+        self._tables = LRUCache(maxsize)
+        self._last = (None, None, None)
+
+    def __getstate__(self):
+        # the tables and the last evaluation are results of the rates rather than part of their state
+        return self.__dict__ | {'_tables': LRUCache(self._tables.maxsize), '_last': (None, None, None)}
+
+    def table(self, detuning: float) -> tuple:
+        """
+        :param detuning: the detuning including the polaron shift.
+        :return: the grid of Rabi frequency amplitudes and the coefficients of the rates on the grid.
+        """
+        found, table = self._tables.get(detuning)
+        if not found:
+            # amplitudes whose generalised Rabi frequency remains within the bath tables
+            amplitudes = linspace(0, sqrt(max(self.bath.max_power ** 2 - detuning ** 2, 0)), self.resolution)
+            table = amplitudes, self.bath.coefficients(self.bath.rabi_r(amplitudes, 0, detuning), detuning)
+            self._tables.put(detuning, table)
+        return table
+
+    def __call__(self, rabi, parameters: dict = None) -> tuple:
+        """
+        :param rabi: the complex Rabi frequency, or an array of them.
+        :param parameters: the parameters containing the resonance of the emitter.
+        :return: the rates cx+, cx-, cy+, cy- and gamma*.
+        """
+        detuning = self.bath.polaron_shift + parameters['resonance']
+        last_rabi, last_detuning, rates = self._last
+        if ndim(rabi) == 0 and rabi == last_rabi and detuning == last_detuning:
+            return rates
+
+        amplitudes, coefficients = self.table(detuning)
+        self.bath._within_tables(self.bath.rabi_r(abs(rabi), 0, detuning))
+        c1, c2, c3, c4, g = (interp(abs(rabi), amplitudes, coefficient) for coefficient in coefficients)
+        rabi_x, rabi_y = real(rabi), imag(rabi)
+        rates = (rabi_y * c1 - rabi_x * c2,
+                 1.j * (rabi_y * c3 - rabi_x * c4),
+                 -(rabi_x * c1 + rabi_y * c2),
+                 -1.j * (rabi_x * c3 + rabi_y * c4),
+                 abs(rabi) * g)
+        if ndim(rabi) == 0:
+            self._last = (rabi, detuning, rates)
+        return rates
+
+    def _rate(self, index: int, rabi, parameters: dict = None):
+        return self(rabi, parameters)[index]
+
+    def rate(self, index: int) -> callable:
+        """
+        :param index: the index of the rate, ordered as cx+, cx-, cy+, cy- and gamma*.
+        :return: a function of the Rabi frequency and parameters returning a single rate.
+        """
+        return partial(self._rate, index)
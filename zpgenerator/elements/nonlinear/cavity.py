@@ -2,7 +2,7 @@ from ...system import NaturalSystem, HamiltonianBase, EnvironmentBase, EmitterBa
 from ...time import Operator, TimeOperator, TimeIntervalFunction, CompositeTimeOperator, PulseBase, Lifetime, \
     TimeInterval
 from ...time.parameters import parinit
-from numpy import linspace, sqrt, exp, pad, array
+from numpy import linspace, sqrt, exp, pad, array, interp
 from qutip import fock, destroy
 from typing import Union
 from scipy.interpolate import interp1d
@@ -125,21 +125,13 @@ class ShapedCavitySystem(CavitySystem):
             # https://journals.aps.org/prl/abstract/10.1103/PhysRevLett.123.123604
             decay = pad(cumulative_trapezoid(shape, times), (1, 0), 'constant')
             decay = shape / (1 - decay)
-            decay = interp1d(times, decay)
 
+            # linear interpolation evaluated at every solver step, vanishing outside the shape
             def decay_function(t, args):
-                try:
-                    return abs(decay(t))
-                except ValueError:
-                    return 0
-
-            shape = interp1d(times, shape)
+                return abs(interp(t, times, decay, left=0, right=0))
 
             def shape_function(t, args):
-                try:
-                    return shape(t)
-                except ValueError:
-                    return 0
+                return interp(t, times, shape, left=0, right=0)
 
             self.shape_function = shape_function
             self.decay_function = decay_function
@@ -1,3 +1,6 @@
 from .processor import Processor
+from .plan import SimulationPlan, PlanStep
+from .process import ConditionalProcess
+from .sweep import Sweep, SweepResult
 from .quality import ProcessorQuality
 from .algorithms import *
@@ -1,5 +1,10 @@
-from .distributions import compute_photon_number_distribution, PhotonNumberDistribution
+from .distributions import compute_photon_number_distribution, compute_adaptive_photon_number_distribution, \
+    PhotonNumberDistribution
 from .photon_statistics import compute_brightness, estimate_average_photon_number, estimate_intensity_correlation
 from .hong_ou_mandel import estimate_hom_visibility, estimate_hom_visibility_with_coherence
+from .moments import compute_factorial_moments, exact_average_photon_number, exact_intensity_correlation, \
+    exact_hom_visibility, exact_hom_visibility_with_coherence, compute_quality_suite, hom_fringe_harmonics, hom_fringe, \
+    warn_no_light
+from .correlations import TwoTimeCorrelations, compute_two_time_correlations, factorized_hom_visibility
 from .lifetime import compute_lifetime
-from .wigner import compute_wigner_function
+from .wigner import compute_wigner_function, WignerFunction, WignerGrid
@@ -0,0 +1,146 @@
+from .moments import photon_counting_processor, exact_intensity_correlation
+from ...network import AComponent
+from ...virtual import VState, VArrayTree
+from ...virtual.propagator import to_vectors, from_vectors
+from qutip import Options
+import numpy as np
+
+
+class TwoTimeCorrelations:
+    """
+    The mean field <a(t)>, intensity <a*a(t)> and first-order correlation <a*(t')a(t)> of the light from a source,
+    sampled on a grid of times. Stop times of the source appear twice in the grid, before and after any instantaneous
+    operation, so that the trapezoidal weights integrate discontinuous correlations exactly at those times.
+    """
+
+    def __init__(self, times: np.ndarray, weights: np.ndarray, field: np.ndarray, intensity: np.ndarray,
+                 correlation: np.ndarray):
+        """
+        :param times: the n times of the grid.
+        :param weights: the n trapezoidal integration weights of the grid.
+        :param field: the mean field at each time.
+        :param intensity: the intensity at each time.
+        :param correlation: an (n, n) array of <a*(t_j)a(t_k)>.
+        """
+        self.times = times
+        self.weights = weights
+        self.field = field
+        self.intensity = intensity
+        self.correlation = correlation
+
+    @property
+    def average_photon_number(self) -> float:
+        return float(self.weights @ self.intensity.real)
+
+    @property
+    def coherent_photon_number(self) -> float:
+        return float(self.weights @ abs(self.field) ** 2)
+
+    @property
+    def overlap(self) -> float:
+        """The integral of |<a*(t')a(t)>|^2 over both times, giving the mean wavepacket overlap once normalised."""
+        return float(self.weights @ abs(self.correlation) ** 2 @ self.weights)
+
+
+def _time_grid(stop_times: list, resolution: int) -> list:
+    # one sub-grid for each interval between stop times, so that both sides of every stop time are sampled
+    duration = stop_times[-1] - stop_times[0]
+    grids = []
+    for t0, t1 in zip(stop_times[:-1], stop_times[1:]):
+        steps = max(1, round((t1 - t0) / duration * resolution)) if duration else 1
+        grids.append(np.linspace(t0, t1, steps + 1))
+    return grids
+
+
+def compute_two_time_correlations(source: AComponent, port: int, parameters: dict = None, resolution: int = 400,
+                                  options: Options = None) -> TwoTimeCorrelations:
+    """
+    Computes the two-time correlations of the light from a source port using the quantum regression theorem on the
+    space of the source alone. The operator a(t)rho(t) is added to a stack of states at each time of the grid, and the
+    whole stack is propagated together, so that every correlation is obtained from a single pass through the grid.
+
+    :param source: the source component.
+    :param port: the source port.
+    :param parameters: optional parameters to modify the default parameters.
+    :param resolution: the approximate number of time steps of the grid.
+    :param options: options for the ODE solver.
+    :return: a TwoTimeCorrelations object.
+    """
+    processor = photon_counting_processor(source, port)
+    component = processor.component
+    _, binned_detectors = processor._build_branches(component.set_parameters(parameters))
+    mode = list(binned_detectors.values())[0][0].mode
+    generator = processor._get_generator({})  # the unmonitored evolution
+
+    stop_times = component.times(parameters)
+    initial_time = processor._get_initial_time(stop_times)
+    final_time = processor._get_final_time(stop_times)
+    stop_times = [initial_time] + [t for t in stop_times if initial_time < t < final_time] + [final_time]
+    grids = _time_grid(stop_times, resolution)
+
+    size = sum(len(grid) for grid in grids)
+    times, weights = np.zeros(size), np.zeros(size)
+    field, intensity = np.zeros(size, dtype=complex), np.zeros(size, dtype=complex)
+    correlation = np.zeros((size, size), dtype=complex)
+
+    # the first state of the stack is rho(t), the others are the states a(t_k)rho(t_k) evolved up to time t
+    tree = VArrayTree(VState(state=processor.initial_state, time=initial_time))
+    tree.states = tree.states[np.newaxis]
+
+    node = 0
+    for t0, grid in zip(stop_times[:-1], grids):
+        if component.is_dirac(t0, parameters):
+            tree.apply_operator(component.evaluate_dirac(t0, parameters))
+        propagator = generator.build_propagator(t0, parameters=parameters, options=options)
+        transition = component.evaluate_quadruple(t0, parameters).transitions[mode]  # valid until the next stop time
+        for k, t in enumerate(grid):
+            if k:
+                states = tree.leaf_states()
+                # once the stack outgrows the operator basis, it is cheaper to propagate the basis
+                superoperator = propagator.superoperator((), grid[k - 1], t, tree.dim) \
+                    if tree.dim ** 2 < len(states) else NotImplemented
+                if superoperator is NotImplemented:
+                    states = propagator.evolve_chain(states, [], grid[k - 1], t)
+                else:
+                    states = from_vectors(superoperator @ to_vectors(states), tree.dim)
+                tree.set_leaf_states(states, t)
+                weights[node - 1] += (t - grid[k - 1]) / 2
+                weights[node] += (t - grid[k - 1]) / 2
+
+            a = transition.evaluate(t).full()
+            states = tree.leaf_states()
+            shifted = a @ states[0]
+            times[node] = t
+            field[node] = np.trace(shifted)
+            intensity[node] = np.trace(a.conj().T @ shifted)
+            correlation[node, :node] = np.einsum('ij,kji->k', a.conj().T, states[1:])
+            correlation[node, node] = intensity[node]
+            correlation[:node, node] = correlation[node, :node].conj()
+
+            tree.states = np.concatenate([states, shifted[np.newaxis]])
+            node += 1
+
+    return TwoTimeCorrelations(times, weights, field, intensity, correlation)
+
+
+def factorized_hom_visibility(source: AComponent, port: int, parameters: dict = None, resolution: int = 400,
+                              options: Options = None) -> tuple:
+    """
+    Computes the Hong-Ou-Mandel visibility between two independent copies of a source from the correlations of a
+    single copy, avoiding the doubled Hilbert space of hong_ou_mandel_processor. The mean wavepacket overlap is
+    M = int |<a*(t')a(t)>|^2 / <n>^2, the visibility is V = M - g(2), and c(1) = int |<a(t)>|^2 / <n>.
+
+    :param source: the source component.
+    :param port: the source port.
+    :param parameters: optional parameters to modify the default parameters.
+    :param resolution: the approximate number of time steps of the correlation grid.
+    :param options: options for the ODE solver.
+    :return: the visibility, the mean wavepacket overlap, and the first-order number coherence.
+    """
+    correlations = compute_two_time_correlations(source, port, parameters, resolution, options)
+    mu = correlations.average_photon_number
+    assert mu != 0, "No light detected, normalization is 0"
+    g2, _ = exact_intensity_correlation(source, port, parameters)
+
+    overlap = correlations.overlap / mu ** 2
+    return overlap - g2, overlap, correlations.coherent_photon_number / mu
@@ -1,10 +1,14 @@
 from ..base_processor import ProcessorBase
 from ...network import DetectorGate, make_masked_source
+from ...virtual import NestedFourierDetectorGate
 from .photon_statistics import compute_average_photon_number, compute_intensity_correlation, compute_parity_summation
 from ...time.parameters import TupleDict
 from math import isclose
 from typing import Union, List
+from fractions import Fraction
 from numpy import real
+from numpy.fft import ifft
+import numpy as np
 import matplotlib.pyplot as plt
 
 
@@ -26,13 +30,14 @@ class Distribution(TupleDict):
         return sum(self.norm_function(v) for v in self.values())
 
     def is_normalized(self, rtol=None, atol=None):
-        return isclose(self.norm(), 1,
+        return isclose(self.norm, 1,
                        rel_tol=10 ** (-self.precision) if rtol is None else rtol,
                        abs_tol=10 ** (-self.precision) if atol is None else atol)
 
     def normalize(self):
+        norm = self.norm
         for k, v in self.items():
-            self[k] = self[k] / self.norm
+            self[k] = v / norm
 
     def chop(self, normalize: bool = True):
         dictionary = {k: self.chop_function(v) for k, v in self.items()
@@ -71,13 +76,14 @@ class ScalarDistribution(Distribution):
         return sum(self.norm_function(v) for v in self.values())
 
     def is_normalized(self, rtol=None, atol=None):
-        return isclose(self.norm(), 1,
+        return isclose(self.norm, 1,
                        rel_tol=10 ** (-self.precision) if rtol is None else rtol,
                        abs_tol=10 ** (-self.precision) if atol is None else atol)
 
     def normalize(self):
+        norm = self.norm
         for k, v in self.items():
-            self[k] = self[k] / self.norm
+            self[k] = v / norm
 
     @property
     def _header(self):
@@ -128,9 +134,16 @@ class PhotonNumberDistribution(ProbabilityDistribution):
     A distribution of photon number probabilities for a single mode/detector
     """
 
-    def precision_check(self, precision):
-        if self[len(self) - 1] > 10 ** (2 - precision) and len(self) > 2:
+    def precision_check(self, precision, warn: bool = True) -> bool:
+        """
+        :param precision: the requested precision.
+        :param warn: whether to print a warning if the truncation is too low.
+        :return: whether the truncation is high enough to achieve the requested precision.
+        """
+        converged = not (self[len(self) - 1] > 10 ** (2 - precision) and len(self) > 2)
+        if warn and not converged:
             print("Warning: truncation may be too low to achieve requested precision.")
+        return converged
 
     def gn(self, order: int):
         return round(compute_intensity_correlation(self, order), self.display_precision)
@@ -168,27 +181,249 @@ class PhotonNumberDistribution(ProbabilityDistribution):
 
 class CorrelationDistribution(ScalarDistribution):
     """
-    A distribution of detection probabilities for mixed detection patterns
+    A distribution of detection probabilities for mixed detection patterns. The values are stored in a dense array
+    with one axis for each detection bin, whose entries are labelled by the outcomes of the bin, and the dictionary
+    interface is a view of the patterns present in the array.
     """
 
+    def __init__(self, dictionary: dict = None, precision: int = None, type='positive', names: list = None):
+        """
+        :param dictionary: a dictionary of detection patterns and their values.
+        :param precision: the precision of the values.
+        :param type: 'positive' for probabilities, 'real' for real expectation values, or 'complex'.
+        :param names: optional names of the detection bins, ordered as the patterns.
+        """
+        self.type = type
+        self.names = names
+        self.labels = []  # the outcome labels of each axis
+        self._index = []
+        self.array = np.zeros((), dtype=self._dtype)
+        self.mask = np.zeros((), dtype=bool)  # the patterns present in the distribution
+        super().__init__(None, precision, type)
+        if dictionary:
+            self.data = dictionary
+
+    @classmethod
+    def from_array(cls, array: np.ndarray, labels: List[list] = None, precision: int = None, type='positive',
+                   names: list = None, mask: np.ndarray = None):
+        """
+        :param array: an array of values with one axis for each detection bin.
+        :param labels: the outcome labels of each axis (defaults to the indices of the axis).
+        :param precision: the precision of the values.
+        :param type: 'positive' for probabilities, 'real' for real expectation values, or 'complex'.
+        :param names: optional names of the detection bins.
+        :param mask: the patterns present in the distribution (defaults to all patterns).
+        :return: a CorrelationDistribution sharing the array when its type already matches.
+        """
+        distribution = cls(precision=precision, type=type, names=names)
+        distribution._set_labels([list(range(0, n)) for n in np.shape(array)] if labels is None else labels)
+        distribution.array = distribution._convert(np.asarray(array))
+        distribution.mask = np.ones(np.shape(array), dtype=bool) if mask is None else mask
+        return distribution
+
+    @property
+    def _dtype(self):
+        return complex if self.type == 'complex' else float
+
+    def _convert(self, values):
+        if self.type == 'real' or self.type == 'positive':
+            values = real(values)
+        if self.type == 'positive':
+            values = np.maximum(values, 0) if np.any(values < 0) else values
+        return values.astype(self._dtype, copy=False)
+
+    def _set_labels(self, labels: List[list]):
+        self.labels = [list(axis) for axis in labels]
+        self._index = [{label: i for i, label in enumerate(axis)} for axis in self.labels]
+
+    @property
+    def data(self) -> dict:
+        return dict(self.items())
+
+    @data.setter
+    def data(self, dictionary: dict):
+        keys = [self._to_tuple(k) for k in dictionary.keys()]
+        assert all(isinstance(k, tuple) and len(k) == len(keys[0]) for k in keys), \
+            "Keys must be tuples of the same length"
+        labels = []
+        for axis in zip(*keys) if keys else []:
+            try:
+                labels.append(sorted(set(axis)))
+            except TypeError:  # outcomes that cannot be ordered keep their order of appearance
+                labels.append(list(dict.fromkeys(axis)))
+        self._set_labels(labels)
+        self.array = np.zeros(tuple(len(axis) for axis in labels), dtype=self._dtype)
+        self.mask = np.zeros(self.array.shape, dtype=bool)
+        if keys:
+            position = tuple(np.array([self._index[a][k[a]] for k in keys], dtype=int) for a in range(len(labels)))
+            self.array[position] = self._convert(np.asarray(list(dictionary.values())))
+            self.mask[position] = True
+
+    def _position(self, key: tuple):
+        # the position of a pattern in the array, or None if one of its outcomes was never seen on its axis
+        try:
+            return tuple(index[k] for index, k in zip(self._index, key)) if len(key) == self.array.ndim else None
+        except (KeyError, TypeError):
+            return None
+
     def __setitem__(self, key, value):
         assert isinstance(key, tuple), "Key must be a tuple"
-        super().__setitem__(key, value)
+        if not self.mask.any() and len(key) != self.array.ndim:  # the first pattern sets the number of axes
+            self._set_labels([[] for _ in key])
+            self.array = np.zeros((0,) * len(key), dtype=self._dtype)
+            self.mask = np.zeros(self.array.shape, dtype=bool)
+        assert len(key) == self.array.ndim, "Keys must be tuples of the same length"
+        for axis, k in enumerate(key):
+            if k not in self._index[axis]:  # a new outcome extends the axis
+                self._index[axis][k] = len(self.labels[axis])
+                self.labels[axis].append(k)
+                padding = [(0, 0)] * self.array.ndim
+                padding[axis] = (0, 1)
+                self.array = np.pad(self.array, padding)
+                self.mask = np.pad(self.mask, padding)
+        position = self._position(key)
+        self.array[position] = self._convert(np.asarray(value))
+        self.mask[position] = True
 
     def __getitem__(self, item):
-        item = self._to_tuple(item)
-        return super().__getitem__(item) if self._to_tuple(item) in self.keys() else 0.
+        position = self._position(self._to_tuple(item))
+        return self.array[position] if position is not None and self.mask[position] else 0.
+
+    def __delitem__(self, key):
+        position = self._position(self._to_tuple(key))
+        assert position is not None and self.mask[position], "Pattern is not in the distribution"
+        self.array[position] = 0
+        self.mask[position] = False
+
+    def __contains__(self, key):
+        position = self._position(self._to_tuple(key))
+        return position is not None and bool(self.mask[position])
+
+    def __iter__(self):
+        for position in zip(*np.nonzero(self.mask)):
+            yield tuple(axis[i] for axis, i in zip(self.labels, position))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.mask))
+
+    def clear(self):
+        self.data = {}
+
+    def copy(self):
+        return self._new(self.array.copy(), self.labels, self.mask.copy(), self.names)
+
+    def _new(self, array: np.ndarray, labels: List[list], mask: np.ndarray, names: list = None):
+        return CorrelationDistribution.from_array(array, labels, precision=self.precision, type=self.type,
+                                                  names=names, mask=mask)
+
+    def to_numpy(self) -> np.ndarray:
+        """
+        :return: the array of values (not a copy), with zeros for patterns absent from the distribution.
+        """
+        return self.array
+
+    @property
+    def norm(self):
+        return float(np.sum(abs(self.array)))
+
+    def normalize(self):
+        self.array = self.array / self.norm
+
+    def chop(self, normalize: bool = True):
+        keep = self.mask & (abs(self.array) > 10 ** (-self.precision + 1))
+        if self.type == 'positive':
+            values = np.round(abs(self.array), self.precision)
+        elif self.type == 'real':
+            values = np.round(real(self.array), self.precision)
+        else:
+            values = np.round(self.array, self.precision)
+        self.array = np.where(keep, values, 0).astype(self._dtype)
+        self.mask = keep
+        if normalize:
+            self.normalize()
+
+    def real(self):
+        self.array = real(self.array).astype(self._dtype)
+
+    def abs(self):
+        self.array = abs(self.array).astype(self._dtype)
 
     @property
     def _header(self):
         return ["Pattern", "Probability" if self.type == 'positive' else "Expectation"]
 
-    def trace(self, position: Union[int, List[int]]):
-        if isinstance(position, list):
-            for p in reversed(sorted(position)):
-                self.trace(p)
-        else:
-            pass
+    def _axis(self, axis: Union[int, str]) -> int:
+        return self.names.index(axis) if isinstance(axis, str) and self.names else axis
+
+    def _names(self, axes: List[int]):
+        return [self.names[a] for a in axes] if self.names else None
+
+    def marginal(self, axes: Union[int, str, list]):
+        """
+        :param axes: the axis, or list of axes, to keep (by position or bin name).
+        :return: the marginal distribution of the kept axes, ordered as given.
+        """
+        axes = [self._axis(a) for a in (axes if isinstance(axes, list) else [axes])]
+        others = tuple(a for a in range(self.array.ndim) if a not in axes)
+        order = np.argsort(np.argsort(axes))  # the summed array keeps the axes in increasing order
+        array = self.array.sum(axis=others).transpose(order)
+        mask = self.mask.any(axis=others).transpose(order)
+        return self._new(array, [self.labels[a] for a in axes], mask, self._names(axes))
+
+    def trace(self, position: Union[int, str, List[int]]):
+        """
+        Sums over the outcomes of one or more axes, removing them from the distribution.
+
+        :param position: the axis, or list of axes, to trace out (by position or bin name).
+        """
+        positions = [self._axis(p) for p in (position if isinstance(position, list) else [position])]
+        traced = self.marginal([a for a in range(self.array.ndim) if a not in positions])
+        self.array, self.mask, self.names = traced.array, traced.mask, traced.names
+        self._set_labels(traced.labels)
+
+    def condition(self, axis: Union[int, str], outcome):
+        """
+        :param axis: the axis to condition on (by position or bin name).
+        :param outcome: the outcome of the axis.
+        :return: the distribution of the other axes given the outcome, normalised for probabilities.
+        """
+        axis = self._axis(axis)
+        index = self._index[axis][outcome]
+        array = np.take(self.array, index, axis=axis)
+        mask = np.take(self.mask, index, axis=axis)
+        others = [a for a in range(self.array.ndim) if a != axis]
+        distribution = self._new(array, [self.labels[a] for a in others], mask, self._names(others))
+        if self.type == 'positive':
+            assert distribution.norm > 0, "The outcome has zero probability."
+            distribution.normalize()
+        return distribution
+
+    def coarse_grain(self, axes: List[Union[int, str]], threshold: bool = False, name: str = None):
+        """
+        Merges several detection bins into one that counts the total number of detected photons.
+
+        :param axes: the axes to merge (by position or bin name), replaced by a single axis at the first position.
+        :param threshold: whether the merged bin only distinguishes zero from at least one photon.
+        :param name: the name of the merged bin.
+        :return: the coarse-grained distribution.
+        """
+        axes = [self._axis(a) for a in axes]
+        assert all(isinstance(k, (int, np.integer)) for a in axes for k in self.labels[a]), \
+            "Only photon number outcomes can be coarse-grained."
+        others = [a for a in range(self.array.ndim) if a not in axes]
+        totals = sum(np.meshgrid(*[np.array(self.labels[a]) for a in axes], indexing='ij')).ravel()
+        totals = np.minimum(totals, 1) if threshold else totals
+        onehot = np.zeros((len(totals), int(totals.max()) + 1))
+        onehot[np.arange(len(totals)), totals] = 1
+
+        def merge(array):
+            array = np.transpose(array, others + axes)
+            return np.moveaxis(array.reshape(array.shape[:len(others)] + (-1,)) @ onehot, -1, min(axes))
+
+        kept = [a for a in others if a < min(axes)] + [None] + [a for a in others if a > min(axes)]
+        labels = [self.labels[a] if a is not None else list(range(0, onehot.shape[1])) for a in kept]
+        names = [self.names[a] if a is not None else name for a in kept] if self.names else None
+        return self._new(merge(self.array), labels, merge(self.mask.astype(float)) > 0, names)
 
 
 # Compute the photon number probabilities of a source using a single-mode Processor
@@ -204,6 +439,39 @@ def compute_photon_number_distribution(source: ProcessorBase, truncation: int, p
     return distribution
 
 
+def compute_adaptive_photon_number_distribution(source: ProcessorBase, port: int = 0, parameters: dict = None,
+                                                max_resolution: int = 255):
+    """
+    Computes the photon number probabilities of a source port without choosing a truncation in advance. The
+    generating function is sampled at roots of unity on nested grids whose order is doubled until the distribution
+    passes the precision check of the source, and each refinement only simulates the roots new to the finer grid.
+
+    :param source: the processor containing the source.
+    :param port: the source port.
+    :param parameters: optional parameters to modify the default parameters.
+    :param max_resolution: the highest number of photons resolved before giving up on convergence.
+    :return: a PhotonNumberDistribution object.
+    """
+    detector = NestedFourierDetectorGate(resolution=3)
+    p = ProcessorBase(make_masked_source(source.component, port))
+    p.add(0, detector)
+    p.copy_conditions(source)
+
+    points = {}  # generating function values indexed by the fraction of a turn of their root of unity
+    while True:
+        size = detector.resolution + 1
+        points.update(zip([Fraction(n, size) for n in detector.indices], p.generating_points(parameters=parameters)[0]))
+        probabilities = real(ifft([points[Fraction(n, size)] for n in range(0, size)]))
+
+        distribution = PhotonNumberDistribution({(n,): v for n, v in enumerate(probabilities)}, precision=p.precision)
+        last = detector.resolution >= max_resolution
+        if distribution.precision_check(p.precision, warn=last) or last:
+            break
+        detector.refine()
+
+    return distribution
+
+
 class StateDistribution(Distribution):
 
     def norm_function(self, value):
@@ -0,0 +1,271 @@
+from ..base_processor import ProcessorBase
+from .hong_ou_mandel import hong_ou_mandel_processor
+from ...network import AComponent, DetectorGate, make_masked_source
+from ...virtual import VState, VArrayTree
+from itertools import product
+from math import factorial, prod, pi
+from qutip import Options
+from typing import List
+import numpy as np
+
+
+def warn_no_light(modes: int, port: int):
+    """
+    Warns that the intensity correlation of a port cannot be defined because no light is detected.
+
+    :param modes: the number of modes of the source.
+    :param port: the port of the source.
+    """
+    print("Warning: no light detected in mode " + ('' if modes == 1 else str(port)) + ', ' +
+          ('g2' if modes == 1 else 'g2 ' + str(port)) +
+          " cannot be defined.")
+
+
+def moment_indices(orders: tuple) -> List[tuple]:
+    """
+    :param orders: the highest order of the moments for each detector bin.
+    :return: all multi-indices of moments up to the given orders, starting with the zeroth moment.
+    """
+    return list(product(*[range(order + 1) for order in orders]))
+
+
+def moment_links(indices: List[tuple]) -> List[List[tuple]]:
+    """
+    :param indices: a list of moment multi-indices.
+    :return: for each detector bin, the (source, target) positions of moments that differ by one order in that bin.
+    """
+    position = {index: k for k, index in enumerate(indices)}
+    assert all(index[:i] + (index[i] - 1,) + index[i + 1:] in position
+               for index in indices for i in range(len(index)) if index[i]), "Lowered multi-indices are missing."
+    return [[(position[index[:i] + (index[i] - 1,) + index[i + 1:]], k) for k, index in enumerate(indices) if index[i]]
+            for i in range(len(indices[0]))]
+
+
+def propagate_chain(processor: ProcessorBase, size: int, links: List[List[tuple]], initial: List[int] = (0,),
+                    parameters: dict = None, options: Options = None) -> np.ndarray:
+    """
+    Propagates a chain of density matrices through a processor with ideal detectors (see evolve_chain). A link (k, k)
+    of a detector bin evolves the state k in the configuration where every photon of that bin is detected.
+
+    :param processor: a processor with ideal detectors.
+    :param size: the number of density matrices in the chain.
+    :param links: for each detector bin, the (source, target) positions of linked density matrices.
+    :param initial: the positions of the chain starting from the initial state, the others starting from zero.
+    :param parameters: optional parameters to modify the default parameters.
+    :param options: options for the ODE solver.
+    :return: the traces of the propagated density matrices.
+    """
+    component = processor.component
+    times = component.times(parameters)
+    initial_time = processor._get_initial_time(times)
+    final_time = processor._get_final_time(times)
+    times = [initial_time] + [t for t in times if initial_time < t < final_time] + [final_time]
+
+    _, binned_detectors = processor._build_branches(component.set_parameters(parameters))
+    assert len(links) == len(binned_detectors), "Links must be given for each detector bin."
+    generator = processor._get_generator(binned_detectors)
+
+    tree = VArrayTree(VState(state=processor.initial_state, time=initial_time))
+    states = np.zeros((size,) + tree.states.shape, dtype=complex)
+    states[list(initial)] = tree.states
+    tree.states = states
+
+    for t0, t1 in zip(times[:-1], times[1:]):
+        if component.is_dirac(t0, parameters):
+            tree.apply_operator(component.evaluate_dirac(t0, parameters))
+        propagator = generator.build_propagator(t0, parameters=parameters, options=options)
+        states = propagator.evolve_chain(tree.leaf_states(), links, t0, t1)
+        assert states is not NotImplemented, "The propagator cannot evolve moments."
+        tree.set_leaf_states(states, t1)
+
+    return np.einsum('kii->k', tree.leaf_states())
+
+
+def compute_factorial_moments(processor: ProcessorBase, orders: tuple, parameters: dict = None,
+                              options: Options = None, indices: List[tuple] = None) -> dict:
+    """
+    Computes the factorial moments of the number of photons detected in each detector bin, as exact derivatives of the
+    generating function at zero efficiency. The derivatives are propagated together with the state by the
+    block-triangular generator [[L, -J], [0, L]] (with one block per order), so that a single evolution is needed.
+
+    :param processor: a processor with ideal detectors.
+    :param orders: the highest order of the moments for each detector bin.
+    :param parameters: optional parameters to modify the default parameters.
+    :param options: options for the ODE solver.
+    :param indices: an optional subset of the multi-indices up to the given orders, containing every multi-index
+        obtained by lowering one of its orders.
+    :return: a dictionary of factorial moments <prod_i n_i! / (n_i - k_i)!> for each multi-index k.
+    """
+    indices = moment_indices(orders) if indices is None else list(indices)
+    assert indices[0] == (0,) * len(orders), "The zeroth moment must come first."
+
+    # each position of the chain holds one Taylor coefficient of the state, starting from (rho, 0, ..., 0)
+    traces = propagate_chain(processor, len(indices), moment_links(indices), parameters=parameters, options=options)
+    return {index: (-1) ** sum(index) * prod(factorial(k) for k in index) * traces[k].real
+            for k, index in enumerate(indices)}
+
+
+def photon_counting_processor(source: AComponent, port: int) -> ProcessorBase:
+    p = ProcessorBase(make_masked_source(source, port))
+    p.add(0, DetectorGate(resolution=1))
+    return p
+
+
+def exact_average_photon_number(source: AComponent, port: int, parameters: dict = None) -> float:
+    moments = compute_factorial_moments(photon_counting_processor(source, port), (1,), parameters)
+    return moments[(1,)]
+
+
+def exact_intensity_correlation(source: AComponent, port: int, parameters: dict = None):
+    """
+    :return: the integrated intensity correlation g(2) = <n(n-1)>/<n>^2 and the average photon number <n>.
+    """
+    moments = compute_factorial_moments(photon_counting_processor(source, port), (2,), parameters)
+    mu = moments[(1,)]
+    if mu > 10 ** -8:
+        return moments[(2,)] / mu ** 2, mu
+    else:
+        warn_no_light(source.modes, port)
+        return None, mu
+
+
+def _hom_moments(source: AComponent, port: int, phi: float, parameters: dict = None) -> dict:
+    moments = compute_factorial_moments(hong_ou_mandel_processor(source, port, phi), (1, 1), parameters)
+    assert moments[(1, 0)] + moments[(0, 1)] != 0, "No light detected, normalization is 0"
+    return moments
+
+
+def _hom_visibility(moments: dict) -> float:
+    return 1 - 8 * moments[(1, 1)] / (moments[(1, 0)] + moments[(0, 1)]) ** 2
+
+
+def _hom_coherence(moments1: dict, moments2: dict) -> tuple:
+    norm = moments1[(1, 0)] + moments1[(0, 1)]
+
+    c1 = 2 * abs(moments1[(1, 0)] - moments2[(1, 0)]) / norm
+    c2 = 4 * abs(moments1[(1, 1)] - moments2[(1, 1)]) / norm ** 2
+    vhom = 1 - 4 * (moments1[(1, 1)] + moments2[(1, 1)]) / norm ** 2
+
+    return vhom, c1, c2
+
+
+def exact_hom_visibility(source: AComponent, port: int, parameters: dict = None, phi: float = pi / 4) -> float:
+    # the lossy limit formulas of the estimates become exact when applied to the factorial moments
+    return _hom_visibility(_hom_moments(source, port, phi, parameters))
+
+
+def exact_hom_visibility_with_coherence(source: AComponent, port: int, parameters: dict = None) -> tuple:
+    moments1 = _hom_moments(source, port, 0, parameters)  # minimum 2-photon fringe
+    moments2 = _hom_moments(source, port, pi / 2, parameters)  # maximum 2-photon fringe
+    return _hom_coherence(moments1, moments2)
+
+
+def hom_fringe_harmonics(source: AComponent, port: int, parameters: dict = None) -> tuple:
+    """
+    Computes the Fourier harmonics of the coincidence moment <n_c n_d>(phi) of a Hong-Ou-Mandel interferometer with
+    a phase phi on one arm. Each output field is linear in exp(i phi), so the moment only contains the harmonics
+    exp(ik phi) with |k| <= 2, which are obtained exactly from five evenly spaced phases.
+
+    :param source: the source component.
+    :param port: the source port.
+    :param parameters: optional parameters to modify the default parameters.
+    :return: the harmonics of orders 0, 1, 2 and the normalisation <n_c + n_d>, which does not depend on the phase.
+    """
+    phases = 2 * pi * np.arange(5) / 5
+    moments = [_hom_moments(source, port, phi, parameters) for phi in phases]
+    harmonics = np.fft.fft([m[(1, 1)] for m in moments]) / len(phases)
+    norm = np.mean([m[(1, 0)] + m[(0, 1)] for m in moments])
+    return harmonics[:3], norm
+
+
+def hom_fringe(harmonics: np.ndarray, norm: float, phases: np.ndarray) -> np.ndarray:
+    """
+    :param harmonics: the harmonics of orders 0, 1, 2 of the coincidence moment.
+    :param norm: the normalisation of the coincidence moment.
+    :param phases: an array of interferometer phases.
+    :return: the Hong-Ou-Mandel visibility at each phase.
+    """
+    phases = np.asarray(phases, dtype=float)
+    coincidences = harmonics[0].real + 2 * sum((harmonics[k] * np.exp(1j * k * phases)).real for k in [1, 2])
+    return 1 - 8 * coincidences / norm ** 2
+
+
+quality_metrics = ['beta', 'mu', 'g2', 'vhom', 'M', 'c1', 'c2']
+
+
+def plan_quality_suite(metrics: List[str]) -> tuple:
+    """
+    :param metrics: a list of figures of merit among quality_metrics.
+    :return: the phases of the Hong-Ou-Mandel simulations needed (none if the source alone suffices), the moment
+        multi-indices to propagate in each simulation, and whether the brightness is needed.
+    """
+    assert all(metric in quality_metrics for metric in metrics), "Metrics must be among " + str(quality_metrics)
+    metrics = set(metrics)
+    phases = [0, pi / 2] if metrics & {'c1', 'c2'} else [pi / 4] if metrics & {'vhom', 'M'} else []
+    order = 2 if metrics & {'g2', 'M'} else 1 if metrics & {'mu', 'vhom', 'c1', 'c2'} else 0
+    if phases:
+        indices = [(0, 0), (1, 0), (0, 1), (1, 1)] + ([(2, 0), (0, 2)] if order == 2 else [])
+    else:
+        indices = moment_indices((order,))
+    return phases, indices, 'beta' in metrics
+
+
+def _moments_and_vacuum(processor: ProcessorBase, indices: List[tuple], vacuum: bool, parameters: dict = None):
+    links = moment_links(indices)
+    size = len(indices)
+    if vacuum:  # an extra state in which every photon is detected gives the probability of detecting none
+        links = [bin_links + [(size, size)] for bin_links in links]
+    traces = propagate_chain(processor, size + vacuum, links, initial=(0, size) if vacuum else (0,),
+                             parameters=parameters)
+    moments = {index: (-1) ** sum(index) * prod(factorial(k) for k in index) * traces[k].real
+               for k, index in enumerate(indices)}
+    return moments, traces[size].real if vacuum else None
+
+
+def compute_quality_suite(source: AComponent, port: int, metrics: List[str] = None, parameters: dict = None) -> dict:
+    """
+    Computes several figures of merit of a source from as few simulations as possible. The moments giving mu and g2 are
+    propagated within the Hong-Ou-Mandel simulations whenever those are needed, since the total number of photons
+    detected after the beam splitter is that of two independent copies of the source. Likewise, the brightness is
+    obtained from an extra state of the same chain in which every photon is detected.
+
+    :param source: the source component.
+    :param port: the source port.
+    :param metrics: a list of figures of merit among quality_metrics (all of them by default).
+    :param parameters: optional parameters to modify the default parameters.
+    :return: a dictionary of the requested figures of merit.
+    """
+    metrics = quality_metrics if metrics is None else list(metrics)
+    phases, indices, vacuum = plan_quality_suite(metrics)
+
+    if phases:
+        runs = [_moments_and_vacuum(hong_ou_mandel_processor(source, port, phi), indices, vacuum and k == 0, parameters)
+                for k, phi in enumerate(phases)]
+        moments, p0 = runs[0]
+        mu = (moments[(1, 0)] + moments[(0, 1)]) / 2
+        assert mu != 0, "No light detected, normalization is 0"
+        beta = None if p0 is None else 1 - np.sqrt(max(p0, 0))  # no photon from either copy of the source
+        # <N(N-1)> of the total photon number N of both copies is 2<n(n-1)> + 2<n>^2
+        second = (moments[(2, 0)] + moments[(0, 2)] + 2 * moments[(1, 1)]) / 2 - mu ** 2 if (2, 0) in moments \
+            else None
+        if len(phases) == 2:
+            vhom, c1, c2 = _hom_coherence(moments, runs[1][0])
+        else:
+            vhom, c1, c2 = _hom_visibility(moments), None, None
+    else:
+        moments, p0 = _moments_and_vacuum(photon_counting_processor(source, port), indices, vacuum, parameters)
+        mu = moments.get((1,))
+        beta = None if p0 is None else 1 - p0
+        second = moments.get((2,))
+        vhom, c1, c2 = None, None, None
+
+    g2 = None
+    if second is not None:
+        if mu > 10 ** -8:
+            g2 = second / mu ** 2
+        else:
+            warn_no_light(source.modes, port)
+
+    values = {'beta': beta, 'mu': mu, 'g2': g2, 'vhom': vhom, 'c1': c1, 'c2': c2,
+              'M': None if vhom is None or g2 is None else vhom + g2}
+    return {metric: values[metric] for metric in metrics}
@@ -1,10 +1,11 @@
 from .lifetime import Lifetime
 from ..base_processor import ProcessorBase
+from ..sweep import Sweep
 from ...network import AComponent, make_masked_source
 from ...virtual import ParityDetectorGate
 from ...elements import BeamSplitter, ShapedLaserEmitter
 from typing import Union, List
-from numpy import sqrt, arcsin, ndarray, pi, real
+from numpy import sqrt, arcsin, ndarray, pi, real, asarray, newaxis
 
 
 class WignerFunction:
@@ -17,22 +18,42 @@ class WignerFunction:
         self.points = [real(p) for p in points]
 
 
-def compute_wigner_function(source: AComponent, port: int, lifetime: Lifetime, alpha: Union[complex, List[complex]],
-                            parameters: dict = None,
-                            pseudo_limit: float = 0.01, lo_resolution=600, lo_fluctuations=2):
+def grid_amplitudes(x: ndarray, p: ndarray) -> List[complex]:
+    """
+    :param x: the real parts of the grid amplitudes
+    :param p: the imaginary parts of the grid amplitudes
+    :return: the amplitudes x[i] + 1j * p[j] of the grid, with the last index varying fastest
+    """
+    return list((asarray(x, dtype=float)[:, newaxis] + 1j * asarray(p, dtype=float)[newaxis, :]).ravel())
+
+
+class WignerGrid(WignerFunction):
+    """
+    Values of the Wigner function on a rectangular grid of phase space, W[i, j] = W(x[i] + 1j * p[j])
+    """
+
+    def __init__(self, x: ndarray, p: ndarray, points: list):
+        self.x = asarray(x, dtype=float)
+        self.p = asarray(p, dtype=float)
+        super().__init__(alphas=grid_amplitudes(x, p), points=points)
+
+    @property
+    def values(self) -> ndarray:
+        return asarray(self.points).reshape((len(self.x), len(self.p)))
+
+
+def wigner_processor(source: AComponent, port: int, lifetime: Lifetime, parameters: dict = None,
+                     pseudo_limit: float = 0.01, lo_resolution=600, lo_fluctuations=2) -> ProcessorBase:
     """
     :param source: a source of light
     :param port: the port of the source being analysed
     :param lifetime: the shape of the local oscillator (matching the source lifetime)
-    :param alpha: a complex amplitude in phase space or a list of such amplitudes
     :param parameters: a dictionary of parameters to modify the default parameters
     :param pseudo_limit: a loss regime parameter for the pseudo-Wigner algorithm
     :param lo_resolution: the number of numerical points to interpolate the local oscillator shape
     :param lo_fluctuations: the maximum nonlinear fluctuation of local oscillator photons
-    :return: the value W(alpha) of the Wigner function at the point alpha
+    :return: a processor displacing the source with a local oscillator of variable amplitude before a parity detector
     """
-    alpha = alpha if isinstance(alpha, list) or isinstance(alpha, ndarray) else [alpha]
-
     lo_source = ShapedLaserEmitter(truncation=lo_fluctuations, parameters=parameters, shape=lifetime,
                                    resolution=lo_resolution)
     lo_source.initial_state = lo_source.states['|0>']
@@ -42,9 +63,58 @@ def compute_wigner_function(source: AComponent, port: int, lifetime: Lifetime, a
     p.add(1, lo_source)
     p.add(0, BeamSplitter(parameters={'angle': arcsin(sqrt(pseudo_limit))}))
     p.add(0, ParityDetectorGate())
+    return p
+
 
-    points = [p.probs(parameters={'amplitude': a / sqrt(2 * pseudo_limit / (1 - pseudo_limit))} |
-                                 ({} if parameters is None else source.set_parameters(parameters)))['p',] / pi
-              for a in alpha]
+def wigner_amplitudes(alpha: Union[complex, List[complex]], pseudo_limit: float = 0.01,
+                      parameters: dict = None) -> List[dict]:
+    """
+    :param alpha: a complex amplitude in phase space or a list of such amplitudes
+    :param pseudo_limit: a loss regime parameter for the pseudo-Wigner algorithm
+    :param parameters: a dictionary of parameters to modify the default parameters
+    :return: the parameters of the wigner processor for each amplitude
+    """
+    alpha = alpha if isinstance(alpha, list) or isinstance(alpha, ndarray) else [alpha]
+    return [{'amplitude': a / sqrt(2 * pseudo_limit / (1 - pseudo_limit))} | (dict(parameters) if parameters else {})
+            for a in alpha]
 
-    return WignerFunction(alphas=alpha, points=points)
+
+def evaluate_wigner_processor(processor: ProcessorBase, alpha: Union[complex, List[complex]],
+                              pseudo_limit: float = 0.01, parameters: dict = None, workers: int = None) -> list:
+    """
+    Evaluates a wigner processor for a batch of amplitudes. The processor is built once and, with several workers,
+    the amplitudes are shared between forked processes that inherit it.
+
+    :param processor: a processor built by wigner_processor
+    :param alpha: a complex amplitude in phase space or a list of such amplitudes
+    :param pseudo_limit: the loss regime parameter used to build the processor
+    :param parameters: a dictionary of parameters to modify the default parameters
+    :param workers: the number of worker processes (None to evaluate in the current process)
+    :return: the value of the Wigner function at each amplitude
+    """
+    result = Sweep(processor, 'probs', workers=workers, chunk_size=1 if workers else 16).run(
+        wigner_amplitudes(alpha, pseudo_limit, parameters))
+    if ('p',) not in result.outcomes:
+        return [0.] * len(result)
+    return list(result.values[:, result.outcomes.index(('p',))] / pi)
+
+
+def compute_wigner_function(source: AComponent, port: int, lifetime: Lifetime, alpha: Union[complex, List[complex]],
+                            parameters: dict = None,
+                            pseudo_limit: float = 0.01, lo_resolution=600, lo_fluctuations=2, workers: int = None):
+    """
+    :param source: a source of light
+    :param port: the port of the source being analysed
+    :param lifetime: the shape of the local oscillator (matching the source lifetime)
+    :param alpha: a complex amplitude in phase space or a list of such amplitudes
+    :param parameters: a dictionary of parameters to modify the default parameters
+    :param pseudo_limit: a loss regime parameter for the pseudo-Wigner algorithm
+    :param lo_resolution: the number of numerical points to interpolate the local oscillator shape
+    :param lo_fluctuations: the maximum nonlinear fluctuation of local oscillator photons
+    :param workers: the number of worker processes (None to evaluate in the current process)
+    :return: the value W(alpha) of the Wigner function at the point alpha
+    """
+    alpha = alpha if isinstance(alpha, list) or isinstance(alpha, ndarray) else [alpha]
+    p = wigner_processor(source, port, lifetime, parameters, pseudo_limit, lo_resolution, lo_fluctuations)
+    parameters = None if parameters is None else source.set_parameters(parameters)
+    return WignerFunction(alphas=alpha, points=evaluate_wigner_processor(p, alpha, pseudo_limit, parameters, workers))
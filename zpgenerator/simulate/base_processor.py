@@ -1,9 +1,11 @@
 from ..network import AComponent, Component, ADetectorGate, TimeBin, DetectorGate
 from ..system import AElement
-from ..virtual import Generator, VGrove, MeasurementBranch
+from ..virtual import Generator, VGrove, VExecutor, MeasurementBranch, OutcomeSelection, ConditionalStates
 from typing import Union, List
+from contextlib import nullcontext
 from qutip import Qobj, Options, ptrace, operator_to_vector
 from scipy.sparse import hstack
+from numpy import ndarray
 
 
 class ProcessorBase:
@@ -20,11 +22,15 @@ class ProcessorBase:
         #     port.close()
 
         self._precision = 6
+        self._workers = None
+        self._cache_maps = False
 
         self._grove = None
         self._current_time = None  # Note that current_time = None -> simulation will restart from initial conditions
         self._branches = []
         self._binned_detectors = {}
+        self._generator = None
+        self._generator_key = None
 
         self._probabilities = {}
         self._states = {}
@@ -62,6 +68,7 @@ class ProcessorBase:
     def add(self, position: int, element: Union[AElement, ADetectorGate],
             parameters: dict = None, name: str = None, bin_name: str = None):
         self.component.add(position, element, parameters, name, bin_name)
+        self._generator = None
 
     @property
     def initial_state(self):
@@ -97,6 +104,8 @@ class ProcessorBase:
         self.initial_time = processor.initial_time
         self.final_time = processor.final_time
         self.precision = processor.precision
+        self.workers = processor.workers
+        self.cache_maps = processor.cache_maps
 
     @property
     def parameters(self) -> list[str]:
@@ -109,6 +118,27 @@ class ProcessorBase:
     def update_default_parameters(self, parameters: dict):
         self.component.update_default_parameters(parameters)
 
+    @property
+    def parameter_order(self) -> list[str]:
+        """
+        :return: the order of parameters in parameter vectors (alphabetical, numerical parameters only).
+        """
+        return self.component.parameter_order
+
+    def vector_parameters(self, vector: Union[ndarray, list]) -> dict:
+        """
+        :param vector: a vector of parameter values ordered as parameter_order.
+        :return: the dictionary of parameters.
+        """
+        return self.component.vector_parameters(vector)
+
+    def parameter_vector(self, parameters: dict = None) -> ndarray:
+        """
+        :param parameters: optional parameters to modify the default parameters.
+        :return: the vector of parameter values ordered as parameter_order.
+        """
+        return self.component.parameter_vector(parameters)
+
     @property
     def precision(self):
         return self._precision
@@ -117,19 +147,45 @@ class ProcessorBase:
     def precision(self, precision):
         self._precision = precision
 
+    @property
+    def workers(self):
+        return self._workers
+
+    @workers.setter
+    def workers(self, workers: Union[int, None]):
+        """
+        :param workers: the number of processes used to propagate virtual states (None to propagate in one process).
+        """
+        assert workers is None or workers > 0, "Number of workers must be a positive integer."
+        self._workers = workers
+
+    @property
+    def cache_maps(self):
+        return self._cache_maps
+
+    @cache_maps.setter
+    def cache_maps(self, cache_maps: bool):
+        """
+        :param cache_maps: whether to integrate the superoperator of each time-dependent interval and virtual
+            configuration once, and apply it to all states (useful for channels and repeated simulations).
+        """
+        self._cache_maps = cache_maps
+
+    def _build_branches(self, parameters: dict = None, bin_list: list = None):
+        binned_detectors = self.component.output.binned_detectors
+        bin_keys = list(binned_detectors.keys())
+        if bin_list is not None:
+            assert all(k < len(bin_keys) if isinstance(k, int) else k in bin_keys for k in bin_list), \
+                "One or more bins does not exist."
+            binned_detectors = {k: binned_detectors.get(bin_keys[k] if isinstance(k, int) else k) for k in bin_list}
+        branches = [MeasurementBranch(time_bin, parameters, name) for name, time_bin in binned_detectors.items()]
+        if not branches:  # we simulate the natural evolution (without any measurement)
+            branches = [MeasurementBranch(time_bins=[TimeBin(detector=DetectorGate(resolution=None))])]
+        return branches, binned_detectors
+
     def _measurement_branches(self, parameters: dict = None, bin_list: list = None):
         if not self._branches:
-            binned_detectors = self.component.output.binned_detectors
-            bin_keys = list(binned_detectors.keys())
-            if bin_list is not None:
-                assert all(k < len(bin_keys) if isinstance(k, int) else k in bin_keys for k in bin_list), \
-                    "One or more bins does not exist."
-                binned_detectors = {k: binned_detectors.get(bin_keys[k] if isinstance(k, int) else k) for k in bin_list}
-            self.binned_detectors = binned_detectors
-            self._branches = [MeasurementBranch(time_bin, parameters, name)
-                              for name, time_bin in self.binned_detectors.items()]
-            if not self._branches:  # we simulate the natural evolution (without any measurement)
-                self._branches = [MeasurementBranch(time_bins=[TimeBin(detector=DetectorGate(resolution=None))])]
+            self._branches, self.binned_detectors = self._build_branches(parameters, bin_list)
         return self._branches, self.binned_detectors
 
     def _get_initial_time(self, times: list):
@@ -172,53 +228,71 @@ class ProcessorBase:
         return [self.initial_state] if basis is None else basis  # a set of one or more initial states to propagate
 
     def _initialize_grove(self, initial_time: float, parameters: dict = None,
-                          bin_list: list = None, basis: List[Qobj] = None):
+                          bin_list: list = None, basis: List[Qobj] = None, patterns: list = None):
         branches, binned_detectors = self._measurement_branches(parameters, bin_list)
         branch_times = sorted([branch.start_time for branch in branches])
 
         if self._current_time is None:  # initialize the tree(s)
-            grove = VGrove(initial_time=initial_time, states=self._get_states(basis))
+            selection = None if patterns is None else \
+                OutcomeSelection(branches, self._branch_patterns(patterns, VGrove.branch_order(initial_time, branches)))
+            grove = VGrove(initial_time=initial_time, states=self._get_states(basis),
+                           executor=VExecutor(self.workers) if self.workers else None, array=True,
+                           selection=selection)
             branch_order = grove.initialize(time=initial_time, branches=branches)
             self._current_time = initial_time
 
         else:  # we are continuing a previous simulation
+            assert patterns is None, "Detection patterns cannot be selected when continuing a simulation."
             grove = self._grove
             branch_order = self._branch_order
         return branch_times, branches, branch_order, binned_detectors, grove
 
+    def _get_generator(self, binned_detectors: dict) -> Generator:
+        # reuse the generator (and its cached propagators) as long as the measured time bins are unchanged
+        bins = tuple((name, tuple((id(time_bin.detector), time_bin.mode) for time_bin in time_bins))
+                     for name, time_bins in binned_detectors.items())
+        key = (self.precision, self.cache_maps, bins)
+        if self._generator is None or key != self._generator_key:
+            self._generator = Generator(self.component, binned_detectors=binned_detectors, precision=self.precision,
+                                        cache_maps=self.cache_maps)
+            self._generator_key = key
+        return self._generator
+
     def _simulate_grove(self,
                         parameters: dict = None,
                         bin_list: list = None,
                         basis: List[Qobj] = None,
                         options: Options = None,
-                        continue_simulation: bool = False):
+                        continue_simulation: bool = False,
+                        patterns: list = None):
         times = self.component.times(parameters)  # determine simulation stop times
         initial_time = self._get_initial_time(times)
         final_time = self._get_final_time(times)
 
         self._check_if_continue(continue_simulation)
         branch_times, branches, branch_order, binned_detectors, grove = \
-            self._initialize_grove(initial_time, self.component.set_parameters(parameters), bin_list, basis)
+            self._initialize_grove(initial_time, self.component.set_parameters(parameters), bin_list, basis, patterns)
         times = [self._current_time] + [t for t in times if self._current_time < t < final_time] + [final_time]
 
-        generator = Generator(self.component, binned_detectors=binned_detectors, precision=self.precision)
+        generator = self._get_generator(binned_detectors)
 
-        # Main propagation algorithm
-        for i in range(1, len(times)):  # Propagate from initial time to final time
-            t0 = times[i - 1]  # current time
-            t1 = times[i]  # next stop time
+        # build the propagators of all intervals, so that worker processes are only forked once
+        propagators = [generator.build_propagator(t0, parameters=parameters, options=options) for t0 in times[:-1]]
 
-            if self.component.is_dirac(t0, parameters):  # we have instant operators to apply
-                grove.apply_operator(self.component.evaluate_dirac(t0, parameters))
+        # Main propagation algorithm
+        with grove.executor.session(propagators) if grove.executor else nullcontext():
+            for i in range(1, len(times)):  # Propagate from initial time to final time
+                t0 = times[i - 1]  # current time
+                t1 = times[i]  # next stop time
 
-            if t0 in branch_times:  # we begin a measurement time bin
-                branch_order += grove.add_branches(t0, branches)
+                if self.component.is_dirac(t0, parameters):  # we have instant operators to apply
+                    grove.apply_operator(self.component.evaluate_dirac(t0, parameters))
 
-            # build propagator
-            propagator = generator.build_propagator(t0, parameters=parameters, options=options)
+                if t0 in branch_times:  # we begin a measurement time bin
+                    branch_order += grove.add_branches(t0, branches)
 
-            # apply propagator to all trees in the grove
-            grove.propagate(propagator, t1)  # propagate to next stop time
+                # apply propagator to all trees in the grove
+                grove.propagate(propagators[i - 1], t1)  # propagate to next stop time
 
         self._current_time = final_time
         self._grove = grove
@@ -247,9 +321,10 @@ class ProcessorBase:
                  select: List[int] = None,
                  basis: list[Qobj] = None,
                  options: Options = None,
-                 reset: bool = True):
+                 reset: bool = True,
+                 patterns: List[tuple] = None):
         """
-        :param parameters: optional parameters to modify the default parameters.
+        :param parameters: optional parameters to modify the default parameters, or a vector ordered as parameter_order.
         :param point_rank: simulation rank (0 = probabilities, 1 = states, 2 = channels).
         :param bin_list: a list of integers or strings specifying which measurement bins to simulate.
         :param dims: a list of integers specifying the desired subspace dimensions of the channel.
@@ -257,8 +332,11 @@ class ProcessorBase:
         :param basis: the orthonormal basis of initial states for channels (if rank = 2).
         :param options: options for qutip mesolve.
         :param reset: whether to continue simulation from the current time or reset from the beginning
+        :param patterns: an optional list of detection patterns to compute, so that only the virtual configurations
+            they need are simulated.
         """
         assert self.component.is_emitter, "At least one component must be a quantum emitter."
+        parameters = self.vector_parameters(parameters) if isinstance(parameters, ndarray) else parameters
 
         # Take outer product of orthonormal set to build unit elements of the density matrix
         if point_rank == 2:
@@ -267,20 +345,26 @@ class ProcessorBase:
 
         # simulate the virtual tree
         self._simulate_grove(parameters=parameters, bin_list=bin_list, basis=basis, options=options,
-                             continue_simulation=not reset)
+                             continue_simulation=not reset, patterns=patterns)
 
-        tensors = self._grove.build_tensors(point_rank, self.precision)
-        for tensor in tensors:
-            self._contains_unnormalised_detector = tensor.invert()
+        if patterns is None:
+            tensors = self._grove.build_tensors(point_rank, self.precision)
+            for tensor in tensors:
+                self._contains_unnormalised_detector = tensor.invert()
 
-        results = [tensor.extract_results(dims=dims, select=select) for tensor in tensors]
+            results = [tensor.extract_results(dims=dims, select=select) for tensor in tensors]
+        else:
+            self._contains_unnormalised_detector = self._grove.selection.contains_unnormalised_detector
+            results = [self._tensor_keys(result)
+                       for result in self._grove.extract_selection(point_rank, dims=dims, select=select)]
 
         if point_rank == 0:
             self._probabilities.update(results[0])
 
         elif point_rank == 1:
-            self._states.update(results[0])
-            self._probabilities.update({k: v.tr() for k, v in results[0].items()})
+            self._states = results[0]  # states are only built when they are accessed
+            self._probabilities.update(results[0].traces() if isinstance(results[0], ConditionalStates) else
+                                       {k: v.tr() for k, v in results[0].items()})
 
         elif point_rank == 2:
 
@@ -304,16 +388,41 @@ class ProcessorBase:
             return NotImplemented
 
     def _order_bins(self, distribution: dict):
+        if isinstance(distribution, ConditionalStates):
+            return distribution.permute(self._branch_order)
+        return {tuple(k[i] for i in self._branch_order): v for k, v in distribution.items()}
+
+    # Patterns of a selection are indexed by branch, while the axis j of a generating tensor holds the branch
+    # branch_order[j] before _order_bins permutes the axes of the results
+
+    @staticmethod
+    def _branch_patterns(patterns: list, branch_order: list) -> list:
+        # the patterns of ordered results, as indexed by branch
+        positions = [branch_order[i] for i in branch_order]
+        branch_patterns = []
+        for pattern in patterns:
+            assert len(pattern) == len(branch_order), "Each pattern must have one outcome for each measurement bin."
+            branch_pattern = [None] * len(pattern)
+            for i, outcome in zip(positions, pattern):
+                branch_pattern[i] = outcome
+            branch_patterns.append(tuple(branch_pattern))
+        return branch_patterns
+
+    def _tensor_keys(self, distribution: dict):
+        # the keys of results indexed by branch, as indexed by the axes of a generating tensor
         return {tuple(k[i] for i in self._branch_order): v for k, v in distribution.items()}
 
-    def probs(self, parameters: dict = None, bin_list: list = None, options: Options = None, reset: bool = True):
-        self.simulate(parameters=parameters, point_rank=0, bin_list=bin_list, options=options, reset=reset)
+    def probs(self, parameters: dict = None, bin_list: list = None, options: Options = None, reset: bool = True,
+              patterns: List[tuple] = None):
+        self.simulate(parameters=parameters, point_rank=0, bin_list=bin_list, options=options, reset=reset,
+                      patterns=patterns)
         return self._order_bins(self._probabilities)
 
     def conditional_states(self, parameters: dict = None, bin_list: list = None, dims: List[int] = None,
-                           select: List[int] = None, options: Options = None, reset: bool = True):
+                           select: List[int] = None, options: Options = None, reset: bool = True,
+                           patterns: List[tuple] = None):
         self.simulate(parameters=parameters, point_rank=1, bin_list=bin_list,
-                      dims=dims, select=select, options=options, reset=reset)
+                      dims=dims, select=select, options=options, reset=reset, patterns=patterns)
         return self._order_bins(self._states)
 
     def conditional_channels(self, parameters: dict = None, bin_list: list = None,
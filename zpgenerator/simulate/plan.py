@@ -0,0 +1,162 @@
+from ..time.evaluate import EvaluatedDiracOperator
+from ..virtual import AVirtualPropagator, VGrove, VExecutor, MeasurementBranch
+from .algorithms.distributions import CorrelationDistribution, StateDistribution
+from typing import List, Union
+from contextlib import nullcontext
+from qutip import Qobj
+
+
+class PlanStep:
+    """
+    A single interval of a simulation plan.
+
+    :param start: the time at which the interval begins.
+    :param end: the time at which the interval ends.
+    :param dirac: the instantaneous operator to apply at the start of the interval, if any.
+    :param branching: whether measurement branches begin at the start of the interval.
+    :param propagator: the propagator evolving states over the interval.
+    """
+
+    def __init__(self, start: float, end: float, dirac: Union[EvaluatedDiracOperator, None],
+                 branching: bool, propagator: AVirtualPropagator):
+        self._start = start
+        self._end = end
+        self._dirac = dirac
+        self._branching = branching
+        self._propagator = propagator
+
+    @property
+    def start(self) -> float:
+        return self._start
+
+    @property
+    def end(self) -> float:
+        return self._end
+
+    @property
+    def dirac(self) -> Union[EvaluatedDiracOperator, None]:
+        return self._dirac
+
+    @property
+    def branching(self) -> bool:
+        return self._branching
+
+    @property
+    def propagator(self) -> AVirtualPropagator:
+        return self._propagator
+
+
+class SimulationPlan:
+    """
+    A processor simulation compiled for a fixed set of parameters. The plan holds the ordered stop times, the
+    propagator of each interval, the instantaneous operators, and the measurement branch schedule, so that running it
+    does not need to evaluate the component again.
+    """
+
+    def __init__(self, initial_state: Qobj, initial_time: float, steps: List[PlanStep],
+                 branches: List[MeasurementBranch], precision: int = 6, workers: int = None):
+        """
+        :param initial_state: the initial state of the processor.
+        :param initial_time: the time at which the simulation begins.
+        :param steps: the intervals of the simulation in chronological order.
+        :param branches: the measurement branches, one for each detector bin.
+        :param precision: the precision of the simulation results.
+        :param workers: the number of processes used to propagate virtual states (None to use one process).
+        """
+        self._initial_state = initial_state
+        self._initial_time = initial_time
+        self._steps = tuple(steps)
+        self._branches = tuple(branches)
+        self._precision = precision
+        self._workers = workers
+
+    @property
+    def initial_state(self) -> Qobj:
+        return self._initial_state
+
+    @property
+    def initial_time(self) -> float:
+        return self._initial_time
+
+    @property
+    def final_time(self) -> float:
+        return self._steps[-1].end if self._steps else self._initial_time
+
+    @property
+    def times(self) -> list:
+        return [self._initial_time] + [step.end for step in self._steps]
+
+    @property
+    def steps(self) -> tuple:
+        return self._steps
+
+    @property
+    def branches(self) -> tuple:
+        return self._branches
+
+    @property
+    def precision(self) -> int:
+        return self._precision
+
+    @property
+    def bin_labels(self) -> list:
+        return [branch.name for branch in self._branches]
+
+    def simulate_grove(self, basis: List[Qobj] = None):
+        """
+        Propagates the virtual trees through all steps of the plan.
+
+        :param basis: a list of initial states to propagate (defaults to the initial state of the plan).
+        :return: the propagated grove and the order in which branches were added to it.
+        """
+        grove = VGrove(initial_time=self._initial_time, states=[self._initial_state] if basis is None else basis,
+                       executor=VExecutor(self._workers) if self._workers else None, array=True)
+        branch_order = grove.initialize(time=self._initial_time, branches=list(self._branches))
+        with grove.executor.session([step.propagator for step in self._steps]) if grove.executor else nullcontext():
+            for step in self._steps:
+                if step.dirac is not None:
+                    grove.apply_operator(step.dirac)
+                if step.branching:
+                    branch_order += grove.add_branches(step.start, list(self._branches))
+                grove.propagate(step.propagator, step.end)
+        return grove, branch_order
+
+    def run(self, point_rank: int = 0, dims: List[int] = None, select: List[int] = None):
+        """
+        :param point_rank: simulation rank (0 = probabilities, 1 = states).
+        :param dims: a list of integers specifying the desired subspace dimensions of the states.
+        :param select: a list of integers specifying which subspace dimensions to keep.
+        :return: a dictionary of results for each measurement outcome, and whether a detector is unnormalised.
+        """
+        assert point_rank in [0, 1], "Simulation plans can only compute probabilities or states."
+        grove, branch_order = self.simulate_grove()
+        tensor = grove.build_tensors(point_rank, self._precision)[0]
+        contains_unnormalised_detector = tensor.invert()
+        results = tensor.extract_results(dims=dims, select=select)
+        return {tuple(k[i] for i in branch_order): v for k, v in results.items()}, contains_unnormalised_detector
+
+    def probs(self, chop: bool = True) -> CorrelationDistribution:
+        """
+        :param chop: whether to remove negligible probabilities and round the results.
+        :return: the probability distribution of detection outcomes.
+        """
+        results, contains_unnormalised_detector = self.run(point_rank=0)
+        probs = CorrelationDistribution(results, precision=self._precision,
+                                        type='real' if contains_unnormalised_detector else 'positive')
+        if chop:
+            probs.chop(normalize=not contains_unnormalised_detector and self._initial_state.norm() == 1)
+        return probs
+
+    def conditional_states(self, dims: List[int] = None, select: List[int] = None,
+                           chop: bool = True) -> StateDistribution:
+        """
+        :param dims: a list of integers specifying the desired subspace dimensions of the states.
+        :param select: a list of integers specifying which subspace dimensions to keep.
+        :param chop: whether to remove negligible states and round the results.
+        :return: the (unnormalised) conditional states for each detection outcome.
+        """
+        results, contains_unnormalised_detector = self.run(point_rank=1, dims=dims, select=select)
+        states = StateDistribution(results, precision=self._precision)
+        if chop:
+            states.chop(normalize=not contains_unnormalised_detector and self._initial_state.norm() == 1)
+        return states
@@ -0,0 +1,90 @@
+from .algorithms.distributions import CorrelationDistribution, StateDistribution, ChannelDistribution
+from typing import List, Union
+from qutip import Qobj, ptrace
+import numpy as np
+
+
+class ConditionalProcess:
+    """
+    The conditional superoperators of a processor for every detection outcome, acting on the full space of the
+    processor. Once computed, the conditional states and probabilities of any initial state are obtained by matrix
+    products without simulating the processor again.
+    """
+
+    def __init__(self, channels: dict, precision: int = 6, contains_unnormalised_detector: bool = False):
+        """
+        :param channels: a dictionary of superoperators, one for each detection outcome.
+        :param precision: the precision of the simulation results.
+        :param contains_unnormalised_detector: whether the processor contains a detector that is not normalised.
+        """
+        assert channels, "A conditional process needs at least one detection outcome."
+        self._outcomes = list(channels.keys())
+        self._dims = list(channels.values())[0].dims[0]
+        self._maps = np.stack([channels[outcome].full() for outcome in self._outcomes])  # (outcomes, d^2, d^2)
+        self.precision = precision
+        self.contains_unnormalised_detector = contains_unnormalised_detector
+
+        # the trace of a vectorised density matrix is the sum of its diagonal entries
+        self._dim = int(np.prod(self._dims[0]))
+        self._trace_maps = self._maps[:, ::self._dim + 1, :].sum(axis=1)  # (outcomes, d^2)
+
+    @property
+    def outcomes(self) -> list:
+        return self._outcomes
+
+    @property
+    def dims(self) -> list:
+        return self._dims[0]
+
+    @property
+    def channels(self) -> ChannelDistribution:
+        return ChannelDistribution({outcome: Qobj(inpt=superoperator, dims=[self._dims, self._dims], type='super')
+                                    for outcome, superoperator in zip(self._outcomes, self._maps)},
+                                   precision=self.precision)
+
+    def _vectors(self, initial_states: List[Qobj]) -> np.ndarray:
+        states = [state if state.isoper else state * state.dag() for state in initial_states]
+        assert all(state.dims[0] == self.dims for state in states), \
+            "Initial states must have the same dimensions as the processor."
+        return np.stack([state.full().ravel(order='F') for state in states], axis=-1)  # columns are vectorised states
+
+    def _normalize(self, initial_state: Qobj) -> bool:
+        return not self.contains_unnormalised_detector and initial_state.norm() == 1
+
+    def probability_array(self, initial_states: List[Qobj]) -> np.ndarray:
+        """
+        :param initial_states: a list of n initial states (kets or density matrices).
+        :return: an (n, outcomes) array of the probability of each outcome, ordered as the outcomes property.
+        """
+        return (self._trace_maps @ self._vectors(initial_states)).T
+
+    def probs(self, initial_state: Qobj, chop: bool = True) -> CorrelationDistribution:
+        """
+        :param initial_state: the initial state of the processor.
+        :param chop: whether to remove negligible probabilities and round the results.
+        :return: the probability distribution of detection outcomes.
+        """
+        probs = CorrelationDistribution(dict(zip(self._outcomes, self.probability_array([initial_state])[0])),
+                                        precision=self.precision,
+                                        type='real' if self.contains_unnormalised_detector else 'positive')
+        if chop:
+            probs.chop(normalize=self._normalize(initial_state))
+        return probs
+
+    def conditional_states(self, initial_state: Qobj, select: Union[int, List[int]] = None,
+                           chop: bool = True) -> StateDistribution:
+        """
+        :param initial_state: the initial state of the processor.
+        :param select: a list of integers specifying which subspaces to keep.
+        :param chop: whether to remove negligible states and round the results.
+        :return: the (unnormalised) conditional states for each detection outcome.
+        """
+        vectors = self._maps @ self._vectors([initial_state])[:, 0]  # (outcomes, d^2)
+        states = {}
+        for outcome, vector in zip(self._outcomes, vectors):
+            state = Qobj(inpt=vector.reshape((self._dim, self._dim), order='F'), dims=self._dims)
+            states[outcome] = ptrace(state, select) if select is not None else state
+        states = StateDistribution(states, precision=self.precision)
+        if chop:
+            states.chop(normalize=self._normalize(initial_state))
+        return states
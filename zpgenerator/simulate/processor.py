@@ -1,10 +1,15 @@
 from .quality import ProcessorQuality
 from .algorithms.distributions import CorrelationDistribution, StateDistribution, ChannelDistribution
+from .plan import PlanStep, SimulationPlan
+from .process import ConditionalProcess
+from .sweep import Sweep, SweepResult
 from ..misc.display import Display
 from ..network import AComponent, ADetectorGate, Component
 from ..system import AElement
+from ..virtual import ConditionalStates
 from typing import Union, List
-from qutip import Options, Qobj
+from qutip import Options, Qobj, basis
+from numpy import ndarray
 
 
 class Processor(ProcessorQuality):
@@ -52,24 +57,71 @@ class Processor(ProcessorQuality):
                 port.close()
             Display(comp).display()
 
+    def compile(self, parameters: dict = None, bin_list: list = None, options: Options = None) -> SimulationPlan:
+        """
+        Evaluates the processor for a fixed set of parameters and returns a plan that can be run repeatedly without
+        evaluating the component again.
+
+        :param parameters: optional parameters to modify the default parameters.
+        :param bin_list: a list of integers or strings specifying which measurement bins to simulate.
+        :param options: options for qutip mesolve.
+        :return: a SimulationPlan object.
+        """
+        assert self.component.is_emitter, "At least one component must be a quantum emitter."
+        parameters = self.vector_parameters(parameters) if isinstance(parameters, ndarray) else parameters
+
+        times = self.component.times(parameters)
+        initial_time = self._get_initial_time(times)
+        final_time = self._get_final_time(times)
+        times = [initial_time] + [t for t in times if initial_time < t < final_time] + [final_time]
+
+        branches, binned_detectors = self._build_branches(self.component.set_parameters(parameters), bin_list)
+        branch_times = [branch.start_time for branch in branches]
+        generator = self._get_generator(binned_detectors)
+
+        steps = [PlanStep(start=t0, end=t1,
+                          dirac=self.component.evaluate_dirac(t0, parameters)
+                          if self.component.is_dirac(t0, parameters) else None,
+                          branching=t0 in branch_times,
+                          propagator=generator.build_propagator(t0, parameters=parameters, options=options))
+                 for t0, t1 in zip(times[:-1], times[1:])]
+
+        return SimulationPlan(initial_state=self.initial_state, initial_time=initial_time, steps=steps,
+                              branches=branches, precision=self.precision, workers=self.workers)
+
+    def _bin_names(self, bin_list: list = None):
+        names = self.bin_labels if bin_list is None else \
+            [self.bin_labels[k] if isinstance(k, int) else k for k in bin_list]
+        return names if names else None
+
+    def _normalize(self, patterns: list = None) -> bool:
+        # a selection of patterns is only part of the distribution
+        return patterns is None and not self._contains_unnormalised_detector and self.initial_state.norm() == 1
+
     def probs(self, parameters: dict = None, bin_list: list = None, chop: bool = True,
-              options: Options = None, reset: bool = True):
+              options: Options = None, reset: bool = True, patterns: List[tuple] = None):
         probs = CorrelationDistribution(super().probs(parameters=parameters, bin_list=bin_list,
-                                                      options=options, reset=reset),
+                                                      options=options, reset=reset, patterns=patterns),
                                         precision=self.precision,
-                                        type='real' if self._contains_unnormalised_detector else 'positive')
+                                        type='real' if self._contains_unnormalised_detector else 'positive',
+                                        names=self._bin_names(bin_list))
         if chop:
-            probs.chop(normalize=not self._contains_unnormalised_detector and self.initial_state.norm() == 1)
+            probs.chop(normalize=self._normalize(patterns))
         return probs
 
     def conditional_states(self, parameters: dict = None, bin_list: list = None,
                            dims: List[int] = None, select: List[int] = None,
-                           chop: bool = True, options: Options = None, reset: bool = True):
-        states = StateDistribution(super().conditional_states(parameters=parameters, bin_list=bin_list,
-                                                              dims=dims, select=select, options=options, reset=reset),
-                                   precision=self.precision)
+                           chop: bool = True, options: Options = None, reset: bool = True,
+                           patterns: List[tuple] = None, lazy: bool = False):
+        states = super().conditional_states(parameters=parameters, bin_list=bin_list, dims=dims, select=select,
+                                            options=options, reset=reset, patterns=patterns)
+        if lazy:  # the array of all states, building each Qobj only when it is accessed
+            return states
+        if chop and isinstance(states, ConditionalStates):  # only build the states that are not chopped
+            states = {k: states[k] for k, trace in states.traces().items() if abs(trace) > 10 ** (-self.precision + 1)}
+        states = StateDistribution(states, precision=self.precision)
         if chop:
-            states.chop(normalize=not self._contains_unnormalised_detector and self.initial_state.norm() == 1)
+            states.chop(normalize=self._normalize(patterns))
         return states
 
     def conditional_channels(self, parameters: dict = None, bin_list: list = None,
@@ -79,3 +131,39 @@ class Processor(ProcessorQuality):
                                                                 dims=dims, select=select, basis=basis,
                                                                 options=options, reset=reset),
                                    precision=self.precision)
+
+    def conditional_process(self, parameters: dict = None, bin_list: list = None,
+                            options: Options = None) -> ConditionalProcess:
+        """
+        Computes the conditional superoperator of every detection outcome on the full space of the processor in a
+        single pass, so that conditional states and probabilities of many initial states can be obtained cheaply.
+
+        :param parameters: optional parameters to modify the default parameters.
+        :param bin_list: a list of integers or strings specifying which measurement bins to simulate.
+        :param options: options for qutip mesolve.
+        :return: a ConditionalProcess object.
+        """
+        dims = self.initial_state.dims[0]
+        dim = self.initial_state.shape[0]
+        kets = [Qobj(basis(dim, i).full(), dims=[dims, [1] * len(dims)]) for i in range(dim)]
+        channels = super().conditional_channels(parameters=parameters, bin_list=bin_list, basis=kets, options=options)
+        return ConditionalProcess(channels, precision=self.precision,
+                                  contains_unnormalised_detector=self._contains_unnormalised_detector)
+
+    def sweep(self, parameter_grid: Union[dict, List[dict], ndarray], quantity: str = 'probs', workers: int = None,
+              chunk_size: int = 16, checkpoint: str = None, **kwargs) -> SweepResult:
+        """
+        Evaluates a quantity for every point of a parameter grid, sharing the forked worker pool and the instance
+        caches of the processor between all points.
+
+        :param parameter_grid: a dictionary of parameter values forming a cartesian grid, a list of parameter
+            dictionaries, or an array whose rows are parameter vectors ordered as parameter_order.
+        :param quantity: the name of a processor method accepting a parameters argument (e.g. 'probs', 'g2').
+        :param workers: the number of worker processes (None to evaluate in the current process).
+        :param chunk_size: the number of parameter points evaluated by each task.
+        :param checkpoint: an optional directory in which completed chunks are saved and from which they are resumed.
+        :param kwargs: additional keyword arguments passed to the processor method.
+        :return: a SweepResult object with values stacked along the grid.
+        """
+        return Sweep(self, quantity=quantity, workers=workers, chunk_size=chunk_size,
+                     checkpoint=checkpoint).run(parameter_grid, **kwargs)
@@ -1,14 +1,22 @@
-from .algorithms import compute_photon_number_distribution, compute_brightness, estimate_average_photon_number, \
+from .algorithms import compute_photon_number_distribution, compute_adaptive_photon_number_distribution, \
+    compute_brightness, estimate_average_photon_number, \
     estimate_intensity_correlation, estimate_hom_visibility, estimate_hom_visibility_with_coherence, compute_lifetime, \
-    compute_wigner_function
+    exact_average_photon_number, exact_intensity_correlation, exact_hom_visibility, \
+    exact_hom_visibility_with_coherence, compute_quality_suite, factorized_hom_visibility, hom_fringe_harmonics, \
+    hom_fringe, warn_no_light
 from typing import List
 from qutip import Options
 from .base_processor import ProcessorBase
+from .algorithms.wigner import WignerFunction, WignerGrid, grid_amplitudes, wigner_processor, \
+    evaluate_wigner_processor
+from .result_cache import ResultCache, fingerprint, result_key
+from ..time.evaluate.cache import LRUCache
 from ..network import AComponent
 from ..system import AElement
 from ..time import Lifetime
 from typing import Union
-from numpy import real
+from numpy import real, ndarray
+from copy import deepcopy
 
 
 class ProcessorQuality(ProcessorBase):
@@ -17,13 +25,30 @@ class ProcessorQuality(ProcessorBase):
     def __init__(self, component: Union[AElement, AComponent] = None):
         super().__init__(component)
         self.quality = {}
+        self.result_cache = ResultCache()  # set to None to disable, or to ResultCache(directory=...) to share results
+        self._wigner_processors = LRUCache(4)
 
-    def _estimate_truncation(self, port: int, parameters: dict = None):
-        truncation = 2 * (1 + max(1, round(self.mu(port, parameters))))
-        return max(truncation, 2)
+    def _cached(self, quantity: str, function: callable, source, **kwargs):
+        """
+        Computes a figure of merit, reusing the result if it was already computed for an identical processor.
 
-    def _estimate_pseudo_limit(self, port: int, parameters: dict = None):
-        return 0.005  # This should be more sophisticated
+        :param quantity: the name of the figure of merit.
+        :param function: the algorithm computing the figure of merit.
+        :param source: the first argument of the algorithm.
+        :param kwargs: the remaining arguments of the algorithm, which are part of the cache key.
+        :return: the figure of merit.
+        """
+        if self.result_cache is None:
+            return function(source, **kwargs)
+        conditions = (self.initial_state, self.initial_time, self.final_time)
+        key = result_key(fingerprint(self.component), quantity, precision=self.precision, conditions=conditions,
+                         **kwargs)
+        return deepcopy(self.result_cache.compute(key, function, source, **kwargs))
+
+    @staticmethod
+    def _algorithm(exact: callable, estimate: callable, pseudo_limit: float = None):
+        # exact moments unless a pseudo limit is requested for the lossy-regime estimates
+        return (exact, {}) if pseudo_limit is None else (estimate, {'pseudo_limit': pseudo_limit})
 
     def _name_to_port(self, port):
         port = 0 if port is None else self.component.get_port_number(port)
@@ -46,16 +71,18 @@ class ProcessorQuality(ProcessorBase):
         number probability distribution.
         :param port: the output port number or name to compute the statistics for.
         :param parameters: optional parameters to modify the system default parameters.
-        :param truncation: the number of probabilities (starting from p(0)) assumed to be non-negligible.
+        :param truncation: the number of probabilities (starting from p(0)) assumed to be non-negligible (None to
+            increase it until the distribution reaches the precision).
         :return: a probability distribution
         """
         name, port = self._name_to_port(port)
 
-        truncation = self._estimate_truncation(port, parameters) if truncation is None else truncation
-
-        distribution = compute_photon_number_distribution(source=self, port=port, truncation=truncation,
-                                                          parameters=parameters)
-        # distribution.precision_check(self.precision)
+        if truncation is None:
+            distribution = self._cached('pn_adaptive', compute_adaptive_photon_number_distribution, self, port=port,
+                                        parameters=parameters)
+        else:
+            distribution = self._cached('pn', compute_photon_number_distribution, self, port=port,
+                                        truncation=truncation, parameters=parameters)
 
         labels = ['pn', 'beta', 'mu', 'g2']
         mu = distribution.mu()
@@ -66,9 +93,7 @@ class ProcessorQuality(ProcessorBase):
         if mu > 10 ** -self.precision:
             quality.update({labels[3]: distribution.g2()})
         else:
-            print("Warning: no light detected in mode " + ('' if self.modes == 1 else str(port)) + ', ' +
-                  ('g2' if self.modes == 1 else 'g2 ' + str(port)) +
-                  " cannot be defined.")
+            warn_no_light(self.modes, port)
 
         self._update_quality(quality, name)
 
@@ -82,7 +107,7 @@ class ProcessorQuality(ProcessorBase):
         :return: the brightness
         """
         name, port = self._name_to_port(port)
-        beta = compute_brightness(self.component, port, parameters)
+        beta = self._cached('beta', compute_brightness, self.component, port=port, parameters=parameters)
         self._update_quality({'beta': beta}, name)
         return beta
 
@@ -91,13 +116,12 @@ class ProcessorQuality(ProcessorBase):
         Computes the average photon number of light from a port.
         :param port: the source port or list of ports to compute the statistics for.
         :param parameters: optional parameters to modify the system default parameters.
-        :param pseudo_limit: the numerical value approximating the zero-efficiency limit.
+        :param pseudo_limit: the numerical value approximating the zero-efficiency limit (None for exact moments).
         :return: the average photon number for the specified port.
         """
         name, port = self._name_to_port(port)
-        pseudo_limit = self._estimate_pseudo_limit(port, parameters) if pseudo_limit is None else pseudo_limit
-        mu = estimate_average_photon_number(self.component, port=port, pseudo_limit=pseudo_limit,
-                                            parameters=parameters)
+        algorithm, kwargs = self._algorithm(exact_average_photon_number, estimate_average_photon_number, pseudo_limit)
+        mu = self._cached('mu', algorithm, self.component, port=port, parameters=parameters, **kwargs)
         self._update_quality({'mu': mu}, name)
         return mu
 
@@ -107,16 +131,13 @@ class ProcessorQuality(ProcessorBase):
         a method simulating a Hanbury-Brown and Twiss setup to compute the integrated intensity correlation: g(2).
         :param port: the source port or list of ports to compute the statistics for.
         :param parameters: optional parameters to modify the system default parameters.
-        :param pseudo_limit: the numerical value approximating the zero-efficiency limit.
+        :param pseudo_limit: the numerical value approximating the zero-efficiency limit (None for exact moments).
         :param update_mu: updating quality dictionary with the average photon number used to compute g(2).
         :return: the average photon number or a list of average photon numbers for each port specified.
         """
         name, port = self._name_to_port(port)
-        pseudo_limit = self._estimate_pseudo_limit(port, parameters) if pseudo_limit is None else pseudo_limit
-
-        # Simulate using a detector with threshold resolution in the lossy regime
-        g2, mu = estimate_intensity_correlation(self.component, port=port, pseudo_limit=pseudo_limit,
-                                                parameters=parameters)
+        algorithm, kwargs = self._algorithm(exact_intensity_correlation, estimate_intensity_correlation, pseudo_limit)
+        g2, mu = self._cached('g2', algorithm, self.component, port=port, parameters=parameters, **kwargs)
         if update_mu:
             self._update_quality({'mu': mu}, name)
 
@@ -131,17 +152,20 @@ class ProcessorQuality(ProcessorBase):
             update_mu: bool = False,
             update_g2: bool = False,
             update_M: bool = True,
-            update_coh: bool = True):
+            update_coh: bool = True,
+            backend: str = 'processor'):
         """
         a method simulating a Hong-Ou-Mandel setup to compute the Hong-Ou-Mandel visibility.
            :param port: the source port or list of ports to compute the average photon number for.
            :param phase: the phase of the HOM interferometer giving V_HOM.
            :param parameters: optional parameters to modify the system default parameters.
-           :param pseudo_limit: the numerical value approximating the zero-efficiency limit.
+           :param pseudo_limit: the numerical value approximating the zero-efficiency limit (None for exact moments).
            :param update_mu: updating source quality with the average photon number used to compute g(2).
            :param update_g2: updating source quality with the value of g(2) used to compute VHOM.
            :param update_M: updating source quality with the mean wavepacket overlap M.
            :param update_coh: updating source quality with the value of c(1) and c(2) given by HOM simulation.
+           :param backend: 'processor' to simulate two copies of the source, or 'factorized' to compute the
+                phase-averaged visibility from the two-time correlations of a single copy (which does not give c(2)).
            :return: the Hong-Ou-Mandel visibility of photons in each port specified.
         """
         name, port = self._name_to_port(port)
@@ -150,7 +174,35 @@ class ProcessorQuality(ProcessorBase):
         assert all(u is False for u in [update_mu, update_g2, update_M, update_coh]) if phase is not None else True, \
             "Cannot update other figures of merit when computing VHOM for a specified phase."
 
-        pseudo_limit = self._estimate_pseudo_limit(port, parameters) if pseudo_limit is None else pseudo_limit
+        assert backend in ['processor', 'factorized'], "Backend must be 'processor' or 'factorized'."
+        if backend == 'factorized':
+            assert phase is None and pseudo_limit is None, \
+                "The factorized backend computes the phase-averaged visibility without a pseudo limit."
+            vhom, M, c1 = self._cached('hom_factorized', factorized_hom_visibility, self.component, port=port,
+                                       parameters=parameters)
+            quality = {'c1': real(c1)} if update_coh else {}
+            quality['vhom'] = real(vhom)
+            if update_M:
+                quality['M'] = real(M)
+            self._update_quality(dict(quality), name)
+
+            known = self.quality.get(name, {})
+            if update_g2 or 'g2' not in known:  # the g(2) used to compute VHOM, as with the processor backend
+                if update_mu or 'mu' not in known:
+                    self.mu(port=port, parameters=parameters)
+                self._update_quality({'g2': real(M - vhom)}, name)
+            return quality
+
+        if phase is None and pseudo_limit is None:  # all figures of merit from the same simulations
+            suite = self.quality_suite(port, metrics=['mu', 'g2', 'vhom'] + (['c1', 'c2'] if update_coh else []),
+                                       parameters=parameters)
+            quality = {k: real(suite[k]) for k in ['c1', 'c2', 'vhom'] if k in suite}
+            if update_M:
+                quality['M'] = real(suite['vhom'] + suite['g2'])
+            self._update_quality(quality, name)
+            return quality
+
+        algorithm, kwargs = self._algorithm(exact_hom_visibility, estimate_hom_visibility, pseudo_limit)
 
         labels = ['vhom', 'M', 'c1', 'c2', 'mu', 'g2']
 
@@ -158,11 +210,14 @@ class ProcessorQuality(ProcessorBase):
 
         if phase is None:
             if update_coh:
-                vhom, c1, c2 = estimate_hom_visibility_with_coherence(self.component, port, pseudo_limit, parameters)
+                coherence_algorithm, _ = self._algorithm(exact_hom_visibility_with_coherence,
+                                                         estimate_hom_visibility_with_coherence, pseudo_limit)
+                vhom, c1, c2 = self._cached('hom_coherence', coherence_algorithm, self.component, port=port,
+                                            parameters=parameters, **kwargs)
                 quality[labels[2]] = real(c1)
                 quality[labels[3]] = real(c2)
             else:
-                vhom = estimate_hom_visibility(self.component, port, pseudo_limit, parameters)
+                vhom = self._cached('hom', algorithm, self.component, port=port, parameters=parameters, **kwargs)
 
             if update_g2 or labels[-1] not in self.quality.keys():
                 self.g2(port=port, parameters=parameters, pseudo_limit=pseudo_limit,
@@ -175,13 +230,46 @@ class ProcessorQuality(ProcessorBase):
             self._update_quality(quality, name)
 
         else:  # estimate VHOM(phi)
-            vhom = estimate_hom_visibility(self.component, port, pseudo_limit, parameters, phase)
+            vhom = self._cached('hom', algorithm, self.component, port=port, parameters=parameters, phi=phase,
+                                **kwargs)
             quality[labels[0]] = real(vhom)
 
             self._update_quality(quality, name)
 
         return quality
 
+    def hom_fringe(self, phases: Union[List[float], ndarray], port: Union[int, str] = None,
+                   parameters: dict = None) -> ndarray:
+        """
+        Computes the Hong-Ou-Mandel visibility for an array of interferometer phases. The harmonics of the fringe are
+        computed once from five simulations, after which the fringe is reconstructed exactly for any phase.
+        :param phases: a list or array of phases of the HOM interferometer.
+        :param port: the source port to compute the fringe for.
+        :param parameters: optional parameters to modify the system default parameters.
+        :return: an array of the Hong-Ou-Mandel visibility at each phase.
+        """
+        _, port = self._name_to_port(port)
+        harmonics, norm = self._cached('hom_harmonics', hom_fringe_harmonics, self.component, port=port,
+                                       parameters=parameters)
+        return hom_fringe(harmonics, norm, phases)
+
+    def quality_suite(self, port: Union[int, str] = None, metrics: List[str] = None, parameters: dict = None) -> dict:
+        """
+        Computes several figures of merit of light from a port, planning the simulations so that each distinct
+        dynamics is simulated once: the Hong-Ou-Mandel simulations also yield the brightness, the average photon
+        number and g(2).
+        :param port: the source port to compute the figures of merit for.
+        :param metrics: a list of figures of merit among 'beta', 'mu', 'g2', 'vhom', 'M', 'c1', 'c2' (all by default).
+        :param parameters: optional parameters to modify the system default parameters.
+        :return: a dictionary of the requested figures of merit.
+        """
+        name, port = self._name_to_port(port)
+        metrics = None if metrics is None else tuple(metrics)
+        quality = self._cached('suite', compute_quality_suite, self.component, port=port, metrics=metrics,
+                               parameters=parameters)
+        self._update_quality(quality, name)
+        return quality
+
     def display_hom(self, port: Union[int, str] = None, pseudo_limit = None, parameters: dict = None):
         quantities = self.hom(port, parameters=parameters, pseudo_limit=pseudo_limit)
         print("{:<30} | {:}".format("Figure of Merit", "Value"))
@@ -207,7 +295,8 @@ class ProcessorQuality(ProcessorBase):
                  end: float = None,
                  options: Options = None) -> Lifetime:
         name, port = self._name_to_port(port)
-        lifetime = compute_lifetime(self.component, port, resolution, start, end, parameters, options)
+        lifetime = self._cached('lifetime', compute_lifetime, self.component, port=port, resolution=resolution,
+                                start=start, end=end, parameters=parameters, options=options)
         self.quality.update({name: {'lifetime': lifetime}})
 
         return lifetime
@@ -236,8 +325,23 @@ class ProcessorQuality(ProcessorBase):
 
             return lifetime.plot(label if label else name, scale=scale)
 
+    def _wigner_processor(self, port: int, parameters: dict = None, pseudo_limit: float = 0.01,
+                          options: Options = None, lo_resolution=600, lo_fluctuations=2) -> ProcessorBase:
+        # the local oscillator is shaped by the source lifetime, so both are built once for each configuration
+        key = result_key(fingerprint(self.component), 'wigner_processor', parameters, self.precision, port=port,
+                         pseudo_limit=pseudo_limit, lo_resolution=lo_resolution, lo_fluctuations=lo_fluctuations,
+                         conditions=(self.initial_state, self.initial_time, self.final_time))
+        found, processor = self._wigner_processors.get(key)
+        if not found:
+            lifetime = self.lifetime(port=port, resolution=lo_resolution, parameters=parameters, options=options)
+            processor = wigner_processor(self.component, port, lifetime, parameters, pseudo_limit, lo_resolution,
+                                         lo_fluctuations)
+            self._wigner_processors.put(key, processor)
+        return processor
+
     def wigner(self, port: Union[int, str] = None, alpha: Union[complex, List[complex]] = 0, parameters: dict = None,
-               pseudo_limit: float = 0.01, options: Options = None, lo_resolution=600, lo_fluctuations=2):
+               pseudo_limit: float = 0.01, options: Options = None, lo_resolution=600, lo_fluctuations=2,
+               workers: int = None):
         """
         :param port: the port of the source being analysed
         :param alpha: a complex amplitude in phase space or a list of such amplitudes
@@ -246,15 +350,40 @@ class ProcessorQuality(ProcessorBase):
         :param options: QuTiP options
         :param lo_resolution: the number of numerical points to interpolate the local oscillator shape
         :param lo_fluctuations: the maximum nonlinear fluctuation of local oscillator photons
+        :param workers: the number of worker processes sharing the amplitudes (None to use the current process)
         :return: the value W(alpha) of the Wigner function at the point alpha
         """
         name, port = self._name_to_port(port)
 
-        # get the LO profile from the source lifetime
-        lifetime = self.lifetime(port=port, resolution=lo_resolution, parameters=parameters, options=options)
-        wigner = compute_wigner_function(self.component, port, lifetime, alpha, parameters,
-                                         pseudo_limit, lo_resolution, lo_fluctuations)
+        processor = self._wigner_processor(port, parameters, pseudo_limit, options, lo_resolution, lo_fluctuations)
+        alpha = alpha if isinstance(alpha, list) or isinstance(alpha, ndarray) else [alpha]
+        points = evaluate_wigner_processor(processor, alpha, pseudo_limit, self.component.set_parameters(parameters)
+                                           if parameters is not None else None, workers)
+        wigner = WignerFunction(alphas=alpha, points=points)
         self.quality.update({name: {'wigner': wigner}})
         return wigner
 
+    def wigner_grid(self, x: Union[List[float], ndarray], p: Union[List[float], ndarray],
+                    port: Union[int, str] = None, parameters: dict = None, pseudo_limit: float = 0.01,
+                    options: Options = None, lo_resolution=600, lo_fluctuations=2, workers: int = None) -> WignerGrid:
+        """
+        :param x: the real parts of the grid amplitudes
+        :param p: the imaginary parts of the grid amplitudes
+        :param port: the port of the source being analysed
+        :param parameters: a dictionary of parameters to modify the default parameters
+        :param pseudo_limit: a loss regime parameter for the pseudo-Wigner algorithm
+        :param options: QuTiP options
+        :param lo_resolution: the number of numerical points to interpolate the local oscillator shape
+        :param lo_fluctuations: the maximum nonlinear fluctuation of local oscillator photons
+        :param workers: the number of worker processes sharing the grid (None to use the current process)
+        :return: the values W(x + ip) of the Wigner function on the grid
+        """
+        name, port = self._name_to_port(port)
 
+        processor = self._wigner_processor(port, parameters, pseudo_limit, options, lo_resolution, lo_fluctuations)
+        points = evaluate_wigner_processor(processor, grid_amplitudes(x, p), pseudo_limit,
+                                           self.component.set_parameters(parameters)
+                                           if parameters is not None else None, workers)
+        grid = WignerGrid(x, p, points=points)
+        self.quality.update({name: {'wigner': grid}})
+        return grid
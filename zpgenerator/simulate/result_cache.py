@@ -0,0 +1,188 @@
+from ..time.evaluate.cache import LRUCache, CacheInfo, canonical
+from .base_processor import ProcessorBase
+from functools import partial
+from types import FunctionType, MethodType, BuiltinFunctionType, CodeType, ModuleType
+from qutip import Qobj
+from frozendict import frozendict
+import numpy as np
+import hashlib
+import pickle
+import os
+
+
+def fingerprint(obj) -> str:
+    """
+    Computes a structural fingerprint of an object, such as a component, from its operators, time functions,
+    parameters, ports and detectors. Equal fingerprints identify objects that produce the same simulation results,
+    also across processes. Objects that cannot be described structurally are identified by their memory address, so
+    that they never produce false matches.
+
+    :param obj: the object to fingerprint.
+    :return: a hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    _describe(obj, digest.update, {})
+    return digest.hexdigest()
+
+
+def _describe(obj, write: callable, memo: dict):
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes, np.number)):
+        write(repr(obj).encode())
+        return
+
+    if id(obj) in memo:  # shared or cyclic references
+        write(b'ref' + str(memo[id(obj)][0]).encode())
+        return
+    memo[id(obj)] = (len(memo), obj)  # keeping a reference so that temporary objects do not share an id
+
+    if isinstance(obj, Qobj):
+        write(b'Qobj' + repr(obj.dims).encode() + obj.type.encode())
+        _describe(obj.full(), write, memo)
+    elif isinstance(obj, np.ndarray):
+        write(b'ndarray' + repr(obj.shape).encode() + obj.dtype.str.encode() + np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        write(type(obj).__name__.encode() + str(len(obj)).encode())
+        for item in obj:
+            _describe(item, write, memo)
+    elif isinstance(obj, (set, frozenset)):
+        write(b'set')
+        for item in sorted(obj, key=repr):
+            _describe(item, write, memo)
+    elif isinstance(obj, (dict, frozendict)):
+        write(b'dict' + str(len(obj)).encode())
+        for key, value in sorted(obj.items(), key=lambda item: repr(item[0])):
+            _describe(key, write, memo)
+            _describe(value, write, memo)
+    elif isinstance(obj, FunctionType):
+        write(b'function' + obj.__module__.encode() + obj.__qualname__.encode())
+        _describe(obj.__code__, write, memo)
+        _describe(obj.__defaults__, write, memo)
+        _describe(obj.__kwdefaults__, write, memo)
+        _describe(tuple(cell.cell_contents for cell in obj.__closure__ or ()), write, memo)
+        # the module-level values that the function reads, such as a global amplitude
+        _describe({name: obj.__globals__[name] for name in _global_names(obj.__code__) if name in obj.__globals__},
+                  write, memo)
+    elif isinstance(obj, CodeType):
+        write(obj.co_code)
+        _describe(obj.co_consts, write, memo)
+        _describe(obj.co_names, write, memo)
+    elif isinstance(obj, MethodType):
+        write(b'method')
+        _describe(obj.__func__, write, memo)
+        _describe(obj.__self__, write, memo)
+    elif isinstance(obj, partial):
+        write(b'partial')
+        _describe((obj.func, obj.args, obj.keywords), write, memo)
+    elif isinstance(obj, ModuleType):
+        write(b'module' + obj.__name__.encode())
+    elif isinstance(obj, (BuiltinFunctionType, type)):
+        write(b'builtin' + str(getattr(obj, '__module__', '')).encode() + obj.__qualname__.encode())
+    elif hasattr(obj, '__dict__'):
+        write(b'object' + type(obj).__module__.encode() + type(obj).__qualname__.encode())
+        # caches and processors are created lazily and hold results rather than structure, as does any lazy state
+        # that a class leaves out of its __getstate__
+        state = vars(obj) if getattr(type(obj), '__getstate__', None) is getattr(object, '__getstate__', None) \
+            else obj.__getstate__()
+        _describe({k: None if isinstance(v, ProcessorBase) else v
+                   for k, v in state.items() if not isinstance(v, LRUCache)}, write, memo)
+    else:
+        try:
+            write(b'pickle' + pickle.dumps(obj))
+        except Exception:
+            write(b'id' + str(id(obj)).encode())
+
+
+def _global_names(code: CodeType) -> set:
+    # names that a function and the functions nested in it may look up in the module globals
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def result_key(identifier: str, quantity: str, parameters: dict = None, precision: int = None, **kwargs) -> str:
+    """
+    :param identifier: the fingerprint of the simulated component.
+    :param quantity: the name of the computed quantity.
+    :param parameters: the parameters of the simulation.
+    :param precision: the precision of the simulation.
+    :param kwargs: any other arguments that modify the result.
+    :return: a hexadecimal key identifying the result.
+    """
+    digest = hashlib.sha256()
+    try:
+        arguments = canonical({'parameters': parameters, 'precision': precision, 'kwargs': kwargs})
+        digest.update(repr(arguments).encode())
+    except TypeError:
+        _describe({'parameters': parameters, 'precision': precision, 'kwargs': kwargs}, digest.update, {})
+    return identifier + '-' + quantity + '-' + digest.hexdigest()
+
+
+class ResultCache:
+    """
+    A two-tier cache of simulation results: an in-memory LRU tier, and an optional on-disk tier storing each result
+    in a .npz file of a directory, so that results are shared across processes and sessions.
+    """
+
+    def __init__(self, maxsize: int = 128, directory: str = None):
+        """
+        :param maxsize: the maximum number of results kept in memory.
+        :param directory: an optional directory for the on-disk tier.
+        """
+        self.memory = LRUCache(maxsize)
+        self.directory = directory
+        self.hits = 0  # results found in either tier
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key: str):
+        """
+        :param key: the key of the result.
+        :return: whether the result was found, and the result (or None).
+        """
+        found, value = self.memory.get(key)
+        if not found and self.directory is not None and os.path.exists(self._path(key)):
+            with np.load(self._path(key), allow_pickle=True) as file:
+                value = file['value'][()]
+            self.memory.put(key, value)
+            found = True
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found, value
+
+    def put(self, key: str, value):
+        self.memory.put(key, value)
+        if self.directory is not None:
+            array = np.empty((), dtype=object)
+            array[()] = value
+            np.savez(self._path(key), value=array)
+
+    def clear(self):
+        """Clears both tiers of the cache."""
+        self.memory.clear()
+        if self.directory is not None:
+            for file in os.listdir(self.directory):
+                if file.endswith('.npz'):
+                    os.remove(os.path.join(self.directory, file))
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.memory.evictions, len(self.memory), self.memory.maxsize)
+
+    def compute(self, key: str, function: callable, *args, **kwargs):
+        """
+        :param key: the key of the result.
+        :param function: the function computing the result if it is not cached.
+        :return: the cached or computed result.
+        """
+        found, value = self.get(key)
+        if not found:
+            value = function(*args, **kwargs)
+            self.put(key, value)
+        return value
@@ -0,0 +1,165 @@
+from .result_cache import fingerprint
+from typing import List, Union
+from collections.abc import Mapping
+from itertools import product
+from qutip import Qobj
+import multiprocessing
+import numpy as np
+import pickle
+import os
+
+_processor = None  # processor inherited by forked worker processes
+
+
+def _evaluate_chunk(args):
+    quantity, points, kwargs = args
+    return [_evaluate_point(_processor, quantity, point, kwargs) for point in points]
+
+
+def _evaluate_point(processor, quantity: str, parameters: dict, kwargs: dict):
+    result = getattr(processor, quantity)(parameters=parameters, **kwargs)
+    # distributions are stored as plain dictionaries so that they can be exchanged between processes
+    return {k: v.full() if isinstance(v, Qobj) else v for k, v in result.items()} if isinstance(result, Mapping) \
+        else result
+
+
+def parameter_points(parameter_grid: Union[dict, List[dict]]) -> tuple:
+    """
+    :param parameter_grid: a dictionary of parameter values forming a cartesian grid, or a list of parameter
+        dictionaries.
+    :return: the list of parameter dictionaries and the shape of the grid.
+    """
+    if isinstance(parameter_grid, dict):
+        names = list(parameter_grid.keys())
+        values = [list(np.atleast_1d(parameter_grid[name])) for name in names]
+        return [dict(zip(names, point)) for point in product(*values)], tuple(len(value) for value in values)
+    return list(parameter_grid), (len(parameter_grid),)
+
+
+class SweepResult:
+    """
+    The results of a parameter sweep, stacked into an array aligned with the parameter grid. Distributions are
+    stacked along an additional axis ordered as the outcomes property, and states or channels along three additional
+    axes.
+    """
+
+    def __init__(self, points: List[dict], shape: tuple, results: list):
+        """
+        :param points: the list of parameter dictionaries in the order of the grid.
+        :param shape: the shape of the parameter grid.
+        :param results: the list of results for each parameter point.
+        """
+        self.points = points
+        self.shape = shape
+        self.results = results
+        self.outcomes = None
+
+        if all(isinstance(result, dict) for result in results):
+            self.outcomes = sorted(set(k for result in results for k in result.keys()))
+            sample = next((v for result in results for v in result.values()), 0.)
+            values = np.zeros((len(results), len(self.outcomes)) + np.shape(sample),
+                              dtype=complex if np.iscomplexobj(sample) else float)
+            index = {outcome: i for i, outcome in enumerate(self.outcomes)}
+            for n, result in enumerate(results):
+                for k, v in result.items():
+                    values[n, index[k]] = v
+            self.values = values.reshape(shape + values.shape[1:])
+        else:
+            self.values = np.array(results).reshape(shape + np.shape(results[0]) if results else shape)
+
+    def __len__(self):
+        return len(self.points)
+
+
+class Sweep:
+    """
+    Evaluates a quantity of a processor for every point of a parameter grid. The grid is split into chunks that are
+    fanned out over a pool of forked worker processes that inherit the processor and its instance caches. Each point
+    is evaluated from scratch, since the branches and detector bins may depend on the parameters. Each completed chunk can be written to its own file of a checkpoint directory, so that long
+    sweeps can be resumed, also with a different chunk size.
+    """
+
+    def __init__(self, processor, quantity: str = 'probs', workers: int = None, chunk_size: int = 16,
+                 checkpoint: str = None):
+        """
+        :param processor: the processor to evaluate.
+        :param quantity: the name of a processor method accepting a parameters argument (e.g. 'probs').
+        :param workers: the number of worker processes (None to evaluate in the current process).
+        :param chunk_size: the number of parameter points evaluated by each task.
+        :param checkpoint: an optional directory in which completed chunks are saved and from which they are resumed.
+        """
+        assert callable(getattr(processor, quantity, None)), "The quantity must be the name of a processor method."
+        assert workers is None or workers > 0, "Number of workers must be a positive integer."
+        assert chunk_size > 0, "Chunk size must be a positive integer."
+        self.processor = processor
+        self.quantity = quantity
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+
+    @staticmethod
+    def _dump(path: str, value):
+        with open(path + '.tmp', 'wb') as file:
+            pickle.dump(value, file)
+        os.replace(path + '.tmp', path)
+
+    def _load(self, points: List[dict], kwargs: dict) -> dict:
+        # the saved result of each point index
+        if self.checkpoint is None:
+            return {}
+        sweep = {'quantity': self.quantity, 'points': points, 'kwargs': fingerprint(kwargs)}
+        manifest = os.path.join(self.checkpoint, 'sweep.pkl')
+        if not os.path.exists(manifest):
+            os.makedirs(self.checkpoint, exist_ok=True)
+            self._dump(manifest, sweep)
+            return {}
+        with open(manifest, 'rb') as file:
+            assert pickle.load(file) == sweep, "The checkpoint directory belongs to a different sweep."
+
+        results = {}
+        for name in sorted(os.listdir(self.checkpoint)):
+            if name.startswith('chunk-') and name.endswith('.pkl'):
+                with open(os.path.join(self.checkpoint, name), 'rb') as file:
+                    results.update(pickle.load(file))
+        return results
+
+    def _save(self, indices: List[int], results: list):
+        if self.checkpoint is not None:
+            self._dump(os.path.join(self.checkpoint, 'chunk-' + str(indices[0]) + '.pkl'), dict(zip(indices, results)))
+
+    def run(self, parameter_grid: Union[dict, List[dict], np.ndarray], **kwargs) -> SweepResult:
+        """
+        :param parameter_grid: a dictionary of parameter values forming a cartesian grid, a list of parameter
+            dictionaries, or an array whose rows are parameter vectors ordered as the processor parameter_order.
+        :param kwargs: additional keyword arguments passed to the processor method.
+        :return: a SweepResult object.
+        """
+        global _processor
+        if isinstance(parameter_grid, np.ndarray):  # rows of parameter vectors
+            parameter_grid = [self.processor.vector_parameters(vector) for vector in parameter_grid]
+        points, shape = parameter_points(parameter_grid)
+        results = self._load(points, kwargs)
+        missing = [i for i in range(0, len(points)) if i not in results]
+        chunks = [missing[start:start + self.chunk_size] for start in range(0, len(missing), self.chunk_size)]
+        tasks = [(self.quantity, [points[i] for i in indices], kwargs) for indices in chunks]
+
+        workers = min(self.workers or 1, len(tasks))
+        processor_workers = self.processor.workers
+        _processor = self.processor
+        try:
+            if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+                self.processor.workers = None  # pool workers cannot spawn their own pools
+                with multiprocessing.get_context('fork').Pool(workers) as pool:
+                    for indices, result in zip(chunks, pool.imap(_evaluate_chunk, tasks)):
+                        results.update(zip(indices, result))
+                        self._save(indices, result)
+            else:
+                for indices, task in zip(chunks, tasks):
+                    result = _evaluate_chunk(task)
+                    results.update(zip(indices, result))
+                    self._save(indices, result)
+        finally:
+            _processor = None
+            self.processor.workers = processor_workers
+
+        return SweepResult(points, shape, [results[i] for i in range(0, len(points))])
@@ -2,4 +2,4 @@ from .dirac import *
 from .operator import *
 from .tensor import *
 from .quadruple import *
-from .cache import DefaultCache
+from .cache import DefaultCache, LRUCache, CacheInfo
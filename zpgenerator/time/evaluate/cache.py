@@ -1,38 +1,188 @@
 from ..parameters.dictionary import Parameters
 from frozendict import frozendict
-from functools import cache
+from collections import OrderedDict, namedtuple
+from functools import update_wrapper
+from numpy import ndarray
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'size', 'maxsize'])
+
+_generation = 0  # incremented whenever parameterized objects change, so that every instance cache is refreshed
+
+
+class LRUCache:
+    """A bounded cache that evicts the least recently used entry, and keeps statistics of its use"""
+
+    def __init__(self, maxsize: int = 256):
+        """
+        :param maxsize: the maximum number of entries (None for an unbounded cache).
+        """
+        assert maxsize is None or maxsize > 0, "Cache size must be a positive integer."
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = None  # the generation of parameterized objects of the entries (see instance_cache)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    # copies of an object must not share or inherit the results computed for the original
+    def __copy__(self):
+        return LRUCache(self.maxsize)
+
+    def __deepcopy__(self, memo):
+        return LRUCache(self.maxsize)
+
+    def get(self, key):
+        """
+        :param key: a hashable key.
+        :return: whether the key was found, and the cached value (or None).
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if self.maxsize is not None and len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.evictions, len(self._entries), self.maxsize)
+
+
+def invalidate_caches():
+    """
+    Invalidates the instance caches of every object, after a change of the parameters or structure of an object that
+    may modify the results of the objects containing it. Each cache is only emptied when it is next used.
+    """
+    global _generation
+    _generation += 1
+
+
+def instance_cache(obj, attribute: str, maxsize: int = None) -> LRUCache:
+    """
+    :param obj: an instance.
+    :param attribute: the name of the attribute holding the cache.
+    :param maxsize: the maximum number of entries of a new cache.
+    :return: the LRUCache of the instance, emptied if objects have changed since it was last used.
+    """
+    try:
+        cache = obj.__dict__[attribute]
+    except KeyError:
+        cache = obj.__dict__[attribute] = LRUCache(maxsize)
+    if cache.generation != _generation:
+        cache.clear()
+        cache.generation = _generation
+    return cache
+
+
+def canonical(value):
+    """
+    :param value: a parameter value.
+    :return: a hashable form of the value, or raises a TypeError if it cannot be made hashable.
+    """
+    if isinstance(value, Parameters):
+        return 'Parameters', canonical(value.default), canonical(value.user)
+    if isinstance(value, (dict, frozendict)):
+        return tuple(sorted((k, canonical(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical(v) for v in value)
+    if isinstance(value, ndarray):
+        return 'ndarray', value.shape, value.dtype.str, value.tobytes()
+    hash(value)
+    return value
 
 
 class DefaultCache:
+    """
+    A decorator caching the results of a method for each instance, time, and set of parameters. Each instance holds
+    its own bounded LRUCache, so that results are released with the instance and copies start with an empty cache.
+    Both default and user parameters are part of the key, and calls with parameters that cannot be made hashable are
+    evaluated without caching.
+    """
+
+    maxsize = 256  # default number of entries kept for each instance
 
-    def __init__(self, time_arg: bool = True):
+    def __init__(self, time_arg: bool = True, maxsize: int = None):
+        """
+        :param time_arg: whether the method takes a time argument before the parameters.
+        :param maxsize: the maximum number of entries kept for each instance.
+        """
         self.arg_num = 2 if time_arg else 1
+        self.size = DefaultCache.maxsize if maxsize is None else maxsize
 
     def __call__(self, function):
-
         self.function = function
+        self.attribute = '_cache_' + function.__name__
+        update_wrapper(self, function)
+        return self
 
-        def wrapper(*args, **kwargs):
+    def __get__(self, obj, objtype=None):
+        return self if obj is None else BoundCache(self, obj)
 
-            obj = args[0]
-            parameters = kwargs.get('parameters', args[self.arg_num] if len(args) > self.arg_num else None)
-            if hasattr(obj, 'set_parameters'):
-                parameters = obj.set_parameters(parameters)
+    def cache(self, obj) -> LRUCache:
+        return instance_cache(obj, self.attribute, self.size)
 
-            if isinstance(parameters, Parameters) and not parameters.user or parameters is None or parameters == {}:
-                return self.cached_function(*args[:self.arg_num],
-                                            frozendict(parameters.default) if parameters else None)
-            else:
-                return self.function(*args[:self.arg_num], parameters)
+    def call(self, obj, *args, **kwargs):
+        args = (obj,) + args
+        parameters = kwargs.get('parameters', args[self.arg_num] if len(args) > self.arg_num else None)
+        if hasattr(obj, 'set_parameters'):
+            parameters = obj.set_parameters(parameters)
 
-        wrapper.cache_clear = self.cache_clear
+        if isinstance(parameters, Parameters) and not parameters.user or parameters is None or parameters == {}:
+            parameters = frozendict(parameters.default) if parameters else None
 
-        return wrapper
+        try:
+            key = (args[1:self.arg_num], canonical(parameters))
+        except TypeError:  # unhashable parameter values
+            return self.function(*args[:self.arg_num], parameters)
 
-    @cache
-    def cached_function(self, *args, **kwargs):
-        return self.function(*args, **kwargs)
+        cache = self.cache(obj)
+        found, value = cache.get(key)
+        if not found:
+            value = self.function(*args[:self.arg_num], parameters)
+            cache.put(key, value)
+        return value
+
+
+class BoundCache:
+    """A cached method bound to an instance"""
+
+    def __init__(self, cache: DefaultCache, obj):
+        self._cache = cache
+        self._obj = obj
+
+    def __call__(self, *args, **kwargs):
+        return self._cache.call(self._obj, *args, **kwargs)
 
     def cache_clear(self):
-        self.cached_function.cache_clear()
+        self._cache.cache(self._obj).clear()
+
+    def cache_info(self) -> CacheInfo:
+        return self._cache.cache(self._obj).info()
+
+
+def clear_caches(obj):
+    """
+    Clears every DefaultCache of an instance.
 
+    :param obj: an instance with methods decorated by DefaultCache.
+    """
+    for value in obj.__dict__.values():
+        if isinstance(value, LRUCache):
+            value.clear()
@@ -4,7 +4,7 @@
 from .tensor import tensor_insert, concat_diag, permutation_qobj
 from qutip import Qobj, qeye, qzero, spre, spost, lindblad_dissipator, liouvillian
 from typing import Union, List
-from numpy import conj
+from numpy import conj, asarray, ndarray
 from math import prod
 from .cache import DefaultCache
 
@@ -15,6 +15,8 @@ class Func:
         self.func = func
         self.args = {} if args is None else args
         self.cache = cache
+        self._rule = None  # for functions built from other functions, the rule to combine their values
+        self._terms = ()
 
     def __call__(self, t: float, args: dict = None):
         return self.cached_call(t, args) if self.cache else self.call(t, args)
@@ -26,20 +28,27 @@ class Func:
     def call(self, t: float, args: dict = None):
         return self.func(t, self.args | args if args else self.args) if callable(self.func) else self.func
 
+    @classmethod
+    def _combine(cls, func: callable, rule: tuple, terms: tuple, args: dict = None):
+        combined = cls(func, args=args)
+        combined._rule = rule
+        combined._terms = terms
+        return combined
+
     def __add__(self, other):
         if callable(other):
-            return Func(lambda t, args: self(t, args) + other(t, args))
+            return Func._combine(lambda t, args: self(t, args) + other(t, args), ('add',), (self, other))
         else:
-            return Func(lambda t, args: self(t, args) + other)
+            return Func._combine(lambda t, args: self(t, args) + other, ('shift', other), (self,))
 
     def __radd__(self, other):
         return self.__add__(other)
 
     def __mul__(self, other):
         if isinstance(other, Func):
-            return Func(lambda t, args: self(t, args) * other(t, args))
+            return Func._combine(lambda t, args: self(t, args) * other(t, args), ('mul',), (self, other))
         elif not callable(other):
-            return Func(lambda t, args: self(t, args) * other)
+            return Func._combine(lambda t, args: self(t, args) * other, ('scale', other), (self,))
         elif isinstance(other, Qobj):
             return OpFuncPair(op=other, func=self)
         else:
@@ -49,10 +58,91 @@ class Func:
         return self.__mul__(other)
 
     def conj(self):
-        return Func(lambda t, args: conj(self(t, args)))
+        return Func._combine(lambda t, args: conj(self(t, args)), ('conj',), (self,))
 
     def compose_with(self, function: callable, parameters: dict):
-        return Func(lambda t, args: function(self(t, args), args), args=parameters)
+        return Func._combine(lambda t, args: function(self(t, args), args), ('compose', function), (self,),
+                             args=parameters)
+
+    def compile(self, args: dict = None, memo: dict = None) -> callable:
+        """
+        Flattens the function into a single callable of time with all arguments bound in advance, so that evaluating
+        it does not merge dictionaries or dispatch through nested Func objects. The result is vectorised over t
+        whenever the underlying functions are.
+
+        :param args: arguments passed to the function, as they would be when calling it.
+        :param memo: compiled functions shared between terms that appear more than once.
+        :return: a callable f(t).
+        """
+        if not callable(self.func):
+            value = self.func
+            return lambda t: value
+
+        args = (self.args | args if args else self.args) if self.args else args if args else {}
+        memo = {} if memo is None else memo
+        key = (id(self), id(args))
+        if key not in memo:
+            memo[key] = self._compile(args, memo)
+        return memo[key]
+
+    def _compile(self, args: dict, memo: dict) -> callable:
+        if self._rule is None:
+            func = self.func
+            compiled = lambda t: func(t, args)
+        else:
+            terms = [term.compile(args, memo) if isinstance(term, Func) else (lambda t, term=term: term(t, args))
+                     for term in self._terms]
+            name = self._rule[0]
+            if name == 'add':
+                a, b = terms
+                compiled = lambda t: a(t) + b(t)
+            elif name == 'mul':
+                a, b = terms
+                compiled = lambda t: a(t) * b(t)
+            elif name == 'shift':
+                a, value = terms[0], self._rule[1]
+                compiled = lambda t: a(t) + value
+            elif name == 'scale':
+                a, value = terms[0], self._rule[1]
+                compiled = lambda t: a(t) * value
+            elif name == 'conj':
+                a = terms[0]
+                compiled = lambda t: conj(a(t))
+            else:
+                a, function = terms[0], self._rule[1]
+                compiled = lambda t: function(a(t), args)
+
+        if self.cache:  # reuse the last value, since terms sharing this function are evaluated at the same time
+            last = [None, None]
+
+            def cached(t):
+                if last[0] is not t:
+                    last[0], last[1] = t, compiled(t)
+                return last[1]
+            return cached
+        return compiled
+
+    def compiled(self) -> callable:
+        """
+        :return: a callable f(t, args) for qutip that uses the compiled function unless extra arguments are given.
+        """
+        compiled = self.compile()
+        return lambda t, args=None: self(t, args) if args else compiled(t)
+
+    def tabulate(self, tlist) -> ndarray:
+        """
+        :param tlist: a list of times.
+        :return: an array of function values at each time, evaluated in a single vectorised call where possible.
+        """
+        tlist = asarray(tlist, dtype=float)
+        compiled = self.compile()
+        try:
+            values = asarray(compiled(tlist))
+            if values.shape == tlist.shape:
+                return values
+        except (TypeError, ValueError):
+            pass
+        return asarray([compiled(t) for t in tlist])
 
 
 class EvaluatedFunction:
@@ -201,8 +291,8 @@ class OpFuncPair:
         mat = self.op
         return mat.dims[0][0] if mat.issuper else mat.dims[0]
 
-    def list_form(self):
-        return [self.op, self.func]
+    def list_form(self, compiled: bool = False):
+        return [self.op, self.func.compiled() if compiled else self.func]
 
     def permute_left(self, order: list):
         return OpFuncPair(op=permutation_qobj(order) * self.op, func=self.func)
@@ -273,8 +363,8 @@ class EvaluatedOperator(EvaluatedFunction):
     def is_super(self):
         return self.constant.issuper
 
-    def list_form(self):
-        variable = [v.list_form() for v in self.variable]
+    def list_form(self, compiled: bool = False):
+        variable = [v.list_form(compiled) for v in self.variable]
         return [self.constant, *variable]
 
     @property
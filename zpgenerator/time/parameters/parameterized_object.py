@@ -1,10 +1,12 @@
 from .parameter_function import CompositeParameterFunction, ParameterFunction
 from .dictionary import Parameters
+from ..evaluate.cache import invalidate_caches, instance_cache
 from abc import ABC, abstractmethod
 from typing import List, Union
-from functools import cache
 from copy import copy
 from frozendict import frozendict
+from numbers import Number
+from numpy import ndarray, asarray
 
 
 class AParameterizedObject(ABC):
@@ -136,13 +138,26 @@ class ParameterizedObject(AParameterizedObject):
         self._keys = []
 
         self._parameter_function = CompositeParameterFunction()
-        self.name = name
+        self._name = name
+        self._find_keys()
+
+    def __getstate__(self):
+        # the routes of parameter keys are memoised on use, and are not part of the state of an object
+        return self.__dict__ | {'_routes': {}}
 
     def _check_keys(self):
         """
-        Determines the names of all keys that will be used by itself or child objects.
+        Determines the names of all keys that will be used by itself or child objects after a change of the object or
+        its children, invalidating any cached results.
         """
         self._cache_clear()
+        self._find_keys()
+
+    def _find_keys(self):
+        """
+        Determines the names of all keys that will be used by itself or child objects.
+        """
+        self._routes = {}  # input keys mapped to the keys seen by this object and its children
         self._keys = [child.named_parameters for child in self._children]  # initialise list of keys to watch for
         self._keys = [key for child in self._keys for key in child]  # flattening list of lists
         self._keys += list(self._default_parameters.keys())  # add any keys in default dictionary
@@ -163,19 +178,23 @@ class ParameterizedObject(AParameterizedObject):
 
     @property
     def parameters(self) -> List[str]:
-        self._check_keys()
+        self._find_keys()
         return [k for k in sorted(self.keys) if k[0] != Parameters.DEFAULT_PREFIX]
 
-    @cache
     def uses_parameter(self, key: str):
-        if key not in self._renames.keys():
-            return key in self.keys or any(child.uses_parameter(Parameters.remove_name(key, child.name))
-                                           for child in self._children)
-        else:
-            return key in self.keys
+        cache = instance_cache(self, '_cache_uses_parameter')
+        found, uses = cache.get(key)
+        if not found:
+            if key not in self._renames.keys():
+                uses = key in self.keys or any(child.uses_parameter(Parameters.remove_name(key, child.name))
+                                               for child in self._children)
+            else:
+                uses = key in self.keys
+            cache.put(key, uses)
+        return uses
 
     def _cache_clear(self):
-        self.uses_parameter.cache_clear()
+        invalidate_caches()  # the results of this object and of any object containing it
 
     @property
     def name(self):
@@ -207,7 +226,7 @@ class ParameterizedObject(AParameterizedObject):
         The input parameters that will be used when evaluating this object without specifying alternative parameters.
         :return: a dictionary of parameters
         """
-        self._check_keys()
+        self._find_keys()
         params = {}
         for i, child in enumerate(self._children):
             child_params = {self._renames.get(*[child.name_key(k)] * 2): v for k, v in child.default_parameters.items()}
@@ -217,7 +236,7 @@ class ParameterizedObject(AParameterizedObject):
 
     @default_parameters.setter
     def default_parameters(self, parameters):
-        self._check_keys()
+        self._find_keys()
         self.update_default_parameters(parameters)
 
     def update_default_parameters(self, parameters: dict = None):
@@ -254,7 +273,7 @@ class ParameterizedObject(AParameterizedObject):
         Builds a nested dictionary of parameters that are passed to all dependent parameterized objects.
         :param parameters: a dictionary of parameters that overwrites default parameters.
         """
-        self._check_keys()
+        self._find_keys()
         keys = self._make_unique_names()
         if self._children.children:
             child_trees = {}
@@ -291,7 +310,7 @@ class ParameterizedObject(AParameterizedObject):
                 else Parameters(parameters=parameters)
 
             if self.name:
-                parameters.remove_names(self.name)  # unnames parameter keys if self has a name
+                parameters.key_function(self._route)  # unnames parameter keys if self has a name
 
             parameters.underwrite_defaults(self.local_default_parameters)  # adds in local defaults
 
@@ -303,6 +322,46 @@ class ParameterizedObject(AParameterizedObject):
 
             return parameters if parameters else {}
 
+    def _route(self, key: str) -> str:
+        try:
+            return self._routes[key]
+        except KeyError:
+            route = self._routes[key] = Parameters.remove_name(key, self.name)
+            return route
+
+    @property
+    def parameter_order(self) -> List[str]:
+        """
+        :return: the order of parameters in parameter vectors, which is the alphabetical order of all parameters with
+            a numerical default value.
+        """
+        cache = instance_cache(self, '_cache_parameter_order')  # refreshed whenever objects change
+        found, order = cache.get(None)
+        if not found:
+            defaults = self.default_parameters
+            order = [k for k in self.parameters if isinstance(defaults.get(k), Number)
+                     and not isinstance(defaults.get(k), bool)]
+            cache.put(None, order)
+        return list(order)
+
+    def vector_parameters(self, vector: Union[ndarray, list]) -> dict:
+        """
+        :param vector: a vector of parameter values ordered as parameter_order.
+        :return: the dictionary of parameters.
+        """
+        order = self.parameter_order
+        assert len(vector) == len(order), "The parameter vector must have one value for each parameter in " \
+                                          "parameter_order."
+        return dict(zip(order, asarray(vector).tolist()))
+
+    def parameter_vector(self, parameters: dict = None) -> ndarray:
+        """
+        :param parameters: optional parameters to modify the default parameters.
+        :return: the vector of parameter values ordered as parameter_order.
+        """
+        parameters = self.default_parameters | (parameters if parameters else {})
+        return asarray([parameters[k] for k in self.parameter_order])
+
     def get_parameters(self, parameters: Union[dict, Parameters, frozendict] = None) -> Union[dict, None]:
         parameters = self.set_parameters(parameters if parameters else {})
         return parameters if isinstance(parameters, dict) else parameters.dict
@@ -323,11 +382,13 @@ class ParameterizedObject(AParameterizedObject):
 
     def clear_parameter_functions(self):
         self._parameter_function = CompositeParameterFunction()
+        self._cache_clear()
 
     def rename_parameter(self, parameter_name: str, new_parameter_name: str):
         rename = self._rename_function(Parameters(default={parameter_name: new_parameter_name})).dict
         self._rename_function.prepend(ParameterFunction.rename(parameter_name, new_parameter_name))
         self._renames.update(rename)
+        self._cache_clear()
 
 
 #  Updates a dictionary of default parameters with input parameters, ignoring parameters not in the default dictionary.
@@ -1,7 +1,10 @@
 from .state import VState
 from .propagator import AVirtualPropagator, VPropHTD, VPropNHTD, VPropTI
 from .generator import Generator
-from .configuration import AVirtualDetectorGate, ParityDetectorGate, PhysicalDetectorGate, FourierDetectorGate
-from .tree import VNode, VTree
+from .executor import VExecutor
+from .configuration import AVirtualDetectorGate, ParityDetectorGate, PhysicalDetectorGate, FourierDetectorGate, \
+    NestedFourierDetectorGate
+from .tree import VNode, VTree, VArrayTree
 from .grove import VGrove
+from .inverse import OutcomeSelection, ConditionalStates
 from .branch import MeasurementBranch
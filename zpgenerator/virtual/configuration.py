@@ -116,3 +116,38 @@ class FourierDetectorGate(DetectorGate, AVirtualDetectorGate):
     @property
     def inverse_transform(self) -> str:
         return 'Fourier Transform'
+
+
+class NestedFourierDetectorGate(DetectorGate, AVirtualDetectorGate):
+    """
+    A detector with virtual configurations that are roots of unity on nested grids of increasing order. After each
+    refinement, only the roots that are absent from the coarser grids remain as virtual configurations, so that the
+    configurations already simulated can be reused.
+    """
+
+    def __init__(self,
+                 resolution: int = 3,
+                 efficiency: Union[callable, int, float] = 1.,
+                 gate: Union[TimeIntervalFunction, TimeInterval, list] = None,
+                 parameters: dict = None,
+                 name: str = None):
+        """
+        :param resolution: an integer describing the number of configurations of the coarsest grid.
+        :param efficiency: a constant physical efficiency multiplier for the detector.
+        :param gate: an optional function or interval describing the detector gate and efficiency.
+        """
+        super().__init__(resolution=resolution, efficiency=efficiency, gate=gate, parameters=parameters, name=name)
+        self.indices = list(range(0, resolution + 1))
+
+    def refine(self):
+        """Doubles the order of the grid, keeping only the new roots of unity as virtual configurations."""
+        self._resolution = 2 * self._resolution + 1
+        self.indices = list(range(1, self._resolution + 1, 2))
+
+    @property
+    def virtual_configurations(self) -> List[complex]:
+        return [1 - np.exp(-1.j * 2 * np.pi * n / (self.resolution + 1)) for n in self.indices]
+
+    @property
+    def inverse_transform(self) -> str:
+        return 'Nested Fourier Transform'
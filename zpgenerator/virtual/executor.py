@@ -0,0 +1,116 @@
+from .propagator import AVirtualPropagator
+from typing import List
+from contextlib import contextmanager
+import multiprocessing
+import numpy as np
+
+_propagators = []  # propagators inherited by forked worker processes
+
+
+def _evolve_chunk(args):
+    index, states, virtual_configurations, t0, t = args
+    return _propagators[index].evolve(states, virtual_configurations, t0, t)
+
+
+class VExecutor:
+    """
+    An object that spreads the propagation of a stack of virtual states across a pool of worker processes.
+
+    States are split into chunks of a fixed size that do not depend on the number of workers, so that results are
+    identical for any number of workers. Propagators often contain unpicklable time-dependent functions, so workers
+    are forked and inherit the propagators, and only numpy arrays are exchanged with them. Within a session, a single
+    pool inheriting the propagators of all intervals of a simulation is reused, otherwise a pool is forked for each
+    evolution. If forking is not available on the platform, the chunks are evolved in the current process.
+    """
+
+    def __init__(self, workers: int = None, chunk_size: int = 16):
+        """
+        :param workers: the number of worker processes (defaults to the number of available cores).
+        :param chunk_size: the number of states evolved together by each task.
+        """
+        assert chunk_size > 0, "Chunk size must be a positive integer."
+        self.workers = multiprocessing.cpu_count() if workers is None else workers
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._session = []  # the propagators inherited by the workers of the pool
+
+    def __getstate__(self):
+        # pools cannot be copied, and belong to the session of the process that opened them
+        return self.__dict__ | {'_pool': None, '_session': []}
+
+    @property
+    def can_fork(self) -> bool:
+        return 'fork' in multiprocessing.get_all_start_methods()
+
+    def chunks(self, index: int, states: np.ndarray, virtual_configurations: list, t0: float,
+               t: float) -> List[tuple]:
+        return [(index, states[i:i + self.chunk_size], virtual_configurations[i:i + self.chunk_size], t0, t)
+                for i in range(0, states.shape[0], self.chunk_size)]
+
+    @contextmanager
+    def session(self, propagators: List[AVirtualPropagator]):
+        """
+        Opens a single pool of workers inheriting the propagators of a simulation, reused by every evolution with one
+        of these propagators until the session is closed.
+
+        :param propagators: the propagators of all intervals of the simulation.
+        """
+        global _propagators
+        assert self._pool is None, "A session is already open."
+        propagators = [propagator for propagator in propagators if propagator.parallel]
+        if self.workers > 1 and self.can_fork and propagators:
+            _propagators = propagators
+            try:
+                self._pool = multiprocessing.get_context('fork').Pool(self.workers)
+            finally:
+                _propagators = []
+            self._session = propagators
+        try:
+            yield self
+        finally:
+            self.close()
+
+    def close(self):
+        """Closes the pool of the current session."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+        self._pool = None
+        self._session = []
+
+    def _session_index(self, propagator: AVirtualPropagator):
+        return next((i for i, p in enumerate(self._session) if p is propagator), None)
+
+    def evolve(self, propagator: AVirtualPropagator, states: np.ndarray, virtual_configurations: list,
+               t0: float, t: float) -> np.ndarray:
+        """
+        Propagates a stack of density matrices from time t0 to time t, each conditioned on its own configuration.
+
+        :param propagator: the propagator to apply.
+        :param states: an array of shape (n, d, d) containing n density matrices.
+        :param virtual_configurations: a list of n virtual configurations, one for each density matrix.
+        :param t0: the initial time.
+        :param t: the final time.
+        :return: an array of shape (n, d, d) containing the propagated density matrices.
+        """
+        if not propagator.parallel:
+            return propagator.evolve(states, virtual_configurations, t0, t)
+
+        global _propagators
+        index = self._session_index(propagator)
+        if index is not None:  # the workers of the session already inherited the propagator
+            results = self._pool.map(_evolve_chunk, self.chunks(index, states, virtual_configurations, t0, t))
+            return np.concatenate(results) if results else states
+
+        chunks = self.chunks(0, states, virtual_configurations, t0, t)
+        workers = min(self.workers, len(chunks))
+        _propagators = [propagator]
+        try:
+            if workers > 1 and self.can_fork:
+                with multiprocessing.get_context('fork').Pool(workers) as pool:
+                    results = pool.map(_evolve_chunk, chunks)
+            else:
+                results = [_evolve_chunk(chunk) for chunk in chunks]
+        finally:
+            _propagators = []
+        return np.concatenate(results) if results else states
@@ -1,22 +1,72 @@
 from ..system import AElement
 from ..network import Component, AComponent
-from .propagator import VPropNHTD, VPropHTD, VPropTI
+from ..time.parameters import Parameters
+from .propagator import AVirtualPropagator, VPropNHTD, VPropHTD, VPropTI
 from qutip import Options
+from frozendict import frozendict
 
 
 class Generator:
     """a propagator factory that chooses the right propagator for a given time step"""
 
     def __init__(self, component: AElement, binned_detectors: dict = None,
-                 lifetime_mode: int = None, precision: int = 6):
+                 lifetime_mode: int = None, precision: int = 6, cache_maps: bool = False):
+        """
+        :param component: the component to simulate.
+        :param binned_detectors: the detector time bins conditioning the virtual configurations.
+        :param lifetime_mode: the mode whose transition population is recorded (for lifetime computations).
+        :param precision: the precision of the ODE solver.
+        :param cache_maps: whether time-dependent propagators integrate and cache the superoperator of each interval
+            and virtual configuration, instead of integrating every stack of states.
+        """
         self.component = component if isinstance(component, AComponent) else Component(component)
         self.default_options = Options(nsteps=500000, atol=10 ** -precision, rtol=10 ** -(precision))
         self.lifetime_mode = lifetime_mode
         self.binned_detectors = self.component.output.binned_detectors if binned_detectors is None else binned_detectors
+        self.cache_maps = cache_maps
+        self.cache_size = 4  # number of parameter sets for which propagators are kept
+        self._propagators = {}
+
+    def _cache_key(self, parameters: dict = None, options: Options = None):
+        parameters = self.component.set_parameters(parameters)
+        key = (frozendict(parameters.dict if isinstance(parameters, Parameters) else parameters),
+               tuple(sorted(vars(options).items())) if options is not None else None)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _cached_propagator(self, t: float, parameters: dict = None, options: Options = None):
+        key = self._cache_key(parameters, options)
+        return None if key is None else self._propagators.get(key, {}).get(t)
+
+    def _cache_propagator(self, t: float, parameters: dict, options: Options, propagator: AVirtualPropagator):
+        key = self._cache_key(parameters, options)
+        if key is not None:
+            if key not in self._propagators and len(self._propagators) >= self.cache_size:
+                self._propagators.pop(next(iter(self._propagators)))
+            self._propagators.setdefault(key, {})[t] = propagator
 
     def build_propagator(self, t: float, parameters: dict = None, options: Options = None):
+        """
+        Builds the propagator for the interval beginning at time t. Propagators keep their assembled generators and
+        solvers, so they are cached and reused for repeated simulations with the same parameters and options.
+
+        :param t: the time at which the interval begins.
+        :param parameters: optional parameters to modify the default parameters.
+        :param options: options for the ODE solver.
+        :return: a propagator for the interval.
+        """
         options = self.default_options if options is None else options
 
+        propagator = self._cached_propagator(t, parameters, options)
+        if propagator is None:
+            propagator = self._build_propagator(t, parameters, options)
+            self._cache_propagator(t, parameters, options, propagator)
+        return propagator
+
+    def _build_propagator(self, t: float, parameters: dict = None, options: Options = None):
         quadruple = self.component.evaluate_quadruple(t, parameters)
         hamiltonian = quadruple.hamiltonian
         environment = quadruple.environment
@@ -39,17 +89,15 @@ class Generator:
                 return VPropNHTD(generator=generator,
                                  jumps=jumps,
                                  expect_operators=expect_operator,
-                                 options=options)
+                                 options=options,
+                                 cache_maps=self.cache_maps)
             else:
-                return VPropHTD(hamiltonian=hamiltonian.list_form(),
-                                collapse_operators=[env.list_form() for env in environment],
+                return VPropHTD(hamiltonian=hamiltonian.list_form(compiled=True),
+                                collapse_operators=[env.list_form(compiled=True) for env in environment],
                                 jumps=[jump.constant for jump in jumps],
                                 expect_operators=expect_operator,
-                                options=options)
+                                options=options,
+                                cache_maps=self.cache_maps)
         else:
-            #  Add TI method eventually
-            return VPropHTD(hamiltonian=hamiltonian.list_form(),
-                            collapse_operators=[env.list_form() for env in environment],
-                            jumps=[jump.constant for jump in jumps],
-                            expect_operators=expect_operator,
-                            options=options)
+            generator = hamiltonian.liou() + sum(env.lind() if not env.is_super else env for env in environment)
+            return VPropTI(generator=generator.evaluate(t), jumps=[jump.evaluate(t) for jump in jumps])
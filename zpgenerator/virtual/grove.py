@@ -1,18 +1,40 @@
 from ..time.evaluate import EvaluatedDiracOperator
-from .inverse import GeneratingTensor
+from .inverse import GeneratingTensor, OutcomeSelection
 from .branch import MeasurementBranch
-from .tree import VTree
+from .tree import VTree, VArrayTree
 from .state import VState
 from .propagator import AVirtualPropagator
+from .executor import VExecutor
 from typing import List, Union
 from qutip import Qobj
+import numpy as np
 
 
 class VGrove:
 
-    def __init__(self, initial_time: float, states: List[Qobj]):
-        self.trees = [VTree(initial_state=VState(state=state, time=initial_time)) for state in states]
+    def __init__(self, initial_time: float, states: List[Qobj], batch: bool = True, executor: VExecutor = None,
+                 array: bool = False, selection: OutcomeSelection = None):
+        """
+        :param initial_time: the time of the initial states.
+        :param states: a list of initial states, one for each tree.
+        :param batch: whether to evolve the leaves of all trees together in a single integration.
+        :param executor: an optional VExecutor to spread the leaves of all trees across worker processes.
+        :param array: whether to store the leaves of each tree in a single array (VArrayTree) instead of nodes (VTree).
+        :param selection: an optional selection of detection patterns, so that only the configurations they need are
+            propagated (requires array trees).
+        """
+        assert selection is None or array, "Selecting detection patterns requires array trees."
+        self.selection = selection
+        if array:
+            configurations = None if selection is None else selection.configurations
+            self.trees = [VArrayTree(initial_state=VState(state=state, time=initial_time), selection=configurations)
+                          for state in states]
+        else:
+            self.trees = [VTree(initial_state=VState(state=state, time=initial_time)) for state in states]
+        self.array = array
         self.time = initial_time
+        self.batch = batch
+        self.executor = executor
 
     def __iter__(self):
         return iter(self.trees)
@@ -27,6 +49,16 @@ class VGrove:
                         branch_order.append(i)
         return branch_order
 
+    @staticmethod
+    def branch_order(time: float, branches: List[MeasurementBranch]) -> list:
+        """
+        :param time: the initial time of the simulation.
+        :param branches: the measurement branches.
+        :return: the order in which the branches are added to the trees, as returned by initialize and add_branches.
+        """
+        return sorted(range(0, len(branches)), key=lambda i: (branches[i].start_time >= time,
+                                                              max(branches[i].start_time, time)))
+
     def initialize(self, time: float, branches: List[MeasurementBranch]):
         return self._add_branches(time, branches, initial_branches=True)
 
@@ -41,9 +73,33 @@ class VGrove:
         for tree in self:
             tree.apply_generator(op)
 
+    def get_states(self):
+        return [state for tree in self for state in tree.get_states()]
+
     def propagate(self, propagator: AVirtualPropagator, time: float):
+        if self.array:
+            self._propagate_arrays(propagator, time)
+        elif self.batch or self.executor is not None:
+            propagator.propagate_batch(self.get_states(), time, executor=self.executor)
+        else:
+            for tree in self:
+                tree.propagate(propagator, time, batch=False)
+
+    def _propagate_arrays(self, propagator: AVirtualPropagator, time: float):
+        t0 = self.trees[0].time
+        if time != t0:
+            states = [tree.leaf_states() for tree in self]
+            configurations = [configuration for tree in self for configuration in tree.virtual_configurations()]
+            stack = np.concatenate(states)
+            stack = propagator.evolve(stack, configurations, t0, time) if self.executor is None else \
+                self.executor.evolve(propagator, stack, configurations, t0, time)
+            for tree, tree_states in zip(self, np.split(stack, np.cumsum([len(s) for s in states])[:-1])):
+                tree.set_leaf_states(tree_states)
         for tree in self:
-            tree.propagate(propagator, time)
+            tree.time = time
 
     def build_tensors(self, point_rank: int, precision: int):
         return [GeneratingTensor(point_rank, tree, precision) for tree in self]
+
+    def extract_selection(self, point_rank: int, dims: list = None, select: list = None):
+        return [self.selection.extract_results(point_rank, tree, dims=dims, select=select) for tree in self]
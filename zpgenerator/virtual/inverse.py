@@ -1,9 +1,17 @@
-from .tree import VTree
+from .tree import VTree, VArrayTree
+from .branch import MeasurementBranch
 from .configuration import ParityDetectorGate, FourierDetectorGate
 from qutip import Qobj, ptrace
-from numpy import array, einsum, complex64, ndarray, reshape, apply_along_axis, nditer, prod
-from numpy.fft import ifftn
-from string import ascii_lowercase
+from numpy import ndarray, einsum, prod, exp, pi
+from scipy.fft import ifftn
+from collections.abc import Mapping
+from itertools import product
+from typing import List
+
+
+def axis_type(branch: MeasurementBranch) -> str:
+    return 'parity' if isinstance(branch.virtual_detector, ParityDetectorGate) else \
+        'fourier' if isinstance(branch.virtual_detector, FourierDetectorGate) else 'threshold'
 
 
 class GeneratingTensor:
@@ -14,40 +22,30 @@ class GeneratingTensor:
         self.precision = precision
         self.subdims = virtual_tree.subdims
 
-        self.axes = ['parity' if isinstance(branch.virtual_detector, ParityDetectorGate) else
-                     'fourier' if isinstance(branch.virtual_detector, FourierDetectorGate) else
-                     'threshold' for branch in virtual_tree.branches]
+        self.axes = [axis_type(branch) for branch in virtual_tree.branches]
 
         if self.point_rank == 0:
             self.tensor = virtual_tree.build_probability_tensor()
         else:
-            self.tensor = virtual_tree.build_state_tensor()
+            self.tensor = virtual_tree.build_state_tensor()  # an array of shape (n_1, ..., n_K, d, d)
 
     def parity_inverse(self):
         self.tensor = self.tensor
 
     def fourier_inverse(self):
-        self.tensor = ifftn(array(self.tensor), axes=tuple(i for i in range(0, self.size) if self.axes[i] == 'fourier'))
-
-    @staticmethod
-    def _axis_threshold_inverse(tensor: ndarray, ax: int):
-        mat = array([[1., 0.], [-1., 1.]], dtype=complex64)  # define the threshold transformation
-        indices = list(ascii_lowercase)[0:1 + tensor.ndim]
-        sum_index = indices.pop(ax + 1)
-        ein_str = ','.join([sum_index + indices[ax], ''.join(indices)])
-        return einsum(ein_str, mat, tensor)
+        # a single transform over all Fourier axes
+        self.tensor = ifftn(self.tensor, axes=tuple(i for i in range(0, self.size) if self.axes[i] == 'fourier'),
+                            overwrite_x=True)
 
     def threshold_inverse(self):
-        tensor = self.tensor
-        shape = tensor.shape
+        # in-place Mobius transform: on each axis, the click outcome is the difference between the two configurations
         contains_unnormalised_detector = False
         for i, axis in enumerate(self.axes):
             if axis == 'threshold':
-                if shape[i] == 2:
-                    tensor = self._axis_threshold_inverse(tensor, i)
+                if self.tensor.shape[i] == 2:
+                    self.tensor[(slice(None),) * i + (1,)] -= self.tensor[(slice(None),) * i + (0,)]
                 else:
                     contains_unnormalised_detector = True
-        self.tensor = tensor
         return contains_unnormalised_detector
 
     def invert(self):
@@ -58,48 +56,29 @@ class GeneratingTensor:
         if 'fourier' in self.axes:
             self.fourier_inverse()
         if 'threshold' in self.axes:
-            contains_unnormalised_detector = contains_unnormalised_detector or self.threshold_inverse()
-        self.reshape_states()
+            contains_unnormalised_detector = self.threshold_inverse() or contains_unnormalised_detector
         return contains_unnormalised_detector
 
-    def reshape_states(self):
-        if self.point_rank != 0:
-            dim = prod(self.subdims)
-            self.tensor = apply_along_axis(lambda subarray: _DummyState(state=Qobj(inpt=reshape(subarray, (dim, dim)),
-                                                                                   dims=[self.subdims, self.subdims])),
-                                           axis=-1,
-                                           arr=reshape(self.tensor, self.tensor.shape[0:-2] + tuple([-1])))
-
-    def _rearrange_key(self, key: tuple, perm: list = None):
-        return tuple(key[i] for i in perm) if perm else key
-
-    def _rearrange_keys(self, results: dict, perm: list = None):
-        return {self._rearrange_key(k, perm): v for k, v in results.items()} if perm else results
+    @property
+    def labels(self) -> List[list]:
+        return [['p'] if axis == 'parity' else list(range(0, n)) for axis, n in zip(self.axes, self.tensor.shape)]
 
     def extract_results(self, dims: list = None, select: list = None, perm: list = None):
-        results = self._get_results()
-
-        if self.point_rank != 0:
-            results = {self._rearrange_key(k, perm): v.state for k, v in results.items()}
-            if self.point_rank == 1:
-                results = self.ptrace(results, dims=dims, select=select)
-        else:
-            results = self._rearrange_keys(results, perm)
-
-        return results
-
-    def _get_results(self):
-        results = {}
-        itr = nditer(self.tensor, flags=['multi_index', 'refs_ok'])
-        for pr in itr:
-            results.update({itr.multi_index: pr[()]})
-        if 'parity' in self.axes:
-            results = {self._relabel_parity(k): v for k, v in results.items()}
-        return results
-
-    def _relabel_parity(self, key: tuple):
-        return tuple(k if self.axes[i] != 'parity' else 'p' for i, k in enumerate(key))
+        """
+        :param dims: a list of integers specifying the desired subspace dimensions of states.
+        :param select: a list of integers specifying which subspace dimensions to keep.
+        :param perm: an optional permutation of the detection bins.
+        :return: a dictionary of probabilities for each outcome, or the ConditionalStates of each outcome.
+        """
+        if self.point_rank == 0:
+            labels = self.labels if not perm else [self.labels[i] for i in perm]
+            tensor = self.tensor if not perm else self.tensor.transpose(perm)
+            return dict(zip(product(*labels), tensor.ravel()))
 
+        states = ConditionalStates(self.tensor, self.labels, self.subdims,
+                                   dims=dims if self.point_rank == 1 else None,
+                                   select=select if self.point_rank == 1 else None)
+        return states.permute(perm) if perm else states
 
     @staticmethod
     def ptrace(results: dict, dims: list = None, select: list = None):
@@ -113,7 +92,119 @@ class GeneratingTensor:
         return results
 
 
-class _DummyState:
-    def __init__(self, state: Qobj):
-        self.state = state
+class OutcomeSelection:
+    """
+    The virtual configurations needed to compute a selection of detection patterns, and the weighted sums of their
+    generating values giving each pattern, so that the full generating tensor is neither propagated nor inverted. On a
+    threshold axis, an outcome is a signed sum over at most two configurations, while a Fourier axis needs all of its
+    configurations.
+    """
+
+    def __init__(self, branches: List[MeasurementBranch], patterns: List[tuple]):
+        """
+        :param branches: the measurement branches, ordered as the detection patterns.
+        :param patterns: the detection patterns to compute.
+        """
+        self.axes = [axis_type(branch) for branch in branches]
+        self.sizes = [len(branch.virtual_configurations()) for branch in branches]
+        self.patterns = [self._relabel_parity(tuple(pattern)) for pattern in patterns]
+        assert all(len(pattern) == len(branches) for pattern in self.patterns), \
+            "Each pattern must have one outcome for each measurement bin."
+
+        self.terms = {pattern: [(tuple(k for k, _ in term), prod([c for _, c in term]))
+                                for term in product(*[self._axis_terms(axis, size, outcome) for axis, size, outcome
+                                                      in zip(self.axes, self.sizes, pattern)])]
+                      for pattern in self.patterns}
+        self.configurations = sorted(set(k for terms in self.terms.values() for k, _ in terms))
+
+    @property
+    def contains_unnormalised_detector(self) -> bool:
+        return any(axis == 'parity' or axis == 'threshold' and size != 2 for axis, size in zip(self.axes, self.sizes))
+
+    def _relabel_parity(self, pattern: tuple):
+        return tuple('p' if axis == 'parity' else k for axis, k in zip(self.axes, pattern))
 
+    @staticmethod
+    def _axis_terms(axis: str, size: int, outcome) -> list:
+        # the configuration indices and coefficients giving an outcome, matching the inverses of GeneratingTensor
+        if axis == 'parity':
+            return [(0, 1)]
+        assert isinstance(outcome, int) and 0 <= outcome < size, "Outcome exceeds the resolution of the detector."
+        if axis == 'fourier':
+            return [(k, exp(2.j * pi * outcome * k / size) / size) for k in range(0, size)]
+        if size == 2:
+            return [(0, 1)] if outcome == 0 else [(0, -1), (1, 1)]
+        return [(outcome, 1)]
+
+    def extract_results(self, point_rank: int, virtual_tree: VArrayTree, dims: list = None, select: list = None):
+        """
+        :param point_rank: simulation rank (0 = probabilities, otherwise states).
+        :param virtual_tree: a tree propagated with the configurations of the selection.
+        :param dims: a list of integers specifying the desired subspace dimensions of states.
+        :param select: a list of integers specifying which subspace dimensions to keep.
+        :return: a dictionary of the probability or state of each pattern.
+        """
+        leaves = virtual_tree.selected_leaves()
+        if point_rank == 0:
+            values = {k: state.trace() for k, state in leaves.items()}
+            return {pattern: sum(c * values[k] for k, c in terms) for pattern, terms in self.terms.items()}
+
+        subdims = virtual_tree.subdims
+        results = {pattern: Qobj(inpt=sum(c * leaves[k] for k, c in terms), dims=[subdims, subdims])
+                   for pattern, terms in self.terms.items()}
+        return GeneratingTensor.ptrace(results, dims=dims, select=select) if point_rank == 1 else results
+
+
+class ConditionalStates(Mapping):
+    """
+    The conditional states of each detection outcome, stored as a single array of density matrices of shape
+    (n_1, ..., n_K, d, d). The Qobj of an outcome is only built when it is accessed.
+    """
+
+    def __init__(self, array: ndarray, labels: List[list], subdims: list, dims: list = None, select: list = None):
+        """
+        :param array: the array of conditional density matrices, with one axis for each detection bin.
+        :param labels: the outcome labels of each detection bin.
+        :param subdims: the subsystem dimensions of the states.
+        :param dims: a list of integers specifying the desired subspace dimensions of the states.
+        :param select: a list of integers specifying which subspace dimensions to keep.
+        """
+        self.array = array
+        self.labels = labels
+        self.subdims = subdims
+        self.dims = dims
+        self.select = select
+        self._index = [{label: i for i, label in enumerate(axis)} for axis in labels]
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        assert len(key) == len(self.labels), "Outcome must have one value for each detection bin."
+        try:
+            position = tuple(index[k] for index, k in zip(self._index, key))
+        except KeyError:
+            raise KeyError(key)
+        state = Qobj(inpt=self.array[position], dims=[self.subdims, self.subdims])
+        if self.dims:
+            state.dims = [self.dims, self.dims]
+        return ptrace(state, self.select) if self.select else state
+
+    def __iter__(self):
+        return iter(product(*self.labels))
+
+    def __len__(self):
+        return int(prod([len(axis) for axis in self.labels]))
+
+    def traces(self) -> dict:
+        """
+        :return: the trace of the conditional state of each outcome, computed without building any Qobj.
+        """
+        return dict(zip(product(*self.labels), einsum('...ii->...', self.array).ravel()))
+
+    def permute(self, perm: list):
+        """
+        :param perm: the new order of the detection bins, such that the i-th bin is the perm[i]-th original bin.
+        :return: the ConditionalStates with permuted detection bins, sharing the same data.
+        """
+        n = len(self.labels)
+        return ConditionalStates(self.array.transpose(list(perm) + [n, n + 1]), [self.labels[i] for i in perm],
+                                 self.subdims, dims=self.dims, select=self.select)
@@ -1,8 +1,13 @@
 from .state import VState
 from ..time import EvaluatedOperator
 from abc import ABC, abstractmethod
-from qutip import Qobj, Options, mesolve, spre, liouvillian
-from typing import Union
+from qutip import Qobj, QobjEvo, Options, mesolve, spre, liouvillian, lindblad_dissipator
+from scipy.integrate import ode
+from scipy.linalg import expm
+from scipy.sparse import csr_matrix, kron, identity
+from scipy.sparse.linalg import expm_multiply
+from typing import Union, List
+import numpy as np
 
 
 class AVirtualPropagator(ABC):
@@ -10,6 +15,9 @@ class AVirtualPropagator(ABC):
     An object that propagates a virtual state to time t conditioned on a virtual configuration.
     """
 
+    parallel = True  # whether stacks of states are worth spreading across worker processes
+    cache_maps = False  # whether states are evolved by applying cached superoperators
+
     # Computes the jump operator given the virtual configuration
     @abstractmethod
     def jump(self, virtual_configuration):
@@ -20,6 +28,199 @@ class AVirtualPropagator(ABC):
     def propagate(self, virtual_state: VState, t: float, tlist: list = None):
         pass
 
+    def evolve(self, states: np.ndarray, virtual_configurations: list, t0: float, t: float) -> np.ndarray:
+        """
+        Propagates a stack of density matrices from time t0 to time t, each conditioned on its own configuration.
+
+        :param states: an array of shape (n, d, d) containing n density matrices.
+        :param virtual_configurations: a list of n virtual configurations, one for each density matrix.
+        :param t0: the initial time.
+        :param t: the final time.
+        :return: an array of shape (n, d, d) containing the propagated density matrices.
+        """
+        evolved = np.empty(states.shape, dtype=complex)
+        for k, (state, virtual_configuration) in enumerate(zip(states, virtual_configurations)):
+            virtual_state = VState(state=Qobj(state), time=t0, virtual_configuration=virtual_configuration)
+            self.propagate(virtual_state, t)
+            evolved[k] = virtual_state.full()
+        return evolved
+
+    def superoperator(self, weights: tuple, t0: float, t: float, dim: int) -> np.ndarray:
+        """
+        :param weights: the weights -vconfig[i] multiplying each jump superoperator.
+        :param t0: the initial time.
+        :param t: the final time.
+        :param dim: the dimension of the density matrices.
+        :return: the dense superoperator mapping vectorised density matrices from time t0 to time t.
+        """
+        return NotImplemented
+
+    def evolve_chain(self, states: np.ndarray, links: List[List[tuple]], t0: float, t: float) -> np.ndarray:
+        """
+        Propagates a chain of density matrices where each state evolves under the generator and is driven by the jumps
+        applied to its linked states: d rho_k/dt = L rho_k - sum_i J_i rho_j for each link (j, k) of jump i. Starting
+        from (rho, 0, ..., 0), the chain gives the Taylor coefficients of the state in the virtual configuration.
+
+        :param states: an array of shape (m, d, d) containing the m density matrices of the chain.
+        :param links: a list of (source, target) index pairs for each jump superoperator.
+        :param t0: the initial time.
+        :param t: the final time.
+        :return: an array of shape (m, d, d) containing the propagated chain.
+        """
+        return NotImplemented
+
+    def evolve_maps(self, states: np.ndarray, virtual_configurations: list, t0: float, t: float) -> np.ndarray:
+        """
+        Propagates a stack of density matrices by applying the superoperator of each distinct virtual configuration,
+        so that all states sharing a configuration are propagated by a single matrix product.
+
+        :param states: an array of shape (n, d, d) containing n density matrices.
+        :param virtual_configurations: a list of n virtual configurations, one for each density matrix.
+        :param t0: the initial time.
+        :param t: the final time.
+        :return: an array of shape (n, d, d) containing the propagated density matrices.
+        """
+        number, dim = states.shape[0], states.shape[-1]
+        groups = {}
+        for k, row in enumerate(jump_weights(virtual_configurations, len(self.jumps))):
+            groups.setdefault(tuple(row), []).append(k)
+
+        vectors = to_vectors(states)
+        evolved = np.empty(vectors.shape, dtype=complex)
+        for key, indices in groups.items():
+            evolved[:, indices] = self.superoperator(key, t0, t, dim) @ vectors[:, indices]
+        return from_vectors(evolved, dim)
+
+    def propagate_batch(self, virtual_states: List[VState], t: float, executor=None):
+        """
+        Propagates a list of VState objects that share the same time forward until time t using a single evolution.
+
+        :param virtual_states: a list of VState objects.
+        :param t: the final time.
+        :param executor: an optional VExecutor to spread the evolution across worker processes.
+        """
+        if virtual_states:
+            t0 = virtual_states[0].time
+            assert all(virtual_state.time == t0 for virtual_state in virtual_states), \
+                "Virtual states propagated together must share the same time."
+            dims = [virtual_states[0].dims[0]] * 2
+            states = np.stack([density_matrix(virtual_state).full() for virtual_state in virtual_states])
+            if t != t0:
+                virtual_configurations = [vs.virtual_configuration for vs in virtual_states]
+                states = self.evolve(states, virtual_configurations, t0, t) if executor is None else \
+                    executor.evolve(self, states, virtual_configurations, t0, t)
+            for virtual_state, state in zip(virtual_states, states):
+                virtual_state.__init__(state=Qobj(inpt=state, dims=dims), time=t,
+                                       virtual_configuration=virtual_state.virtual_configuration, copy=False)
+
+
+class StackIntegrator:
+    """
+    Integrates stacks of vectorised density matrices in a single ODE, where each state evolves under a shared generator
+    plus the jump superoperators weighted by its own virtual configuration. The compiled operators and the ODE solver
+    are kept, so that they are reused for every stack propagated over the same interval.
+    """
+
+    def __init__(self, generator: QobjEvo, jumps: List[QobjEvo] = None, options: Options = None):
+        """
+        :param generator: a (possibly time-dependent) Liouvillian shared by all states.
+        :param jumps: a list of (possibly time-dependent) jump superoperators.
+        :param options: an Options object for the integrator, following qutip.mesolve.
+        """
+        self.generator = generator
+        self.jumps = [] if jumps is None else jumps
+        self.options = Options() if options is None else options
+        self.active = [i for i, jump in enumerate(self.jumps) if jump.cte.data.nnz or not jump.const]
+
+        self.generator.compile()
+        for i in self.active:
+            self.jumps[i].compile()
+
+        self._solver = ode(self._rhs)
+        self._scale = None
+        self._shape = None
+        self._weights = None
+        self._links = None  # (source, target) index arrays of each jump when integrating a chain
+
+    def _rhs(self, time, y):
+        rho = y.reshape(self._shape).T  # columns are vectorised density matrices
+        drho = self.generator.mul_mat(time, rho)
+        if self._links is None:
+            for i in self.active:
+                drho += self.jumps[i].mul_mat(time, rho) * self._weights[:, i]
+        else:
+            for i in self.active:
+                sources, targets = self._links[i]
+                if len(sources):
+                    drho[:, targets] -= self.jumps[i].mul_mat(time, rho[:, sources])
+        return drho.T.ravel()
+
+    def _set_integrator(self, scale: int):
+        # The integrator controls the root-mean-square error over all stacked states, so tolerances are tightened by
+        # sqrt(scale) to keep the accuracy of each state
+        if scale != self._scale:
+            options = self.options
+            tightening = np.sqrt(scale)
+            self._solver.set_integrator('zvode', method=options.method, order=options.order,
+                                        atol=options.atol / tightening, rtol=options.rtol / tightening,
+                                        nsteps=options.nsteps, first_step=options.first_step,
+                                        min_step=options.min_step, max_step=options.max_step)
+            self._scale = scale
+
+    def evolve(self, states: np.ndarray, virtual_configurations: list, t0: float, t: float) -> np.ndarray:
+        """
+        :param states: an array of shape (n, d, d) containing n density matrices.
+        :param virtual_configurations: a list of n virtual configurations.
+        :param t0: the initial time.
+        :param t: the final time.
+        :return: an array of shape (n, d, d) containing the propagated density matrices.
+        """
+        return self._integrate(states, jump_weights(virtual_configurations, len(self.jumps)), t0, t)
+
+    def evolve_chain(self, states: np.ndarray, links: List[List[tuple]], t0: float, t: float) -> np.ndarray:
+        """
+        :param states: an array of shape (m, d, d) containing the m density matrices of the chain.
+        :param links: a list of (source, target) index pairs for each jump superoperator.
+        :param t0: the initial time.
+        :param t: the final time.
+        :return: an array of shape (m, d, d) containing the propagated chain.
+        """
+        self._links = [tuple(np.array(indices, dtype=int).reshape((-1, 2)).T) for indices in links] + \
+                      [(np.array([], dtype=int),) * 2] * (len(self.jumps) - len(links))
+        try:
+            return self._integrate(states, None, t0, t)
+        finally:
+            self._links = None
+
+    def superoperator(self, weights: tuple, t0: float, t: float, dim: int) -> np.ndarray:
+        """
+        Integrates the superoperator of the interval by evolving every element of the operator basis.
+
+        :param weights: the weights -vconfig[i] multiplying each jump superoperator.
+        :param t0: the initial time.
+        :param t: the final time.
+        :param dim: the dimension of the density matrices.
+        :return: the dense superoperator mapping vectorised density matrices from time t0 to time t.
+        """
+        basis = from_vectors(np.eye(dim ** 2, dtype=complex), dim)
+        return to_vectors(self._integrate(basis, np.tile(np.array(weights, dtype=complex), (dim ** 2, 1)), t0, t))
+
+    def _integrate(self, states: np.ndarray, weights: np.ndarray, t0: float, t: float) -> np.ndarray:
+        number, dim = states.shape[0], states.shape[-1]
+        if number == 0 or t == t0:
+            return states
+
+        self._shape = (number, dim ** 2)
+        self._weights = weights
+        self._set_integrator(number)
+
+        # column stacking of each density matrix, following qutip operator_to_vector
+        self._solver.set_initial_value(np.ascontiguousarray(states.transpose(0, 2, 1)).ravel(), t0)
+        self._solver.integrate(t)
+        assert self._solver.successful(), "ODE integration error: Try to increase the allowed number of substeps by " \
+                                          "increasing the nsteps parameter in the Options class."
+        return self._solver.y.reshape((number, dim, dim)).transpose(0, 2, 1)
+
 
 class VPropHTD(AVirtualPropagator):
     """
@@ -31,7 +232,8 @@ class VPropHTD(AVirtualPropagator):
                  collapse_operators: list[Qobj] = None,
                  jumps: list[Qobj] = None,
                  expect_operators: Union[Qobj, callable] = None,
-                 options: Options = None
+                 options: Options = None,
+                 cache_maps: bool = False
                  ):
         """
 
@@ -40,6 +242,7 @@ class VPropHTD(AVirtualPropagator):
         :param jumps: a list of Qobj superoperators describing the jump statistics (without scaling by vconfig)
         :param expect_operators: a list of Qobj to evaluate expecation values for
         :param options: an Options object for mesolve.
+        :param cache_maps: whether to integrate and cache the superoperator of each virtual configuration.
         """
         self.hamiltonian = hamiltonian
 
@@ -51,17 +254,21 @@ class VPropHTD(AVirtualPropagator):
         self.jumps = [] if jumps is None else jumps
         self.expect_operators = expect_operators
         self.options = options
+        self.cache_maps = cache_maps
+        self.parallel = not cache_maps  # cached superoperators would not be shared with worker processes
+        self._liouvillian = None
+        self._integrator = None
+        self._maps = {}
 
     def jump(self, vconfig):
         default = 0 * spre(self.hamiltonian[0])
         return sum([-vconfig[i] * list_get(self.jumps, i, default) for i in range(0, len(vconfig))], default)
 
     def propagate(self, virtual_state: VState, t: float, tlist: list = None):
+        if tlist is None and self.expect_operators is None:
+            return self.propagate_batch([virtual_state], t)
         jump = self.jump(virtual_state.virtual_configuration)
-        if jump != 0 * jump:
-            c_ops = self.collapse_operators + [jump]
-        else:
-            c_ops = self.collapse_operators
+        c_ops = self.collapse_operators + [jump] if jump != 0 * jump else self.collapse_operators
         result = mesolve(H=self.hamiltonian,
                          rho0=virtual_state,
                          tlist=[virtual_state.time, t] if tlist is None else tlist,
@@ -72,6 +279,34 @@ class VPropHTD(AVirtualPropagator):
                                virtual_configuration=virtual_state.virtual_configuration)
         return result
 
+    def liouvillian(self) -> QobjEvo:
+        if self._liouvillian is None:
+            generator = liouvillian(QobjEvo(self.hamiltonian))
+            for op in self.collapse_operators:
+                op = QobjEvo(op)
+                generator += op if op.cte.issuper else lindblad_dissipator(op)
+            self._liouvillian = generator
+        return self._liouvillian
+
+    def integrator(self) -> StackIntegrator:
+        if self._integrator is None:
+            self._integrator = StackIntegrator(self.liouvillian(), [QobjEvo(jump) for jump in self.jumps], self.options)
+        return self._integrator
+
+    def superoperator(self, weights: tuple, t0: float, t: float, dim: int) -> np.ndarray:
+        key = (t0, t, weights)
+        if key not in self._maps:
+            self._maps[key] = self.integrator().superoperator(weights, t0, t, dim)
+        return self._maps[key]
+
+    def evolve_chain(self, states: np.ndarray, links: List[List[tuple]], t0: float, t: float) -> np.ndarray:
+        return self.integrator().evolve_chain(states, links, t0, t)
+
+    def evolve(self, states: np.ndarray, virtual_configurations: list, t0: float, t: float) -> np.ndarray:
+        if self.cache_maps and t != t0:
+            return self.evolve_maps(states, virtual_configurations, t0, t)
+        return self.integrator().evolve(states, virtual_configurations, t0, t)
+
 
 class VPropNHTD(AVirtualPropagator):
     """
@@ -82,7 +317,8 @@ class VPropNHTD(AVirtualPropagator):
                  generator: EvaluatedOperator,
                  jumps: list[EvaluatedOperator] = None,
                  expect_operators: Union[Qobj, callable] = None,
-                 options: Options = None
+                 options: Options = None,
+                 cache_maps: bool = False
                  ):
         """
 
@@ -90,20 +326,27 @@ class VPropNHTD(AVirtualPropagator):
         :param jumps: a list of EvaluatedOperator objects describing possibly time-dependent jumps.
         :param expect_operators: a list of Qobj to evaluate expecation values for
         :param options: an Options object for mesolve.
+        :param cache_maps: whether to integrate and cache the superoperator of each virtual configuration.
         """
         self.generator = generator
         self.jumps = [] if jumps is None else jumps
         self.expect_operators = expect_operators
         self.options = options
+        self.cache_maps = cache_maps
+        self.parallel = not cache_maps  # cached superoperators would not be shared with worker processes
+        self._integrator = None
+        self._maps = {}
 
     def jump(self, vconfig) -> EvaluatedOperator:
         default = 0 * self.generator.constant
         return sum((-vconfig[i] * list_get(self.jumps, i, default) for i in range(0, len(vconfig))), default)
 
     def propagate(self, virtual_state: VState, t: float, tlist: list = None):
+        if tlist is None and self.expect_operators is None:
+            return self.propagate_batch([virtual_state], t)
         gen = self.generator + \
               self.jump(virtual_state.virtual_configuration) if virtual_state.virtual_configuration else self.generator
-        result = mesolve(H=gen.list_form(),
+        result = mesolve(H=gen.list_form(compiled=True),
                          rho0=virtual_state,
                          tlist=[virtual_state.time, t] if tlist is None else tlist,
                          e_ops=self.expect_operators,
@@ -113,28 +356,139 @@ class VPropNHTD(AVirtualPropagator):
                                virtual_configuration=virtual_state.virtual_configuration)
         return result
 
+    def integrator(self) -> StackIntegrator:
+        if self._integrator is None:
+            self._integrator = StackIntegrator(QobjEvo(self.generator.list_form(compiled=True)),
+                                               [QobjEvo(jump.list_form(compiled=True)) for jump in self.jumps],
+                                               self.options)
+        return self._integrator
+
+    def superoperator(self, weights: tuple, t0: float, t: float, dim: int) -> np.ndarray:
+        key = (t0, t, weights)
+        if key not in self._maps:
+            self._maps[key] = self.integrator().superoperator(weights, t0, t, dim)
+        return self._maps[key]
+
+    def evolve_chain(self, states: np.ndarray, links: List[List[tuple]], t0: float, t: float) -> np.ndarray:
+        return self.integrator().evolve_chain(states, links, t0, t)
+
+    def evolve(self, states: np.ndarray, virtual_configurations: list, t0: float, t: float) -> np.ndarray:
+        if self.cache_maps and t != t0:
+            return self.evolve_maps(states, virtual_configurations, t0, t)
+        return self.integrator().evolve(states, virtual_configurations, t0, t)
+
 
 class VPropTI(AVirtualPropagator):
     """
-    A propagator that uses matrix exponentiation to propagate a state using a time-independent generator
+    A propagator that uses matrix exponentiation to propagate a state using a time-independent generator.
+    Exponentials are cached for each time step and virtual configuration, so that all states sharing a
+    configuration are propagated together.
     """
 
+    dense_limit = 400  # largest superoperator dimension for which the exponential is computed as a dense matrix
+    parallel = False  # cached exponentials are cheap to apply and would not be shared with worker processes
+
     def __init__(self,
                  generator: Qobj,
                  jumps: list[Qobj] = None,
                  ):
+        """
+        :param generator: a Qobj Hamiltonian or Liouvillian superoperator describing the time-independent generator.
+        :param jumps: a list of Qobj superoperators describing the jump statistics (without scaling by vconfig)
+        """
         assert generator.isoper or generator.issuper, "gen must be an operator or superoperator"
         self.generator = liouvillian(generator) if generator.isoper else generator
         self.jumps = [] if jumps is None else jumps
+        self._exponentials = {}
 
     def jump(self, vconfig):
         default = 0 * self.generator
         return sum([-vconfig[i] * list_get(self.jumps, i, default) for i in range(0, len(vconfig))], default)
 
     def propagate(self, virtual_state: VState, t: float, tlist: list = None):
-        virtual_state.apply_generator(op=(self.generator + self.jump(virtual_state.virtual_configuration)),
-                                      time=t - virtual_state.time)
-        virtual_state.time = t
+        self.propagate_batch([virtual_state], t)
+
+    def matrix(self, weights: tuple) -> csr_matrix:
+        """
+        :param weights: the weights -vconfig[i] multiplying each jump superoperator.
+        :return: the sparse matrix of the generator conditioned on the virtual configuration.
+        """
+        matrix = self.generator.data
+        for weight, jump in zip(weights, self.jumps):
+            if weight and jump.data.nnz:  # jumps from closed detector gates may be an empty Qobj
+                matrix = matrix + weight * jump.data
+        return csr_matrix(matrix)
+
+    def exponential(self, weights: tuple, dt: float) -> np.ndarray:
+        """
+        :param weights: the weights -vconfig[i] multiplying each jump superoperator.
+        :param dt: the time step.
+        :return: the dense superoperator exp(L dt) of the generator conditioned on the virtual configuration.
+        """
+        key = (dt, weights)
+        if key not in self._exponentials:
+            self._exponentials[key] = expm(self.matrix(weights).toarray() * dt)
+        return self._exponentials[key]
+
+    def superoperator(self, weights: tuple, t0: float, t: float, dim: int) -> np.ndarray:
+        return self.exponential(weights, t - t0)
+
+    def evolve_chain(self, states: np.ndarray, links: List[List[tuple]], t0: float, t: float) -> np.ndarray:
+        number, dim = states.shape[0], states.shape[-1]
+        if t == t0:
+            return states
+
+        # block-triangular generator acting on the chain of vectorised states
+        generator = kron(identity(number, format='csr'), self.matrix(()), format='csr')
+        for jump, indices in zip(self.jumps, links):
+            if indices and jump.data.nnz:
+                sources, targets = np.array(indices, dtype=int).reshape((-1, 2)).T
+                coupling = csr_matrix((np.ones(len(sources)), (targets, sources)), shape=(number, number))
+                generator = generator - kron(coupling, jump.data, format='csr')
+
+        vectors = expm_multiply(generator * (t - t0), to_vectors(states).T.ravel())
+        return from_vectors(vectors.reshape((number, dim ** 2)).T, dim)
+
+    def evolve(self, states: np.ndarray, virtual_configurations: list, t0: float, t: float) -> np.ndarray:
+        dim = states.shape[-1]
+        if dim ** 2 <= self.dense_limit:
+            return self.evolve_maps(states, virtual_configurations, t0, t)
+
+        groups = {}
+        for k, row in enumerate(jump_weights(virtual_configurations, len(self.jumps))):
+            groups.setdefault(tuple(row), []).append(k)
+
+        vectors = to_vectors(states)
+        evolved = np.empty(vectors.shape, dtype=complex)
+        for key, indices in groups.items():
+            evolved[:, indices] = expm_multiply(self.matrix(key) * (t - t0), vectors[:, indices])
+        return from_vectors(evolved, dim)
+
+
+def density_matrix(state: Qobj) -> Qobj:
+    return state if state.isoper else state * state.dag()
+
+
+def to_vectors(states: np.ndarray) -> np.ndarray:
+    # columns are vectorised density matrices, following qutip operator_to_vector
+    return np.ascontiguousarray(states.transpose(0, 2, 1)).reshape((states.shape[0], -1)).T
+
+
+def from_vectors(vectors: np.ndarray, dim: int) -> np.ndarray:
+    return vectors.T.reshape((vectors.shape[1], dim, dim)).transpose(0, 2, 1)
+
+
+def jump_weights(virtual_configurations: list, jump_number: int) -> np.ndarray:
+    """
+    :param virtual_configurations: a list of n virtual configurations.
+    :param jump_number: the number of jump superoperators.
+    :return: an (n, jump_number) array of weights -vconfig[i] multiplying the i-th jump for each configuration.
+    """
+    weights = np.zeros((len(virtual_configurations), jump_number), dtype=complex)
+    for k, virtual_configuration in enumerate(virtual_configurations):
+        for i, value in enumerate(virtual_configuration[:jump_number]):
+            weights[k, i] = -value
+    return weights
 
 
 def list_get(lst, idx, default):
@@ -9,13 +9,22 @@ class VState(Qobj):
     and that can evolve in time conditioned on a current configuration.
 
     :param state: a state of the source
+    :param time: the time of the state
+    :param virtual_configuration: the virtual configuration of each branch leading to the state
+    :param copy: whether to copy the data of the state, or share it
     """
 
-    def __init__(self, state: Qobj, time: float = 0, virtual_configuration: list = None):
-        super().__init__(inpt=state)
-        self.virtual_configuration = [] if virtual_configuration is None else virtual_configuration
+    def __init__(self, state: Qobj, time: float = 0, virtual_configuration: tuple = None, copy: bool = True):
+        super().__init__(inpt=state, copy=copy)
+        self.virtual_configuration = () if virtual_configuration is None else tuple(virtual_configuration)
         self.time = time
 
+    # Creates a state for a new branch that shares data with this state. Virtual states are never modified in place,
+    # so the shared data is only replaced once either state evolves.
+    def branch(self, virtual_configuration: complex, pos: int = -1):
+        configuration = extend_configuration(self.virtual_configuration, virtual_configuration, pos)
+        return VState(state=self, time=self.time, copy=False, virtual_configuration=configuration)
+
     # Apply an instantaneous operator or superoperator
     def apply_operator(self, op: Union[Qobj, EvaluatedDiracOperator]):
         if isinstance(op, Qobj):
@@ -44,3 +53,19 @@ class VState(Qobj):
     # Propagating the state forward in time given the current configuration
     def propagate(self, propagator, t: float, tlist: list = None):
         return propagator.propagate(self, t, tlist=tlist)
+
+
+def extend_configuration(configuration: tuple, virtual_configuration: complex, pos: int = -1) -> tuple:
+    """
+    :param configuration: the virtual configuration of each branch leading to a state.
+    :param virtual_configuration: the configuration of a new branch.
+    :param pos: the position of the new branch in the virtual configuration.
+    :return: the virtual configuration including the new branch.
+    """
+    configuration = list(configuration)
+    if pos >= len(configuration):
+        configuration += [0] * (pos - len(configuration) + 1)
+    elif not configuration and pos == -1:
+        configuration = [0]
+    configuration[pos] = virtual_configuration
+    return tuple(configuration)
@@ -1,10 +1,11 @@
 from ..time.evaluate import EvaluatedDiracOperator
-from .state import VState
+from .state import VState, extend_configuration
 from .propagator import AVirtualPropagator
 from .branch import MeasurementBranch
-from copy import deepcopy
-from qutip import Qobj
-from typing import Union
+from qutip import Qobj, liouvillian
+from scipy.sparse.linalg import expm_multiply
+from itertools import product
+from typing import Union, List
 import numpy as np
 
 
@@ -22,18 +23,11 @@ class VNode:
         self.virtual_state = virtual_state
         self.future = [] if future is None else future
 
-    # Creates child nodes corresponding to a set of new configurations by copying the node virtual state
+    # Creates child nodes corresponding to a set of new configurations that share the node virtual state
     def add_branch(self, branch: MeasurementBranch, pos: int = -1):
         if not self.future:
             for virtual_configuration in branch.virtual_configurations():
-                virtual_state = deepcopy(self.virtual_state)
-                branch_num = len(virtual_state.virtual_configuration)
-                if pos >= branch_num:
-                    virtual_state.virtual_configuration = virtual_state.virtual_configuration + [0] * (pos - branch_num + 1)
-                elif branch_num == 0 and pos == -1:
-                    virtual_state.virtual_configuration = [0]
-                virtual_state.virtual_configuration[pos] = virtual_configuration
-                self.future.append(VNode(virtual_state=virtual_state))
+                self.future.append(VNode(virtual_state=self.virtual_state.branch(virtual_configuration, pos)))
         else:
             for node in self.future:
                 node.add_branch(branch, pos)
@@ -125,9 +119,20 @@ class VTree:
         for node in self.future:
             node.apply_generator(op)
 
-    def propagate(self, propagator: AVirtualPropagator, t: float):
-        for node in self.future:
-            node.propagate(propagator, t)
+    def propagate(self, propagator: AVirtualPropagator, t: float, batch: bool = False, executor=None):
+        """
+        Propagates all leaves of the tree to time t.
+
+        :param propagator: the propagator to apply.
+        :param t: the final time.
+        :param batch: whether to evolve all leaves together in a single integration.
+        :param executor: an optional VExecutor to spread batched leaves across worker processes.
+        """
+        if batch or executor is not None:
+            propagator.propagate_batch(self.get_states(), t, executor=executor)
+        else:
+            for node in self.future:
+                node.propagate(propagator, t)
 
     def get_states(self):
         states = []
@@ -166,3 +171,161 @@ class VTree:
             return np.stack([self._convert_to_numeric(elem) for elem in tensor])
         else:
             return tensor
+
+
+class VArrayTree:
+    """
+    An alternative to the VTree class that stores all leaves of the tree in a single array of density matrices of
+    shape (n_1, ..., n_K, d, d), where n_k is the number of virtual configurations of the k-th branch. Each branch adds
+    an axis to the array, and the virtual configuration of a leaf is determined by its multi-index. Given a selection
+    of configurations, the tree instead keeps only the leaves leading to them, in a single axis.
+    """
+
+    def __init__(self, initial_state: VState, selection: List[tuple] = None):
+        """
+        :param initial_state: the initial virtual state.
+        :param selection: an optional list of the configuration indices needed on each branch, ordered by branch
+            position, so that only the leaves leading to those configurations are kept in a single axis.
+        """
+        rho = initial_state if initial_state.isoper else initial_state * initial_state.dag()
+        self.states = rho.full()
+        self.time = initial_state.time
+        self.initial_configuration = initial_state.virtual_configuration
+        self.branches = []
+        self.positions = []
+        self.subdims = initial_state.dims[0]
+
+        self.selection = selection
+        self.indices = None  # the configuration index of each selected leaf on each branch of the tree
+        if selection is not None:
+            self.states = self.states[np.newaxis]
+            self.indices = np.zeros((1, 0), dtype=int)
+
+    @property
+    def branch_number(self):
+        return len(self.branches)
+
+    @property
+    def shape(self) -> tuple:
+        return self.states.shape[:-2]
+
+    @property
+    def dim(self) -> int:
+        return self.states.shape[-1]
+
+    def add_branch(self, branch: MeasurementBranch, pos: int = -1):
+        if self.selection is not None:
+            self._add_selected_branch(branch, pos)
+            return
+        # the new axis is a broadcast view, so leaves are only copied once they evolve
+        number = len(branch.virtual_configurations())
+        self.states = np.broadcast_to(self.states[..., np.newaxis, :, :], self.shape + (number, self.dim, self.dim))
+        self.branches.append(branch)
+        self.positions.append(pos)
+
+    def _add_selected_branch(self, branch: MeasurementBranch, pos: int):
+        # each leaf is split into the configurations of the new branch that lead to a selected configuration
+        self.branches.append(branch)
+        self.positions.append(pos)
+        prefixes = sorted(set(tuple(configuration[p] for p in self.positions) for configuration in self.selection))
+        parents = {tuple(index): n for n, index in enumerate(self.indices)}
+        self.states = self.leaf_states()[[parents[prefix[:-1]] for prefix in prefixes]]
+        self.indices = np.array(prefixes, dtype=int).reshape((len(prefixes), len(self.positions)))
+
+    def selected_leaves(self) -> dict:
+        """
+        :return: a dictionary of the density matrix of each selected leaf, keyed by its configuration indices ordered
+            by branch position.
+        """
+        order = np.argsort(self.positions)
+        return {tuple(int(k) for k in index[order]): state for index, state in zip(self.indices, self.leaf_states())}
+
+    def virtual_configurations(self) -> List[tuple]:
+        """
+        :return: the virtual configuration of each leaf, ordered as the flattened array of leaves.
+        """
+        if self.indices is None:
+            leaves = product(*[branch.virtual_configurations() for branch in self.branches])
+        else:
+            leaves = [[branch.virtual_configurations()[k] for branch, k in zip(self.branches, index)]
+                      for index in self.indices]
+        configurations = []
+        for values in leaves:
+            configuration = self.initial_configuration
+            for value, pos in zip(values, self.positions):
+                configuration = extend_configuration(configuration, value, pos)
+            configurations.append(configuration)
+        return configurations
+
+    def leaf_states(self) -> np.ndarray:
+        """
+        :return: an array of shape (n, d, d) containing the density matrices of all n leaves.
+        """
+        return self.states.reshape((-1, self.dim, self.dim))
+
+    def set_leaf_states(self, states: np.ndarray, t: float = None):
+        """
+        :param states: an array of shape (n, d, d) containing the new density matrices of all n leaves.
+        :param t: the new time of the leaves.
+        """
+        self.states = states.reshape(self.shape + (self.dim, self.dim))
+        self.time = self.time if t is None else t
+
+    def _apply_superoperator(self, op, generator: bool = False, time: float = 1):
+        vectors = self.leaf_states().transpose(0, 2, 1).reshape((-1, self.dim ** 2)).T  # column stacking
+        vectors = expm_multiply(op * time, vectors) if generator else op @ vectors
+        self.set_leaf_states(np.asarray(vectors).T.reshape((-1, self.dim, self.dim)).transpose(0, 2, 1))
+
+    def apply_operator(self, op: Union[Qobj, EvaluatedDiracOperator]):
+        if isinstance(op, Qobj):
+            if op.isoper:
+                mat = op.full()
+                self.set_leaf_states(mat @ self.leaf_states() @ mat.conj().T)
+            else:
+                self._apply_superoperator(op.data)
+        elif isinstance(op, EvaluatedDiracOperator):
+            if isinstance(op.hamiltonian, Qobj):
+                self.apply_generator(op.hamiltonian)
+            if isinstance(op.channel, Qobj):
+                self.apply_operator(op.channel)
+
+    def apply_generator(self, op: Qobj, time: float = 1):
+        if op.isoper:
+            op = liouvillian(op)
+        self._apply_superoperator(op.data, generator=True, time=time)
+
+    def propagate(self, propagator: AVirtualPropagator, t: float, executor=None):
+        """
+        Propagates all leaves of the tree to time t using a single evolution.
+
+        :param propagator: the propagator to apply.
+        :param t: the final time.
+        :param executor: an optional VExecutor to spread the leaves across worker processes.
+        """
+        if t != self.time:
+            states, configurations = self.leaf_states(), self.virtual_configurations()
+            states = propagator.evolve(states, configurations, self.time, t) if executor is None else \
+                executor.evolve(propagator, states, configurations, self.time, t)
+            self.set_leaf_states(states)
+        self.time = t
+
+    def get_states(self) -> List[VState]:
+        dims = [self.subdims, self.subdims]
+        return [VState(state=Qobj(inpt=state, dims=dims), time=self.time, virtual_configuration=configuration)
+                for state, configuration in zip(self.leaf_states(), self.virtual_configurations())]
+
+    def get_points(self):
+        # like Qobj.tr, traces of Hermitian leaves are real
+        states = self.leaf_states()
+        hermitian = np.all(np.abs(states - states.conj().transpose(0, 2, 1)) <= 1e-12, axis=(1, 2))
+        return [trace.real if is_hermitian else trace
+                for trace, is_hermitian in zip(np.einsum('kii->k', states), hermitian)]
+
+    def get_dimensions(self):
+        return list(self.shape)
+
+    def build_probability_tensor(self):
+        return np.einsum('...ii->...', self.states).astype(complex)
+
+    def build_state_tensor(self):
+        return np.array(self.states, dtype=complex)